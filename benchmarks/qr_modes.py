@@ -0,0 +1,63 @@
+"""Compare raster and vector QR rendering for the QR sticker designs.
+
+Usage: python benchmarks/qr_modes.py [--labels 2000]
+
+For each design (Sticker 3-6) the PDF is generated three times: raster with a
+cold QR tile cache, raster again with the cache warm, and vector. Reports the
+generation time, the output size and the page count.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+# Make the repo root importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+import sticker_pdf  # noqa: E402
+
+DESIGNS = [
+    ("Sticker 3", "rack_qr"),
+    ("Sticker 4", "qr_orange"),
+    ("Sticker 5", "qr_alpha"),
+    ("Sticker 6", "qr_gold"),
+]
+
+
+def sample_locations(count):
+    values = [f"R{i // 60 + 1:02d}-L{i // 12 % 5 + 1}-P{i % 12 + 1:02d}" for i in range(count)]
+    return sticker_pdf.extract_locations([pd.DataFrame({"Location": values})])
+
+
+def timed(template, locations, qr_mode):
+    start = time.perf_counter()
+    pdf_bytes = sticker_pdf.render_template(template, locations, qr_mode)
+    return time.perf_counter() - start, pdf_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=2000, help="number of distinct locations")
+    args = parser.parse_args()
+
+    locations = sample_locations(args.labels)
+    print(f"{len(locations)} labels")
+    print(f"{'design':<10} {'mode':<13} {'seconds':>8} {'size (KB)':>10} {'pages':>6}")
+
+    for name, template in DESIGNS:
+        sticker_pdf.qr_tile_cache.clear()
+        runs = [
+            ("raster cold", sticker_pdf.QR_MODE_RASTER),
+            ("raster warm", sticker_pdf.QR_MODE_RASTER),
+            ("vector", sticker_pdf.QR_MODE_VECTOR),
+        ]
+        for label, qr_mode in runs:
+            seconds, pdf_bytes = timed(template, locations, qr_mode)
+            pages = len(re.findall(rb"/Type\s*/Page(?!s)", pdf_bytes))
+            print(f"{name:<10} {label:<13} {seconds:>8.2f} {len(pdf_bytes) / 1024:>10.0f} {pages:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Time the Sample Page HTML rendering for a large store-grouped batch.
+
+Usage: python benchmarks/sticker_html.py [--labels 10000] [--stores 20] [--repeat 20]
+
+Renders the same results three ways: the escaped renderer with the barcode
+cache cold, again with it warm, and the old unescaped string-concatenation
+loop (with the same local barcodes) as a baseline. Warm runs report the best
+of --repeat tries, as single runs of a few tens of milliseconds are noisy.
+Reports seconds and output size.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make the repo root importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barcodes  # noqa: E402
+import streamlit_app  # noqa: E402
+
+
+def sample_results(count, stores):
+    """Results shaped like generate_sticker_data_from_df(): header, labels, blank pad per store"""
+    results = []
+    per_store = -(-count // stores)
+    for store in range(stores):
+        labels = range(store * per_store, min(count, (store + 1) * per_store))
+        results.append({"storeName": f"Store {store}", "isStoreNameRow": True})
+        for i in labels:
+            results.append({
+                "storeName": f"Store {store}",
+                "isStoreNameRow": False,
+                "barcode": f"8901{i:09d}",
+                "text": f"8901{i:09d}",
+                "desc": "Gold plated necklace set",
+                "spec": "RED & GREEN",
+                "designNo": f"D{i % 500}",
+                "remark": "MATTE",
+                "feature1": "FREE SIZE",
+                "feature2": i % 7,
+                "mpr": 1299,
+            })
+        if len(labels) % 2 == 0:
+            results.append({"storeName": f"Store {store}", "isStoreNameRow": False, "barcode": "", "text": "",
+                            "desc": "", "spec": "", "designNo": "", "remark": "", "feature1": "",
+                            "feature2": "", "mpr": ""})
+    return results
+
+
+def concatenated_render(results):
+    """The previous render_sticker_html(): one f-string appended per label, no escaping"""
+    html = '<div id="output">'
+    label_number = 0
+    for entry in results:
+        if entry.get("isStoreNameRow"):
+            label_number = 0
+            html += f"""
+        <table class='store-name-table'>
+            <tr><td class='store-name-cell'>Store: {entry['storeName']}</td></tr>
+        </table>
+        """
+            continue
+        label_number += 1
+        barcode = str(entry.get('barcode', ''))
+        barcode_img = f'<img id="barcodeImg" src="{barcodes.code128_data_uri(barcode)}" />' if barcode else ""
+        html += f"""
+            <table class="{"even" if label_number % 2 == 0 else "odd"}">
+                <tr class="row-1"><td colspan="2">{barcode_img}</td></tr>
+                <tr class="row-2"><td colspan="2">{entry.get('text')}</td><td class="rotated" rowspan="6">Kushal's</td></tr>
+                <tr class="row-3"><td colspan="2">{entry.get('desc')}</td></tr>
+                <tr class="row-4"><td>{entry.get('spec')}</td><td></td></tr>
+                <tr class="row-5"><td>{entry.get('designNo')}</td><td>{entry.get('remark')}</td></tr>
+                <tr class="row-6"><td>{entry.get('feature1')}</td><td>S: {entry.get('feature2')}</td></tr>
+                <tr class="row-7"><td colspan="2">MRP: {entry.get('mpr')}.00</td></tr>
+            </table>
+            """
+    html += '</div>'
+    return html
+
+
+def timed(render, results, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = render(results)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=10000, help="number of labels")
+    parser.add_argument("--stores", type=int, default=20, help="number of stores they are spread over")
+    parser.add_argument("--repeat", type=int, default=20, help="tries per warm run, best one reported")
+    args = parser.parse_args()
+
+    results = sample_results(args.labels, args.stores)
+    print(f"{args.labels} labels in {args.stores} stores")
+    print(f"{'renderer':<24} {'seconds':>8} {'size (MB)':>10}")
+
+    barcodes.code128_bars.cache_clear()
+    barcodes.code128_data_uri.cache_clear()
+    runs = [
+        ("escaped, cold barcodes", streamlit_app.render_sticker_html, 1),
+        ("escaped, warm barcodes", streamlit_app.render_sticker_html, args.repeat),
+        ("concatenation, warm", concatenated_render, args.repeat),
+    ]
+    for label, render, repeat in runs:
+        seconds, html = timed(render, results, repeat)
+        print(f"{label:<24} {seconds:>8.3f} {len(html) / 1024 / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare full-layout TSPL jobs with printer-resident form jobs.
+
+Usage: python benchmarks/tspl_forms.py [--labels 1000] [--link-bps 115200]
+
+Compiles the same labels as a full-layout batch, as a form batch that
+downloads its forms first, and as a form batch for a printer that already
+holds them. Each job is sent to fake_printer.py over loopback. Reports the
+job size, bytes per label, compile time, labels per second over loopback,
+and labels per second the link could carry at --link-bps (serial framing,
+10 bits a byte). That is the bound on a slow link, before the print head's
+own speed.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make the repo root importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_printer import FakePrinter  # noqa: E402
+from printers import open_printer  # noqa: E402
+from tspl import TSPL_ENCODING, compile_tspl_batch, compile_tspl_form_batch  # noqa: E402
+
+
+def sample_labels(count):
+    return [
+        {
+            "barcode": f"0000{160124228 + i}",
+            "line1": "E-R Antique",
+            "line2": "Ruby",
+            "line3": f"{165099 + i % 500}  40S021",
+            "line4": "Gold   S:NA",
+            "price": str(1020 + i % 40 * 10),
+        }
+        for i in range(count)
+    ]
+
+
+def send_and_drain(printer, fake, job):
+    """Seconds until the stand-in printer has read the whole job"""
+    expected = len(fake.received) + len(job)
+    start = time.perf_counter()
+    printer.send(job)
+    while len(fake.received) < expected:
+        time.sleep(0.0005)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=1000, help="number of labels")
+    parser.add_argument("--link-bps", type=int, default=115200, help="bits per second of the slow link to project onto")
+    args = parser.parse_args()
+
+    labels = sample_labels(args.labels)
+    compilers = [
+        ("full layout", compile_tspl_batch),
+        ("forms, downloaded", compile_tspl_form_batch),
+        ("forms, resident", lambda labels: compile_tspl_form_batch(labels, download=False)),
+    ]
+
+    fake = FakePrinter().start()
+    print(f"{args.labels} labels; link projection at {args.link_bps} bps")
+    print(f"{'job':<18} {'bytes':>9} {'B/label':>8} {'compile ms':>11} {'loopback l/s':>13} {'link l/s':>9}")
+    try:
+        with open_printer(fake.uri) as printer:
+            for name, compile_job in compilers:
+                start = time.perf_counter()
+                job = compile_job(labels).encode(TSPL_ENCODING)
+                compile_seconds = time.perf_counter() - start
+                seconds = compile_seconds + send_and_drain(printer, fake, job)
+                link_seconds = len(job) * 10 / args.link_bps
+                print(
+                    f"{name:<18} {len(job):>9} {len(job) / args.labels:>8.1f} {compile_seconds * 1000:>11.1f} "
+                    f"{args.labels / seconds:>13.0f} {args.labels / link_seconds:>9.1f}"
+                )
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Stand-in for a raw (port 9100) label printer, for trying the TSPL sender without hardware.
+
+Usage: python fake_printer.py [--host 127.0.0.1] [--port 9100] [--out received.tspl] [--rate 0] [--render DIR]
+
+Accepts any number of connections, keeps each open for as long as the client
+does, and appends everything received to --out. --rate limits how many bytes a
+second it reads, like a printer working through its buffer, which is how the
+sender's write timeout can be seen firing. With --render, what each
+connection sent is run through tspl_emulator.py when it closes and the
+printed labels are saved as PNGs in DIR. Prints a line per closed connection.
+"""
+import argparse
+import re
+import socket
+import socketserver
+import threading
+import time
+from contextlib import suppress
+
+# Labels a job asks for: PRINT m[,n] prints m sets of n copies
+PRINT_COMMAND = re.compile(rb"PRINT\s+(\d+)(?:\s*,\s*(\d+))?", re.IGNORECASE)
+# Stored programs: DOWNLOAD ["NAME.BAS"] ... EOP, run later as NAME or RUN "NAME.BAS"
+DOWNLOAD_COMMAND = re.compile(rb'DOWNLOAD\s+(?:\w\s*,\s*)?"([^"]+)\.BAS"', re.IGNORECASE)
+RUN_COMMAND = re.compile(rb'RUN\s+"([^"]+?)(?:\.BAS)?"', re.IGNORECASE)
+# BITMAP x,y,width bytes,height,mode, then width * height raw bytes that may hold anything
+BITMAP_HEADER = re.compile(rb"BITMAP\s+[^,\n]*,[^,\n]*,\s*(\d+)\s*,\s*(\d+)\s*,[^,\n]*,", re.IGNORECASE)
+
+
+def count_labels(tspl, programs=None):
+    """Labels a whole job prints, counting a stored program's PRINTs every time it is run.
+
+    programs (name -> labels one run prints) is updated with the job's
+    downloads, so a printer that keeps them can pass the same dict for its
+    next job; calls of programs it does not know count nothing.
+    """
+    programs = {} if programs is None else programs
+    counts = [0]  # The job's labels, then those of each DOWNLOAD still being read
+    names = []
+    position = 0
+    while position < len(tspl):
+        bitmap = BITMAP_HEADER.match(tspl, position)
+        if bitmap:
+            position = bitmap.end() + int(bitmap.group(1)) * int(bitmap.group(2))
+            continue
+        end = tspl.find(b"\n", position)
+        end = len(tspl) if end < 0 else end
+        line = tspl[position:end].strip()
+        position = end + 1
+
+        word = line.split(None, 1)[0].upper() if line else b""
+        if word == b"PRINT" and (command := PRINT_COMMAND.match(line)):
+            sets, copies = command.groups()
+            counts[-1] += int(sets) * int(copies or 1)
+        elif word == b"DOWNLOAD" and (command := DOWNLOAD_COMMAND.match(line)):
+            names.append(command.group(1).upper())
+            counts.append(0)
+        elif word == b"EOP" and names:
+            programs[names.pop()] = counts.pop()
+        elif word == b"RUN" and (command := RUN_COMMAND.match(line)):
+            counts[-1] += programs.get(command.group(1).upper(), 0)
+        else:
+            counts[-1] += programs.get(word, 0)
+    return counts[0]
+
+
+class FakePrinter(socketserver.ThreadingTCPServer):
+    """The stand-in as a server object, so scripts can run it on a thread next to the sender"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0), out=None, rate=0, render=None):
+        super().__init__(address, FakePrinterHandler)
+        self.out = out
+        self.rate = rate
+        self.render = render
+        self.received = bytearray()
+        self.connections = 0
+        # Programs downloaded so far, kept across connections like a printer that stays on
+        self.programs = {}
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    @property
+    def uri(self):
+        host, port = self.server_address[:2]
+        return f"tcp://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop listening and drop open connections, like a printer being switched off"""
+        self.shutdown()
+        self.server_close()
+        with self._lock:
+            for client in self._clients:
+                with suppress(OSError):
+                    client.shutdown(socket.SHUT_RDWR)
+
+    def record(self, chunk):
+        with self._lock:
+            self.received += chunk
+            if self.out:
+                with open(self.out, "ab") as out:
+                    out.write(chunk)
+
+
+class FakePrinterHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        with self.server._lock:
+            self.server.connections += 1
+            self.server._clients.add(self.request)
+
+    def finish(self):
+        with self.server._lock:
+            self.server._clients.discard(self.request)
+
+    def handle(self):
+        read_size = min(self.server.rate, 4096) if self.server.rate else 64 * 1024
+        job = bytearray()
+        try:
+            while chunk := self.request.recv(read_size):
+                self.server.record(chunk)
+                job += chunk
+                if self.server.rate:
+                    time.sleep(len(chunk) / self.server.rate)
+        except OSError:
+            pass
+        # Counted once the whole job is in, so commands and programs split across reads still count
+        with self.server._lock:
+            labels = count_labels(bytes(job), self.server.programs)
+        print(f"{self.client_address[0]}:{self.client_address[1]} closed: {len(job)} bytes, ~{labels} labels", flush=True)
+        if job and self.server.render:
+            self.render_job(bytes(job))
+
+    def render_job(self, job):
+        # Imported here so the plain stand-in does not need Pillow and the sticker modules
+        from tspl_emulator import emulate_tspl, save_labels
+
+        emulated = emulate_tspl(job)
+        prefix = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.client_address[1]}"
+        paths = save_labels(emulated, self.server.render, prefix)
+        print(f"  rendered {len(paths)} labels to {self.server.render} "
+              f"(parse {emulated.parse_seconds * 1000:.1f} ms, render {emulated.render_seconds * 1000:.1f} ms)", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--out", help="file to append the received TSPL to")
+    parser.add_argument("--rate", type=int, default=0, help="bytes per second to accept (0 = unlimited)")
+    parser.add_argument("--render", help="directory to save each connection's printed labels to, as PNGs")
+    args = parser.parse_args()
+
+    printer = FakePrinter((args.host, args.port), out=args.out, rate=args.rate, render=args.render)
+    print(f"Fake printer listening on {printer.uri}", flush=True)
+    try:
+        printer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        printer.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Jobs that may render at the same time across every session; later ones wait their turn
+JOB_WORKERS = 2
+# Finished jobs are forgotten this long after they end
+JOB_KEEP_SECONDS = 60 * 60
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed out"
+
+
+class JobStopped(Exception):
+    """Raised from a job's progress callback once it has been cancelled or run out of time"""
+
+
+class Job:
+    """One background task and what the UI needs to show about it.
+
+    The task reports through progress(done); that call is also where a
+    cancellation or an exhausted time budget stops it, by raising JobStopped.
+    """
+
+    def __init__(self, key, total, budget=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.total = total
+        self.budget = budget
+        self.done = 0
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def eta(self):
+        """Seconds left at the rate so far, or None before there is a rate to go on"""
+        if not self.done or self.status != RUNNING:
+            return None
+        return self.elapsed() / self.done * (self.total - self.done)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self, done):
+        self.done = done
+        if self._cancel.is_set():
+            raise JobStopped(CANCELLED)
+        if self.budget is not None and self.elapsed() > self.budget:
+            raise JobStopped(TIMED_OUT)
+
+
+class JobRunner:
+    """Runs jobs on a small thread pool shared by every session.
+
+    Jobs are submitted under a key; while a job with that key is still queued
+    or running, submitting the key again returns the existing job instead of
+    starting a duplicate.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._active = {}  # key -> job id
+        self._lock = threading.Lock()
+
+    def submit(self, key, total, fn, args=(), kwargs=None, budget=None):
+        """Start fn(*args, progress=job.progress, **kwargs) in the background and return its Job"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(self._active.get(key))
+            if job is not None and job.active:
+                return job
+
+            job = Job(key, total, budget)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+        self._executor.submit(self._run, job, fn, args, kwargs or {})
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.started = time.monotonic()
+        job.status = RUNNING
+        try:
+            # Cancelled while it was still queued
+            job.progress(0)
+            job.result = fn(*args, progress=job.progress, **kwargs)
+            job.status = DONE
+        except JobStopped as stopped:
+            job.status = str(stopped)
+        except Exception as error:
+            job.error = error
+            job.status = FAILED
+        finally:
+            job.finished = time.monotonic()
+
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_KEEP_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            job = self._jobs.pop(job_id)
+            if self._active.get(job.key) == job_id:
+                del self._active[job.key]
+
+
+job_runner = JobRunner()
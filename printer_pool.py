@@ -0,0 +1,228 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from printers import PrinterError, open_printer
+from spooler import QUEUED, RETRYING, SENDING, SpoolerFull, print_spooler
+
+# Printer pool: several label printers registered under their URIs, kept in
+# the spool journal. A batch is cut into contiguous runs, one per reachable
+# printer, sized by each printer's weight or by the throughput it has shown,
+# and every run is spooled as its own job. Printers are health-checked in the
+# background; jobs waiting on one that goes down, or whose send fails, move to
+# another reachable printer in the pool. A job cut off mid-send is sent again
+# in full there, so labels the first printer already took may print twice.
+
+# Seconds between background health checks
+HEALTH_CHECK_SECONDS = 15
+# Seconds a health check may take per printer
+HEALTH_CHECK_TIMEOUT = 3
+SPLIT_BY_WEIGHT = "weight"
+SPLIT_BY_THROUGHPUT = "throughput"
+
+
+def split_batch(labels, shares, unit=1):
+    """Cut labels into contiguous runs in proportion to shares (URI -> share), as [(URI, labels), ...].
+
+    Runs are whole multiples of unit labels (a printed row), so only the last
+    run can end on a part row. Printers whose share rounds to nothing get no run.
+    """
+    labels = list(labels)
+    blocks = -(-len(labels) // unit)
+    total = sum(shares.values())
+    exact = {uri: blocks * share / total for uri, share in shares.items()}
+    counts = {uri: int(blocks_for_uri) for uri, blocks_for_uri in exact.items()}
+    # Largest remainders take the blocks the rounding down left over
+    by_remainder = sorted(exact, key=lambda uri: exact[uri] - counts[uri], reverse=True)
+    for uri in by_remainder[:blocks - sum(counts.values())]:
+        counts[uri] += 1
+
+    runs = []
+    start = 0
+    for uri, count in counts.items():
+        if count:
+            runs.append((uri, labels[start * unit:(start + count) * unit]))
+            start += count
+    return runs
+
+
+class PrinterPool:
+    """Registered printers with their health, on top of a PrintSpooler"""
+
+    def __init__(self, spooler=print_spooler, check_seconds=HEALTH_CHECK_SECONDS, check_timeout=HEALTH_CHECK_TIMEOUT):
+        self.spooler = spooler
+        self.check_seconds = check_seconds
+        self.check_timeout = check_timeout
+        self._checker = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        spooler.failover = self.fail_over
+
+    def _connect(self):
+        return sqlite3.connect(self.spooler.db_path, timeout=30)
+
+    def start(self):
+        """Create the pool table and start the background health checks; safe to call repeatedly"""
+        with self._lock:
+            if self._checker is not None:
+                return
+            self.spooler.start()
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS pool_printers ("
+                    "uri TEXT PRIMARY KEY, weight REAL NOT NULL, healthy INTEGER, error TEXT, checked_at REAL)"
+                )
+            self._stop.clear()
+            self._checker = threading.Thread(target=self._check_loop, name="printer-pool-health", daemon=True)
+            self._checker.start()
+
+    def stop(self):
+        with self._lock:
+            checker, self._checker = self._checker, None
+        if checker is not None:
+            self._stop.set()
+            checker.join(timeout=self.check_timeout * 2)
+
+    # -------------------------
+    # Registration
+    # -------------------------
+    def add(self, uri, weight=1):
+        """Register a printer, or change its weight; it counts as reachable until its first check says otherwise"""
+        open_printer(uri).close()  # Raises PrinterError for a URI no transport handles
+        self.start()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO pool_printers (uri, weight) VALUES (?, ?) ON CONFLICT(uri) DO UPDATE SET weight = excluded.weight",
+                (uri, weight),
+            )
+
+    def remove(self, uri):
+        self.start()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM pool_printers WHERE uri = ?", (uri,))
+
+    def printers(self):
+        """Registered printers as dicts (uri, weight, healthy, error, checked_at, throughput in bytes/s or None)"""
+        self.start()
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute("SELECT * FROM pool_printers ORDER BY uri")]
+        throughput = self.spooler.throughput()
+        for row in rows:
+            row["throughput"] = throughput.get(row["uri"])
+        return rows
+
+    def reachable(self):
+        return [printer for printer in self.printers() if printer["healthy"] is None or printer["healthy"]]
+
+    # -------------------------
+    # Health
+    # -------------------------
+    def _check_loop(self):
+        while not self._stop.is_set():
+            self.check_all()
+            self._stop.wait(self.check_seconds)
+
+    def check_all(self):
+        """Check every registered printer at once and return the printers() list with the results"""
+        printers = self.printers()
+        # A printer sending a job is evidently up, and many take only one connection at a time
+        busy = {job["printer"] for job in self.spooler.jobs(limit=100) if job["status"] == SENDING}
+        to_check = [printer["uri"] for printer in printers if printer["uri"] not in busy]
+        if to_check:
+            with ThreadPoolExecutor(max_workers=len(to_check)) as executor:
+                errors = dict(zip(to_check, executor.map(self._probe, to_check)))
+            for uri, error in errors.items():
+                self._set_health(uri, error)
+        return self.printers()
+
+    def _probe(self, uri):
+        """None if the printer answers, else why it does not"""
+        try:
+            with open_printer(uri, self.check_timeout) as transport:
+                transport.check()
+        except PrinterError as error:
+            return str(error)
+        return None
+
+    def _set_health(self, uri, error, keep=None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE pool_printers SET healthy = ?, error = ?, checked_at = ? WHERE uri = ?",
+                (error is None, error, time.time(), uri),
+            )
+        if error is not None:
+            self._move_jobs(uri, keep)
+
+    def _move_jobs(self, uri, keep=None):
+        """Send the jobs still waiting on a printer that went down, other than job id keep, to the rest of the pool"""
+        waiting = [
+            job for job in self.spooler.jobs(limit=1000)
+            if job["printer"] == uri and job["status"] in (QUEUED, RETRYING) and job["id"] != keep
+        ]
+        for job in reversed(waiting):  # jobs() is newest first
+            other = self._least_loaded(exclude=uri)
+            if other is None:
+                return
+            self.spooler.reassign(job["id"], other)
+
+    def _least_loaded(self, exclude):
+        pending = self.spooler.pending_by_printer()
+        candidates = [printer["uri"] for printer in self.reachable() if printer["uri"] != exclude]
+        return min(candidates, key=lambda uri: pending.get(uri, 0), default=None)
+
+    def fail_over(self, uri, job_id, error):
+        """The spooler's failover callback: name where the job of a failed send on a pool printer goes.
+
+        The printer is only marked down, and the jobs queued behind job_id
+        moved now, when it also fails a health check; after a passing one the
+        failure counts as transient and only job_id moves. job_id itself is
+        left for the spooler to move, so it is not queued on two printers.
+        """
+        if uri not in {printer["uri"] for printer in self.printers()}:
+            return None
+        if self._probe(uri) is not None:
+            self._set_health(uri, str(error), keep=job_id)
+        return self._least_loaded(exclude=uri)
+
+    # -------------------------
+    # Submitting
+    # -------------------------
+    def shares(self, by=SPLIT_BY_WEIGHT):
+        """Share of a batch per reachable printer: its weight, or its measured throughput.
+
+        A printer with no finished jobs to measure yet gets the average of the
+        measured ones, or its weight when none has been measured.
+        """
+        printers = self.reachable()
+        if by == SPLIT_BY_THROUGHPUT:
+            measured = [printer["throughput"] for printer in printers if printer["throughput"]]
+            if measured:
+                average = sum(measured) / len(measured)
+                return {printer["uri"]: printer["throughput"] or average for printer in printers}
+        return {printer["uri"]: printer["weight"] for printer in printers if printer["weight"] > 0}
+
+    def submit_batch(self, labels, compile_job, title, unit=1, by=SPLIT_BY_WEIGHT):
+        """Split labels across the pool, compile each run with compile_job and spool it; returns [(URI, job id, labels)].
+
+        Raises PrinterError when no printer in the pool is reachable, and
+        SpoolerFull (with nothing left queued) when the runs do not all fit.
+        """
+        shares = self.shares(by)
+        if not shares:
+            raise PrinterError("no printer in the pool is reachable")
+        runs = split_batch(labels, shares, unit)
+        submitted = []
+        try:
+            for number, (uri, run) in enumerate(runs, 1):
+                job_id = self.spooler.submit(uri, compile_job(run), f"{title} · part {number}/{len(runs)}")
+                submitted.append((uri, job_id, len(run)))
+        except SpoolerFull:
+            for _, job_id, _ in submitted:
+                self.spooler.cancel(job_id)
+            raise
+        return submitted
+
+
+printer_pool = PrinterPool()
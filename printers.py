@@ -0,0 +1,348 @@
+import os
+import select
+import socket
+import subprocess
+import threading
+from urllib.parse import unquote, urlsplit
+from tspl import TSPL_ENCODING
+
+# Raw label-printer transports. Each takes finished TSPL (str or bytes) through
+# send() and pushes the bytes to the printer unchanged. Pick one by URI:
+#   tcp://192.168.1.50[:9100]  raw socket to the printer's JetDirect port
+#   cups://TSC_TTP_345         CUPS queue, submitted with `lp -o raw`
+#   file:///dev/usb/lp0        printer device node; must already exist
+#   capture:///tmp/jobs.tspl   plain file every job is appended to, for testing
+#   win://TSC TTP-345          Windows spooler in RAW mode (needs pywin32)
+
+RAW_PORT = 9100
+# Printer the UIs offer unless TSPL_PRINTER names another
+DEFAULT_PRINTER = os.environ.get("TSPL_PRINTER") or ("win://TSC TTP-345" if os.name == "nt" else "tcp://127.0.0.1:9100")
+# Seconds a connect or a stalled write may take before the send fails
+PRINTER_TIMEOUT = 10
+# Bytes handed to the socket or device per write
+WRITE_CHUNK = 64 * 1024
+# PRINTER_ATTRIBUTE_WORK_OFFLINE, the Windows "Use printer offline" setting
+WINDOWS_WORK_OFFLINE = 0x400
+
+
+class PrinterError(Exception):
+    """A job could not be handed to the printer"""
+
+
+def as_bytes(data):
+    return data.encode(TSPL_ENCODING) if isinstance(data, str) else data
+
+
+class PrinterTransport:
+    """Base for the transports: thread-safe send(), close(), and use as a context manager"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def send(self, data):
+        with self._lock:
+            self._send(as_bytes(data))
+
+    def _send(self, data):
+        raise NotImplementedError
+
+    def check(self):
+        """Raise PrinterError if the printer cannot take a job now; by default only the URI is known to resolve"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawTcpPrinter(PrinterTransport):
+    """Raw TCP (port 9100) with one connection kept open across jobs.
+
+    A connection the printer has closed since the last job is replaced before
+    writing. If a write fails before any byte of the job went out, the job is
+    retried once on a fresh connection; after that a resend could print labels
+    twice, so the error is raised instead.
+    """
+
+    def __init__(self, host, port=RAW_PORT, timeout=PRINTER_TIMEOUT):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+
+    def __repr__(self):
+        return f"RawTcpPrinter({self.host!r}, {self.port})"
+
+    def _connect(self):
+        try:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as error:
+            raise PrinterError(f"cannot connect to {self.host}:{self.port}: {error}") from error
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def check(self):
+        with self._lock:
+            if self._sock is not None and not self._peer_closed():
+                return
+        # A probe connection of its own, so a job's connection is never disturbed
+        try:
+            socket.create_connection((self.host, self.port), timeout=self.timeout).close()
+        except OSError as error:
+            raise PrinterError(f"cannot connect to {self.host}:{self.port}: {error}") from error
+
+    def _peer_closed(self):
+        readable, _, _ = select.select([self._sock], [], [], 0)
+        if not readable:
+            return False
+        try:
+            # Status bytes some printers send back are left alone; only EOF counts
+            return self._sock.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def _send(self, data):
+        if self._sock is not None and self._peer_closed():
+            self.close()
+        for attempt in range(2):
+            if self._sock is None:
+                self._connect()
+            sent = 0
+            try:
+                view = memoryview(data)
+                while sent < len(view):
+                    sent += self._sock.send(view[sent:sent + WRITE_CHUNK])
+                return
+            except socket.timeout as error:
+                self.close()
+                raise PrinterError(f"write to {self.host}:{self.port} timed out after {sent} of {len(data)} bytes") from error
+            except OSError as error:
+                self.close()
+                if sent or attempt:
+                    raise PrinterError(f"write to {self.host}:{self.port} failed after {sent} of {len(data)} bytes: {error}") from error
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class DevicePrinter(PrinterTransport):
+    """Printer device node such as /dev/usb/lp0, kept open across jobs.
+
+    Opened non-blocking so a printer that stops taking data (out of labels,
+    head open) fails the write after the timeout instead of hanging it.
+    """
+
+    def __init__(self, path, timeout=PRINTER_TIMEOUT):
+        super().__init__()
+        self.path = path
+        self.timeout = timeout
+        self._fd = None
+
+    def __repr__(self):
+        return f"DevicePrinter({self.path!r})"
+
+    def _open(self):
+        try:
+            # No O_CREAT: a printer that is unplugged must fail, not turn into a regular file
+            return os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as error:
+            raise PrinterError(f"cannot open {self.path}: {error}") from error
+
+    def check(self):
+        with self._lock:
+            if self._fd is None:
+                os.close(self._open())
+
+    def _send(self, data):
+        if self._fd is None:
+            self._fd = self._open()
+        view = memoryview(data)
+        sent = 0
+        try:
+            while sent < len(view):
+                _, writable, _ = select.select([], [self._fd], [], self.timeout)
+                if not writable:
+                    raise PrinterError(f"write to {self.path} timed out after {sent} of {len(data)} bytes")
+                try:
+                    sent += os.write(self._fd, view[sent:sent + WRITE_CHUNK])
+                except BlockingIOError:
+                    continue
+        except OSError as error:
+            self.close()
+            raise PrinterError(f"write to {self.path} failed after {sent} of {len(data)} bytes: {error}") from error
+        except PrinterError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class CaptureFile(PrinterTransport):
+    """Plain file each job is appended to, created if missing, for capturing jobs without a printer"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def __repr__(self):
+        return f"CaptureFile({self.path!r})"
+
+    def _open(self):
+        try:
+            return open(self.path, "ab")
+        except OSError as error:
+            raise PrinterError(f"cannot open {self.path}: {error}") from error
+
+    def check(self):
+        self._open().close()
+
+    def _send(self, data):
+        with self._open() as capture:
+            try:
+                capture.write(data)
+            except OSError as error:
+                raise PrinterError(f"write to {self.path} failed: {error}") from error
+
+
+class CupsPrinter(PrinterTransport):
+    """CUPS queue, one `lp -o raw` per job so CUPS passes the TSPL through untouched.
+
+    CUPS spools and feeds the printer itself, so there is no connection to keep;
+    the timeout bounds how long lp may take to accept the job.
+    """
+
+    def __init__(self, queue, timeout=PRINTER_TIMEOUT):
+        super().__init__()
+        self.queue = queue
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"CupsPrinter({self.queue!r})"
+
+    def _send(self, data):
+        command = ["lp", "-d", self.queue, "-o", "raw", "-t", "TSPL Print Job", "-"]
+        try:
+            subprocess.run(command, input=data, capture_output=True, timeout=self.timeout, check=True)
+        except FileNotFoundError as error:
+            raise PrinterError("lp not found; install the CUPS client tools") from error
+        except subprocess.TimeoutExpired as error:
+            raise PrinterError(f"lp did not accept the job for {self.queue} within {self.timeout}s") from error
+        except subprocess.CalledProcessError as error:
+            message = error.stderr.decode(errors="replace").strip()
+            raise PrinterError(f"lp failed for {self.queue}: {message}") from error
+
+    def check(self):
+        try:
+            result = subprocess.run(["lpstat", "-p", self.queue], capture_output=True, timeout=self.timeout)
+        except FileNotFoundError as error:
+            raise PrinterError("lpstat not found; install the CUPS client tools") from error
+        except subprocess.TimeoutExpired as error:
+            raise PrinterError(f"lpstat did not answer for {self.queue} within {self.timeout}s") from error
+        status = result.stdout.decode(errors="replace").strip()
+        if result.returncode or "disabled" in status:
+            raise PrinterError(status or result.stderr.decode(errors="replace").strip())
+
+
+class WindowsPrinter(PrinterTransport):
+    """Windows spooler in RAW mode, the way streamlit.py always printed"""
+
+    def __init__(self, name, timeout=PRINTER_TIMEOUT):
+        super().__init__()
+        try:
+            import win32print
+        except ImportError as error:
+            raise PrinterError("win:// printers need pywin32 (win32print)") from error
+        self._win32print = win32print
+        self.name = name
+
+    def __repr__(self):
+        return f"WindowsPrinter({self.name!r})"
+
+    def check(self):
+        win32print = self._win32print
+        try:
+            printer_handle = win32print.OpenPrinter(self.name)
+            try:
+                info = win32print.GetPrinter(printer_handle, 2)
+            finally:
+                win32print.ClosePrinter(printer_handle)
+        except win32print.error as error:
+            raise PrinterError(f"cannot query {self.name}: {error}") from error
+        # Any PRINTER_STATUS_* flag (offline, paper out, error, ...) or the "use offline" setting
+        if info["Status"] or info["Attributes"] & WINDOWS_WORK_OFFLINE:
+            raise PrinterError(f"{self.name} is not ready (status 0x{info['Status']:x})")
+
+    def _send(self, data):
+        win32print = self._win32print
+        printer_handle = win32print.OpenPrinter(self.name)
+        try:
+            job_info = ("TSPL Print Job", None, "RAW")
+            win32print.StartDocPrinter(printer_handle, 1, job_info)
+            win32print.StartPagePrinter(printer_handle)
+            win32print.WritePrinter(printer_handle, data)
+            win32print.EndPagePrinter(printer_handle)
+            win32print.EndDocPrinter(printer_handle)
+        finally:
+            win32print.ClosePrinter(printer_handle)
+
+
+def open_tcp(parts, timeout):
+    if not parts.hostname:
+        raise PrinterError(f"no host in printer URI {parts.geturl()!r}")
+    return RawTcpPrinter(parts.hostname, parts.port or RAW_PORT, timeout)
+
+
+def open_cups(parts, timeout):
+    return CupsPrinter(unquote(parts.netloc + parts.path), timeout)
+
+
+def open_device(parts, timeout):
+    if not parts.path:
+        raise PrinterError(f"no device path in printer URI {parts.geturl()!r}")
+    return DevicePrinter(unquote(parts.path), timeout)
+
+
+def open_capture(parts, timeout):
+    if not parts.path:
+        raise PrinterError(f"no file path in printer URI {parts.geturl()!r}")
+    return CaptureFile(unquote(parts.path))
+
+
+def open_windows(parts, timeout):
+    return WindowsPrinter(unquote(parts.netloc + parts.path), timeout)
+
+
+# URI scheme -> factory(split URI, timeout); add an entry to support another transport
+TRANSPORTS = {
+    "tcp": open_tcp,
+    "cups": open_cups,
+    "file": open_device,
+    "capture": open_capture,
+    "win": open_windows,
+}
+
+
+def open_printer(uri, timeout=PRINTER_TIMEOUT):
+    """Transport for a printer URI such as tcp://192.168.1.50:9100 (see the top of this module).
+
+    Raises PrinterError for a URI that no transport handles or that is malformed.
+    """
+    try:
+        parts = urlsplit(uri)
+        factory = TRANSPORTS.get(parts.scheme)
+        if factory is None:
+            raise PrinterError(f"unknown printer URI {uri!r}; use one of {', '.join(s + '://' for s in TRANSPORTS)}")
+        return factory(parts, timeout)
+    except (ValueError, TypeError) as error:
+        # Such as a port that is not a number, or no URI string at all
+        raise PrinterError(f"bad printer URI {uri!r}: {error}") from error
+
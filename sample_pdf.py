@@ -0,0 +1,119 @@
+from io import BytesIO
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+import text_metrics
+from barcodes import code128_bars
+from sticker_pdf import FONT_NAME, mm, page_slots, register_sticker_font
+
+# Server-side PDF for the Sample Page: the store-grouped labels from
+# generate_sticker_data_from_df(), in the same order and with the same rows as
+# render_sticker_html(), laid out on A4 without going through a browser.
+
+# Two 9 cm square labels across and three down. Every store group has an even
+# number of entries, so each store starts a new row.
+SAMPLE_TEMPLATE = {
+    "label_size": (mm(90), mm(90)),
+    "grid": {"left": mm(12), "right": mm(12), "top": mm(8), "bottom": mm(8), "gap": mm(5)},
+}
+
+# Label layout, in label coordinates (origin bottom-left). The barcode and text
+# rows use the left part; the rotated brand runs down the strip on the right.
+TEXT_WIDTH = mm(72)
+STRIP_X = mm(74)
+BARCODE_BOX = (mm(3), mm(69), mm(69), mm(18))
+BRAND = "Kushal's"
+BRAND_SIZE = 28
+# (row text, x, baseline, width, largest size, centred); text is shrunk to fit its width
+SAMPLE_CELLS = [
+    ("{text}", mm(3), mm(58), TEXT_WIDTH - mm(3), 28, True),
+    ("{desc}", mm(3), mm(48), TEXT_WIDTH - mm(3), 22, False),
+    ("{spec}", mm(3), mm(38), TEXT_WIDTH - mm(3), 22, False),
+    ("{designNo}", mm(3), mm(28), mm(34), 22, False),
+    ("{remark}", mm(38), mm(28), mm(34), 22, False),
+    ("{feature1}", mm(3), mm(18), mm(34), 22, False),
+    ("S: {feature2}", mm(38), mm(18), mm(34), 22, False),
+    ("MRP: {mpr}.00", mm(3), mm(5), TEXT_WIDTH - mm(3), 30, False),
+]
+CELL_MIN_SIZE = 8
+STORE_LINE_WIDTH = mm(0.5)
+STORE_SIZE = 24
+
+def is_blank_label(entry):
+    """The padding label a store group gets to keep its count even"""
+    return not any(entry.get(field) for field in ("barcode", "text", "desc", "designNo", "mpr"))
+
+def draw_code128(pdf, value, x, y, width, height):
+    """Code128 as vector bars stretched over the given box"""
+    bars, modules = code128_bars(value)
+    module = width / modules
+    path = pdf.beginPath()
+    for bar_x, bar_width in bars:
+        path.rect(x + bar_x * module, y, bar_width * module, height)
+    pdf.drawPath(path, stroke=0, fill=1)
+
+def fitted_cells(labels):
+    """Text, size and x of every cell of every label, each cell fitted in one pass over the labels"""
+    cells = []
+    for template, x, y, width, size, centred in SAMPLE_CELLS:
+        texts = [template.format_map(entry) for entry in labels]
+        units = text_metrics.text_units(texts, FONT_NAME)
+        sizes = text_metrics.fit_sizes(units, size, width, CELL_MIN_SIZE)
+        xs = (x + (width - units * sizes / 1000) / 2).tolist() if centred else [x] * len(texts)
+        cells.append((y, texts, sizes.tolist(), xs))
+    return cells
+
+def draw_store_header(pdf, store_name, x, y):
+    label_width, label_height = SAMPLE_TEMPLATE["label_size"]
+    pdf.setLineWidth(STORE_LINE_WIDTH)
+    pdf.rect(x, y, label_width, label_height)
+
+    text = f"Store: {store_name}"
+    size = text_metrics.fit_sizes(text_metrics.text_units([text], FONT_NAME), STORE_SIZE, label_width - mm(6), CELL_MIN_SIZE)[0]
+    pdf.setFont(FONT_NAME, size)
+    pdf.drawCentredString(x + label_width / 2, y + label_height / 2 - size / 3, text)
+
+def render_sample_pdf(results):
+    """Render the Sample Page stickers (store headers, labels and blank pads) and return the PDF bytes"""
+    register_sticker_font()
+    slots = page_slots(SAMPLE_TEMPLATE, A4)
+    labels = [entry for entry in results if not entry.get("isStoreNameRow")]
+    cells = fitted_cells(labels)
+
+    pdf_buffer = BytesIO()
+    pdf = canvas.Canvas(pdf_buffer, pagesize=A4)
+    label_number = 0
+    for index, entry in enumerate(results):
+        slot = index % len(slots)
+        if slot == 0 and index:
+            pdf.showPage()
+        x, y = slots[slot]
+
+        if entry.get("isStoreNameRow"):
+            draw_store_header(pdf, entry["storeName"], x, y)
+            continue
+
+        label = label_number
+        label_number += 1
+        if is_blank_label(entry):
+            continue
+
+        barcode = str(entry.get("barcode", ""))
+        if barcode:
+            box_x, box_y, box_width, box_height = BARCODE_BOX
+            draw_code128(pdf, barcode, x + box_x, y + box_y, box_width, box_height)
+
+        for cell_y, texts, sizes, xs in cells:
+            if texts[label]:
+                pdf.setFont(FONT_NAME, sizes[label])
+                pdf.drawString(x + xs[label], y + cell_y, texts[label])
+
+        # Brand reads bottom to top down the right-hand strip, like the rotated HTML cell
+        pdf.saveState()
+        pdf.translate(x + STRIP_X + mm(11), y + mm(5))
+        pdf.rotate(90)
+        pdf.setFont(FONT_NAME, BRAND_SIZE)
+        pdf.drawString(0, 0, BRAND)
+        pdf.restoreState()
+
+    pdf.save()
+    return pdf_buffer.getvalue()
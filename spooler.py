@@ -0,0 +1,366 @@
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from printers import PRINTER_TIMEOUT, PrinterError, as_bytes, open_printer
+
+# Print spooler: TSPL jobs are written to a SQLite journal, then sent by one
+# asyncio worker per printer on a background thread. The UI only ever waits
+# for the journal insert. A failed send is retried with exponential backoff,
+# and jobs still pending when the process stops are picked up on the next start.
+
+SPOOL_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "print_spool.sqlite3")
+# Bytes of unfinished jobs the spool holds before refusing new ones; a single
+# job larger than this is still taken when the spool is empty
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+SPOOL_MAX_ATTEMPTS = 5
+# Wait before retry n is SPOOL_BACKOFF_SECONDS * 2 ** (n - 1), capped at SPOOL_BACKOFF_MAX_SECONDS
+SPOOL_BACKOFF_SECONDS = 2
+SPOOL_BACKOFF_MAX_SECONDS = 60
+# Finished jobs stay in the journal (without their data) this long
+SPOOL_KEEP_SECONDS = 24 * 60 * 60
+
+# Print job statuses, as stored in the journal
+QUEUED = "queued"
+SENDING = "sending"
+RETRYING = "retrying"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class SpoolerFull(Exception):
+    """Raised by submit() when the job would take the spool past its byte limit"""
+
+
+class PrintSpooler:
+    """Journaled print queue with one sending worker per printer URI.
+
+    Jobs for a printer are sent strictly in submission order; a job being
+    retried holds back the ones behind it so labels never come out of order.
+    A job that was mid-send when the process stopped is sent again in full on
+    restart, since there is no telling how much of it the printer took. With
+    a failover callback set (printer_pool.py), a failed send moves the job to
+    the printer it names instead of retrying in place. A journal belongs to
+    one running app: two spoolers on the same file would both resume its
+    unfinished jobs.
+    """
+
+    def __init__(self, db_path=SPOOL_DB_PATH, max_bytes=SPOOL_MAX_BYTES, max_attempts=SPOOL_MAX_ATTEMPTS,
+                 backoff=SPOOL_BACKOFF_SECONDS, backoff_max=SPOOL_BACKOFF_MAX_SECONDS, timeout=PRINTER_TIMEOUT):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.pending_bytes = 0
+        # Called as failover(printer, job_id, error), off the event loop, when a send fails;
+        # a printer URI it returns gets the job instead
+        self.failover = None
+        self._queues = {}  # printer URI -> asyncio.Queue of job ids
+        self._loop = None
+        self._journal_thread = None
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Called from the UI thread
+    # -------------------------
+    def start(self):
+        """Open the journal, start the worker thread and requeue unfinished jobs; safe to call repeatedly"""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._create_journal()
+            with closing(self._connect()) as conn, conn:
+                conn.execute("UPDATE print_jobs SET status = ? WHERE status IN (?, ?)", (QUEUED, SENDING, RETRYING))
+                pending = conn.execute(
+                    "SELECT id, printer, size FROM print_jobs WHERE status = ? ORDER BY id", (QUEUED,)
+                ).fetchall()
+            self.pending_bytes = sum(size for _, _, size in pending)
+
+            self._loop = asyncio.new_event_loop()
+            self._journal_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="print-journal")
+            threading.Thread(target=self._loop.run_forever, name="print-spooler", daemon=True).start()
+        for job_id, printer, _ in pending:
+            self._call(self._enqueue, printer, job_id)
+
+    def submit(self, printer, data, title=""):
+        """Journal a job for printer (a printers.py URI) and return its id; raises SpoolerFull"""
+        self.start()
+        data = as_bytes(data)
+        with self._lock:
+            if self.pending_bytes and self.pending_bytes + len(data) > self.max_bytes:
+                raise SpoolerFull(
+                    f"{self.pending_bytes:,} bytes already waiting to print; try again when some has printed"
+                )
+            self.pending_bytes += len(data)
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM print_jobs WHERE finished_at < ?", (now - SPOOL_KEEP_SECONDS,))
+                job_id = conn.execute(
+                    "INSERT INTO print_jobs (printer, title, data, size, status, attempts, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                    (printer, title, data, len(data), QUEUED, now),
+                ).lastrowid
+        except sqlite3.Error:
+            self._release(len(data))
+            raise
+        self._call(self._enqueue, printer, job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started sending; returns whether it was cancelled"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT size FROM print_jobs WHERE id = ?", (job_id,)).fetchone()
+            cancelled = conn.execute(
+                "UPDATE print_jobs SET status = ?, data = NULL, finished_at = ?, next_attempt_at = NULL "
+                "WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RETRYING),
+            ).rowcount
+        if not cancelled:
+            return False
+        self._release(row[0])
+        return True
+
+    def reassign(self, job_id, printer):
+        """Move a job that has not started sending to another printer; returns whether it moved"""
+        with closing(self._connect()) as conn, conn:
+            moved = conn.execute(
+                "UPDATE print_jobs SET printer = ?, status = ?, next_attempt_at = NULL WHERE id = ? AND status IN (?, ?)",
+                (printer, QUEUED, job_id, QUEUED, RETRYING),
+            ).rowcount
+        if not moved:
+            return False
+        # The old printer's worker finds the job is no longer its own and skips it
+        self._call(self._enqueue, printer, job_id)
+        return True
+
+    def jobs(self, limit=20):
+        """The most recent jobs, newest first, as dicts without their data"""
+        return self._select("ORDER BY id DESC LIMIT ?", (limit,))
+
+    def pending_by_printer(self):
+        """Bytes of unfinished jobs per printer URI"""
+        self.start()
+        with closing(self._connect()) as conn:
+            return dict(conn.execute(
+                "SELECT printer, SUM(size) FROM print_jobs WHERE status IN (?, ?, ?) GROUP BY printer",
+                (QUEUED, SENDING, RETRYING),
+            ).fetchall())
+
+    def throughput(self):
+        """Bytes per second each printer took its finished jobs at, over the jobs still in the journal.
+
+        A send ends when the printer has buffered the job, so a small job
+        measures the link more than the print head; big ones fill the buffer
+        and are held to the printing speed.
+        """
+        self.start()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT printer, SUM(size), SUM(send_seconds) FROM print_jobs "
+                "WHERE status = ? AND send_seconds > 0 GROUP BY printer",
+                (DONE,),
+            ).fetchall()
+        return {printer: size / seconds for printer, size, seconds in rows}
+
+    def job(self, job_id):
+        """One job as a dict without its data, or None once it has been pruned"""
+        rows = self._select("WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def stop(self):
+        """Stop the worker thread; unfinished jobs stay journaled for the next start"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            journal_thread, self._journal_thread = self._journal_thread, None
+            self._queues = {}
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=self.timeout)
+            loop.call_soon_threadsafe(loop.stop)
+            # Lets a journal write a cancelled worker left running finish
+            journal_thread.shutdown()
+
+    # -------------------------
+    # Journal
+    # -------------------------
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _create_journal(self):
+        with closing(self._connect()) as conn, conn:
+            # WAL lets the UI read job status while a worker is writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS print_jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, printer TEXT NOT NULL, title TEXT, data BLOB, "
+                "size INTEGER NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL, error TEXT, "
+                "created_at REAL NOT NULL, finished_at REAL, next_attempt_at REAL, send_seconds REAL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(print_jobs)")]
+            if "send_seconds" not in columns:
+                # Journals from before throughput was measured
+                conn.execute("ALTER TABLE print_jobs ADD COLUMN send_seconds REAL")
+
+    def _select(self, where, parameters):
+        self.start()
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT id, printer, title, size, status, attempts, error, created_at, finished_at, next_attempt_at "
+                f"FROM print_jobs {where}",
+                parameters,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _read_job(self, job_id):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT status, data, size, attempts FROM print_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"UPDATE print_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _finish(self, job_id, status, size, **fields):
+        self._update(job_id, status=status, data=None, finished_at=time.time(), next_attempt_at=None, **fields)
+        self._release(size)
+
+    def _release(self, size):
+        with self._lock:
+            self.pending_bytes = max(self.pending_bytes - size, 0)
+
+    def _claim(self, job_id, printer):
+        """Mark a queued or retrying job as sending; False if it was cancelled or moved to another printer meanwhile"""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE print_jobs SET status = ?, next_attempt_at = NULL "
+                "WHERE id = ? AND printer = ? AND status IN (?, ?)",
+                (SENDING, job_id, printer, QUEUED, RETRYING),
+            ).rowcount == 1
+
+    def _fail_over(self, printer, job_id, error):
+        if self.failover is None:
+            return False
+        other = self.failover(printer, job_id, error)
+        return other is not None and other != printer and self.reassign(job_id, other)
+
+    # -------------------------
+    # Workers (on the spooler's event loop)
+    # -------------------------
+    def _call(self, coroutine_function, *args):
+        loop = self._loop
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(coroutine_function(*args), loop)
+
+    async def _shutdown(self):
+        workers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in workers:
+            task.cancel()
+        # Let the workers close their transports before the loop goes
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _journal(self, function, *args, **fields):
+        """Run a journal call on the journal thread, so waiting out a locked journal never stalls the loop"""
+        call = functools.partial(function, *args, **fields)
+        return await asyncio.get_running_loop().run_in_executor(self._journal_thread, call)
+
+    async def _enqueue(self, printer, job_id):
+        self._worker_queue(printer).put_nowait(job_id)
+
+    def _worker_queue(self, printer):
+        """The printer's job queue, starting its worker if it has none"""
+        queue = self._queues.get(printer)
+        if queue is None:
+            queue = self._queues[printer] = asyncio.Queue()
+            worker = asyncio.get_running_loop().create_task(self._worker(printer, queue))
+            worker.add_done_callback(functools.partial(self._worker_done, printer, queue))
+        return queue
+
+    def _worker_done(self, printer, queue, worker):
+        """Hand the jobs of a worker that died to a new one, so its printer is not stuck until a restart"""
+        if worker.cancelled() or self._queues.get(printer) is not queue:
+            return
+        del self._queues[printer]
+        replacement = self._worker_queue(printer)
+        while not queue.empty():
+            replacement.put_nowait(queue.get_nowait())
+
+    def _abandon(self, job_id, error):
+        """Fail a job whose handling broke for a reason other than its send, releasing its bytes"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT size FROM print_jobs WHERE id = ? AND status IN (?, ?, ?)", (job_id, QUEUED, SENDING, RETRYING)
+            ).fetchone()
+            conn.execute(
+                "UPDATE print_jobs SET status = ?, data = NULL, finished_at = ?, next_attempt_at = NULL, error = ? "
+                "WHERE id = ? AND status IN (?, ?, ?)",
+                (FAILED, time.time(), f"{type(error).__name__}: {error}", job_id, QUEUED, SENDING, RETRYING),
+            )
+        if row is not None:
+            self._release(row[0])
+
+    async def _worker(self, printer, queue):
+        loop = asyncio.get_running_loop()
+        transport = None
+        try:
+            while True:
+                job_id = await queue.get()
+                try:
+                    row = await self._journal(self._read_job, job_id)
+                    if row is None:
+                        continue
+                    _, data, size, attempts = row
+
+                    # Stops when the job is done, has failed for good, or was cancelled or moved while waiting
+                    while await self._journal(self._claim, job_id, printer):
+                        start = time.perf_counter()
+                        try:
+                            if transport is None:
+                                transport = open_printer(printer, self.timeout)
+                            # Transports block (with their own timeouts), so they run off the loop
+                            await loop.run_in_executor(None, transport.send, data)
+                        except Exception as error:
+                            if not isinstance(error, PrinterError):
+                                # Not a failure the transport reported, so its state is unknown: start afresh
+                                if transport is not None:
+                                    transport.close()
+                                    transport = None
+                                error = f"{type(error).__name__}: {error}"
+                            attempts += 1
+                            await self._journal(
+                                self._update, job_id, status=RETRYING, attempts=attempts, error=str(error)
+                            )
+                            # Attempts go with a job that moves, so it cannot bounce between printers for ever
+                            if attempts >= self.max_attempts:
+                                await self._journal(
+                                    self._finish, job_id, FAILED, size, attempts=attempts, error=str(error)
+                                )
+                                break
+                            # The callback checks printers and moves jobs in the journal, so it runs off the loop
+                            if await loop.run_in_executor(None, self._fail_over, printer, job_id, error):
+                                break
+                            delay = min(self.backoff * 2 ** (attempts - 1), self.backoff_max)
+                            await self._journal(self._update, job_id, next_attempt_at=time.time() + delay)
+                            await asyncio.sleep(delay)
+                            continue
+                        await self._journal(self._finish, job_id, DONE, size, attempts=attempts + 1, error=None,
+                                            send_seconds=time.perf_counter() - start)
+                        break
+                except Exception as error:
+                    # Such as a journal or failover error: this job fails, the ones behind it still go out
+                    await self._journal(self._abandon, job_id, error)
+        finally:
+            if transport is not None:
+                transport.close()
+
+
+print_spooler = PrintSpooler()
@@ -0,0 +1,653 @@
+import os
+import io
+import hashlib
+import multiprocessing
+import threading
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from functools import lru_cache
+from itertools import groupby
+import pandas as pd
+import qrcode
+from reportlab.lib.pagesizes import landscape, A3
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase import pdfmetrics
+from io import BytesIO
+from reportlab.lib.utils import ImageReader
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from caching import BytesLRUCache
+import text_metrics
+
+# Sticker PDF rendering. Kept free of Streamlit so it can be imported by
+# benchmarks and by the worker processes of the parallel renderer.
+
+def mm(value):
+    return value * 2.83465
+
+# Font used by every sticker design, shipped next to this file
+FONT_NAME = "Mitr-SemiBold"
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Mitr-SemiBold.ttf")
+font_lock = threading.Lock()
+
+def register_sticker_font():
+    """Register Mitr-SemiBold once per process; every later call returns straight away"""
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return
+    with font_lock:
+        # Another session may have registered it while we waited for the lock
+        if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+# Names of the '-' separated parts of a location value, in order
+LOCATION_PARTS = ["Rack", "Level", "Position"]
+
+def extract_locations(dfs):
+    """Collect the distinct location values of all uploaded sheets into one table.
+
+    Values keep the old order (file by file, column by column) and are de-duplicated
+    within each column. The returned DataFrame is indexed by a 1-based ID that is
+    unique across all files and holds the original `value` plus one column per
+    '-' separated part (Rack, Level, Position, then "Part 4" ... if present).
+    """
+    columns = [
+        df.iloc[:, i].dropna().drop_duplicates()
+        for df in dfs
+        for i in range(df.shape[1])
+    ]
+    values = pd.concat(columns, ignore_index=True) if columns else pd.Series(dtype=object)
+    if values.empty:
+        # Nothing but headers and blank cells; an empty Series would keep a non-string dtype
+        return pd.DataFrame(columns=["value"] + LOCATION_PARTS)
+
+    values = values.map(str)
+    parts = values.str.split('-', expand=True).apply(lambda part: part.str.strip())
+    parts = parts.reindex(columns=range(max(parts.shape[1], len(LOCATION_PARTS))))
+    parts.columns = LOCATION_PARTS + [f"Part {i + 1}" for i in range(len(LOCATION_PARTS), parts.shape[1])]
+
+    locations = pd.concat([values.rename("value"), parts], axis=1)
+    locations.index = pd.RangeIndex(1, len(locations) + 1, name="id")
+    return locations
+
+# QR tiles are cached per process (shared by all sessions), bounded by decoded image size.
+# Set QR_CACHE_DIR to also keep the encoded PNGs on disk across restarts.
+QR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+QR_CACHE_DIR = os.environ.get("QR_CACHE_DIR")
+
+def qr_tile_size(tile):
+    width, height = tile.getSize()
+    return width * height * 3  # ImageReader keeps the decoded RGB data
+
+qr_tile_cache = BytesLRUCache(QR_CACHE_MAX_BYTES, sizeof=qr_tile_size)
+qr_disk_stats = {"hits": 0, "misses": 0}
+
+def render_qr_png(data, size_mm, error_correction):
+    """Encode data as a QR code and return it as PNG bytes at 300 DPI"""
+    # Create QR code instance
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=10,
+        border=0
+    )
+    
+    # Add data
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    # Create image
+    qr_image = qr.make_image(fill_color="black", back_color="white")
+    
+    # Convert to desired size in pixels (assuming 300 DPI)
+    size_pixels = int(mm(size_mm) * 300 / 72)  # Convert mm to pixels at 300 DPI
+    qr_image = qr_image.resize((size_pixels, size_pixels), Image.Resampling.LANCZOS)
+    
+    # Convert to bytes
+    img_byte_arr = io.BytesIO()
+    qr_image.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+def load_qr_png(data, size_mm, error_correction):
+    """Render the QR PNG, going through the on-disk tier when QR_CACHE_DIR is set"""
+    if not QR_CACHE_DIR:
+        return render_qr_png(data, size_mm, error_correction)
+
+    key = f"{error_correction}|{size_mm!r}|{data}".encode("utf-8")
+    path = os.path.join(QR_CACHE_DIR, hashlib.sha256(key).hexdigest() + ".png")
+    try:
+        with open(path, "rb") as f:
+            png = f.read()
+        qr_disk_stats["hits"] += 1
+        return png
+    except FileNotFoundError:
+        qr_disk_stats["misses"] += 1
+
+    png = render_qr_png(data, size_mm, error_correction)
+    os.makedirs(QR_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, path)  # Atomic, so concurrent sessions never read half a file
+    return png
+
+def create_qr_code(data, size_mm, error_correction=qrcode.constants.ERROR_CORRECT_L):
+    """Generate QR code and return it as a reportlab-compatible image reader"""
+    data = str(data)
+
+    def build_tile():
+        tile = ImageReader(io.BytesIO(load_qr_png(data, size_mm, error_correction)))
+        tile.getRGBData()  # Decode now so every later draw reuses the pixels
+        return tile
+
+    return qr_tile_cache.get_or_create((data, size_mm, error_correction), build_tile)
+
+# QR rendering modes: a 300 DPI PNG per label, or the module matrix drawn as PDF rectangles
+QR_MODE_RASTER = "raster"
+QR_MODE_VECTOR = "vector"
+QR_MODES = {"Raster (PNG)": QR_MODE_RASTER, "Vector": QR_MODE_VECTOR}
+
+@lru_cache(maxsize=16384)
+def qr_module_runs(data, error_correction=qrcode.constants.ERROR_CORRECT_L):
+    """Return (module count, [(row, first column, run length), ...]) for the dark modules"""
+    qr = qrcode.QRCode(version=1, error_correction=error_correction, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    runs = []
+    for row, modules in enumerate(matrix):
+        column = 0
+        for is_dark, group in groupby(modules):
+            length = len(list(group))
+            if is_dark:
+                runs.append((row, column, length))
+            column += length
+    return len(matrix), tuple(runs)
+
+def draw_qr_vector(pdf, data, x, y, size, error_correction=qrcode.constants.ERROR_CORRECT_L):
+    """Draw a QR code as one filled path, each horizontal run of dark modules being one rectangle"""
+    module_count, runs = qr_module_runs(str(data), error_correction)
+    module = size / module_count
+    top = y + size
+
+    path = pdf.beginPath()
+    for row, column, length in runs:
+        path.rect(x + column * module, top - (row + 1) * module, length * module, module)
+
+    pdf.saveState()
+    pdf.setFillColor(colors.black)
+    pdf.drawPath(path, stroke=0, fill=1)
+    pdf.restoreState()
+
+def draw_qr_code(pdf, data, x, y, size, qr_mode=QR_MODE_RASTER):
+    if qr_mode == QR_MODE_VECTOR:
+        draw_qr_vector(pdf, data, x, y, size)
+    else:
+        qr_image = create_qr_code(data, size_mm=size / mm(1))
+        pdf.drawImage(qr_image, x, y, width=size, height=size)
+
+# -------------------------
+# Sticker Templates
+# -------------------------
+# Every sticker design is data: the label size, how labels are laid out on the
+# page and the elements drawn on each label, in drawing order. Coordinates are
+# relative to the label's bottom-left corner. Element kinds:
+#   {"box": (x, y, w, h), "fill": colour or None}      rectangle, always outlined
+#   {"line": (x1, y1, x2, y2)}
+#   {"text": "Rack", "at": (x, y), "width": w, ...}     fixed caption
+#   {"field": "Rack", "at": (x, y), "width": w, ...}    per-label text: "value", a
+#       part column of extract_locations(), or "last_letter". "wrap_line"/"chars_per_line"
+#       take one slice of the value; "fit": (max width, smallest size) shrinks it to fit,
+#       by default the width less FIT_PADDING, down to FIT_MIN_SIZE
+#   {"qr": "value", "at": (x, y), "size": s}
+# Text is centred across `width` and drawn in Mitr-SemiBold, black unless "color" is set.
+# Boxes, lines and captions are static: each run of them is drawn once per PDF as a
+# form XObject and stamped on every label, so list them ahead of the per-label
+# elements wherever the layering allows.
+STATIC_OPS = ("box", "line", "text")
+FIT_PADDING = mm(2)
+FIT_MIN_SIZE = 6
+
+STICKER_TEMPLATES = {
+    # Sticker 1: blue Rack / Level / Position
+    "rack_blue": {
+        "label_size": (3 * mm(24.70), mm(24)),
+        "grid": {"left": mm(19.40), "right": 0, "top": mm(14.11), "bottom": mm(14.11), "gap": mm(3)},
+        "line_width": mm(0.035),
+        "elements": [
+            {"box": (0, 0, mm(24.70), mm(24)), "fill": "#2633cf"},
+            {"box": (mm(24.70), 0, mm(24.70), mm(24)), "fill": "#2633cf"},
+            {"box": (2 * mm(24.70), 0, mm(24.70), mm(24)), "fill": "#2633cf"},
+            {"text": "Rack", "at": (0, mm(1.76)), "width": mm(24.70), "size": mm(3.2), "color": "#b3b3b3"},
+            {"text": "Level", "at": (mm(24.70), mm(1.76)), "width": mm(24.70), "size": mm(3.2), "color": "#b3b3b3"},
+            {"text": "Position", "at": (2 * mm(24.70), mm(1.76)), "width": mm(24.70), "size": mm(3.2), "color": "#b3b3b3"},
+            {"field": "Rack", "at": (0, mm(7.76)), "width": mm(24.70), "size": 16.92, "color": "#b3b3b3"},
+            {"field": "Level", "at": (mm(24.70), mm(7.76)), "width": mm(24.70), "size": 16.92, "color": "#b3b3b3"},
+            {"field": "Position", "at": (2 * mm(24.70), mm(7.76)), "width": mm(24.70), "size": 16.92, "color": "#b3b3b3"},
+        ],
+    },
+    # Sticker 2: pastel Rack / Level / Position
+    "rack_colored": {
+        "label_size": (3 * mm(24.70), mm(24)),
+        "grid": {"left": mm(19.40), "right": 0, "top": mm(14.11), "bottom": mm(14.11), "gap": mm(2.99)},
+        "line_width": mm(0.035),
+        "elements": [
+            {"box": (0, 0, mm(24.70), mm(24)), "fill": "#D8E1F1"},
+            {"box": (mm(24.70), 0, mm(24.70), mm(24)), "fill": "#E1E101"},
+            {"box": (2 * mm(24.70), 0, mm(24.70), mm(24)), "fill": "#E2EFD8"},
+            {"text": "Rack", "at": (0, mm(1.76)), "width": mm(24.70), "size": mm(3.2)},
+            {"text": "Level", "at": (mm(24.70), mm(1.76)), "width": mm(24.70), "size": mm(3.2)},
+            {"text": "Position", "at": (2 * mm(24.70), mm(1.76)), "width": mm(24.70), "size": mm(3.2)},
+            {"field": "Rack", "at": (0, mm(7.76)), "width": mm(24.70), "size": mm(16.92)},
+            {"field": "Level", "at": (mm(24.70), mm(7.76)), "width": mm(24.70), "size": mm(16.92)},
+            {"field": "Position", "at": (2 * mm(24.70), mm(7.76)), "width": mm(24.70), "size": mm(16.92)},
+        ],
+    },
+    # Sticker 3: QR + Rack / Level / Position + arrow
+    "rack_qr": {
+        "label_size": (mm(26) + 3 * mm(24.70) + mm(10), mm(24)),
+        "grid": {"left": mm(19.40), "right": mm(19.40), "top": mm(14.11), "bottom": mm(14.11), "gap": mm(2.99)},
+        "line_width": mm(0.035),
+        "elements": [
+            {"box": (0, 0, mm(26), mm(24)), "fill": "#FFFFFF"},
+            {"box": (mm(26), 0, mm(24.70), mm(24)), "fill": "#D8E1F1"},
+            {"box": (mm(26) + mm(24.70), 0, mm(24.70), mm(24)), "fill": "#E1E101"},
+            {"box": (mm(26) + 2 * mm(24.70), 0, mm(24.70), mm(24)), "fill": "#E2EFD8"},
+            {"box": (mm(26) + 3 * mm(24.70), 0, mm(10), mm(24)), "fill": "#FFF2CD"},
+            {"text": "Rack", "at": (mm(26), mm(1.76)), "width": mm(24.70), "size": mm(3.2)},
+            {"text": "Level", "at": (mm(26) + mm(24.70), mm(1.76)), "width": mm(24.70), "size": mm(3.2)},
+            {"text": "Position", "at": (mm(26) + 2 * mm(24.70), mm(1.76)), "width": mm(24.70), "size": mm(3.2)},
+            {"text": "↑", "at": (mm(26) + 3 * mm(24.70), mm(6)), "width": mm(10), "size": mm(14)},
+            {"qr": "value", "at": ((mm(26) - mm(21)) / 2, (mm(24) - mm(21)) / 2), "size": mm(21)},
+            {"field": "Rack", "at": (mm(26), mm(7.76)), "width": mm(24.70), "size": mm(16.93)},
+            {"field": "Level", "at": (mm(26) + mm(24.70), mm(7.76)), "width": mm(24.70), "size": mm(16.93)},
+            {"field": "Position", "at": (mm(26) + 2 * mm(24.70), mm(7.76)), "width": mm(24.70), "size": mm(16.93)},
+            {"field": "Part 4", "at": (mm(26) + 3 * mm(24.70), mm(7.76)), "width": mm(10), "size": mm(16.93)},
+        ],
+    },
+    # Sticker 4: QR with orange name band
+    "qr_orange": {
+        "label_size": (mm(40), mm(46)),
+        "grid": {"left": mm(9.5), "right": mm(9.5), "top": mm(14.11), "bottom": mm(14.11), "gap": mm(5)},
+        "elements": [
+            {"box": (0, 0, mm(40), mm(46)), "fill": None},
+            {"line": (0, mm(8), mm(40), mm(8))},
+            {"box": (0, 0, mm(40), mm(8)), "fill": "#FF6700"},
+            {"qr": "value", "at": ((mm(40) - mm(35)) / 2, mm(9.5)), "size": mm(35)},
+            {"field": "value", "wrap_line": 0, "chars_per_line": 12, "at": (0, mm(2.5)), "width": mm(40), "size": 14},
+            {"field": "value", "wrap_line": 1, "chars_per_line": 12, "at": (0, mm(-2.5)), "width": mm(40), "size": 14},
+        ],
+    },
+    # Sticker 5: QR with the value's last letter in big type
+    "qr_alpha": {
+        "label_size": (mm(34), mm(66)),
+        "grid": {"left": mm(9.5), "right": mm(9.5), "top": mm(14.11), "bottom": mm(14.11), "gap": mm(5)},
+        "elements": [
+            {"box": (0, 0, mm(34), mm(66)), "fill": None},
+            {"box": (mm(2), mm(29.5), mm(30), mm(34.5)), "fill": None},
+            {"box": (mm(2), mm(1.5), mm(30), mm(26.5)), "fill": "#E2EFDB"},
+            {"field": "last_letter", "at": (0, mm(2.5)), "width": mm(34), "size": 100},
+            {"qr": "value", "at": ((mm(34) - mm(25)) / 2, mm(37)), "size": mm(25)},
+            {"field": "value", "at": (0, mm(31.5)), "width": mm(34), "size": 12, "fit": (mm(30), 8)},
+        ],
+    },
+    # Sticker 6: QR with gold name band
+    "qr_gold": {
+        "label_size": (mm(40), mm(46)),
+        "grid": {"left": mm(9.5), "right": mm(9.5), "top": mm(14.11), "bottom": mm(14.11), "gap": mm(5)},
+        "elements": [
+            {"box": (0, 0, mm(40), mm(46)), "fill": None},
+            {"line": (0, mm(8), mm(40), mm(8))},
+            {"box": (0, 0, mm(40), mm(8)), "fill": "#FFD700"},
+            {"qr": "value", "at": ((mm(40) - mm(35)) / 2, mm(9.5)), "size": mm(35)},
+            {"field": "value", "wrap_line": 0, "chars_per_line": 12, "at": (0, mm(2.5)), "width": mm(40), "size": 14},
+            {"field": "value", "wrap_line": 1, "chars_per_line": 12, "at": (0, mm(-2.5)), "width": mm(40), "size": 14},
+        ],
+    },
+}
+
+def page_slots(template, page_size):
+    """Bottom-left corners of every label on a page, filled row by row from the top"""
+    page_width, page_height = page_size
+    label_width, label_height = template["label_size"]
+    grid = template["grid"]
+    step_x = label_width + grid["gap"]
+    step_y = label_height + grid["gap"]
+
+    # The small epsilon keeps labels that end exactly on a margin from being dropped by rounding
+    columns = 1 + int((page_width - grid["left"] - grid["right"] - label_width) / step_x + 1e-9)
+    rows = 1 + int((page_height - grid["top"] - grid["bottom"] - label_height) / step_y + 1e-9)
+    top = page_height - grid["top"]
+    return [
+        (grid["left"] + column * step_x, top - row * step_y - label_height)
+        for row in range(rows)
+        for column in range(columns)
+    ]
+
+@lru_cache(maxsize=None)
+def compile_template(name):
+    """Turn a template definition into a draw plan: colours parsed, captions measured, slots laid out"""
+    register_sticker_font()
+    template = STICKER_TEMPLATES[name]
+    page_size = landscape(A3)
+    ops = []
+
+    # One colour object per hex value, so the executor can skip repeated setFillColor calls
+    palette = {}
+    def color_of(hex_value):
+        return palette.setdefault(hex_value, colors.HexColor(hex_value))
+
+    for element in template["elements"]:
+        color = color_of(element.get("color", "#000000"))
+        if "box" in element:
+            fill = element["fill"]
+            ops.append(("box", *element["box"], color_of(fill) if fill else None))
+        elif "line" in element:
+            ops.append(("line", *element["line"]))
+        elif "text" in element:
+            x, y = element["at"]
+            text_width = pdfmetrics.stringWidth(element["text"], FONT_NAME, element["size"])
+            ops.append(("text", x + (element["width"] - text_width) / 2, y, element["size"], color, element["text"]))
+        elif "field" in element:
+            x, y = element["at"]
+            chars = element.get("chars_per_line")
+            line = (element["wrap_line"] * chars, (element["wrap_line"] + 1) * chars) if chars else None
+            fit = element.get("fit", (element["width"] - FIT_PADDING, FIT_MIN_SIZE))
+            ops.append(("field", x, y, element["width"], element["size"], color, element["field"], line, fit))
+        elif "qr" in element:
+            ops.append(("qr", *element["at"], element["size"], element["qr"]))
+
+    # Each run of static elements becomes one form XObject: drawn once per PDF,
+    # then stamped on every label with a single Do instead of being redrawn
+    forms = {}
+    label_ops = []
+    for op in ops:
+        if op[0] not in STATIC_OPS:
+            label_ops.append(op)
+            continue
+        if not label_ops or label_ops[-1][0] != "form":
+            form_name = f"{name}_{len(forms)}"
+            forms[form_name] = []
+            label_ops.append(("form", form_name))
+        forms[label_ops[-1][1]].append(op)
+
+    return {
+        "page_size": page_size,
+        "label_size": template["label_size"],
+        "line_width": template.get("line_width"),
+        "slots": page_slots(template, page_size),
+        "forms": forms,
+        "ops": label_ops,
+    }
+
+def field_values(locations, field):
+    """Per-label strings for a template field (None where a label has no such part)"""
+    if field == "last_letter":
+        return [value[-1] if value else None for value in locations["value"]]
+    if field in locations.columns:
+        return [value if isinstance(value, str) else None for value in locations[field]]
+    return [None] * len(locations)
+
+def layout_field(op, locations):
+    """Text, fitted font size and x position of one field for every label, measured in one pass"""
+    _, x, y, width, size, color, field, line, (max_width, min_size) = op
+    texts = field_values(locations, field)
+    if line:
+        texts = [text[line[0]:line[1]] if text else None for text in texts]
+    units = text_metrics.text_units(texts, FONT_NAME)
+    sizes = text_metrics.fit_sizes(units, size, max_width, min_size)
+    xs = x + (width - units * sizes / 1000) / 2
+    return ("field", y, color, texts, sizes.tolist(), xs.tolist())
+
+def define_forms(pdf, plan):
+    """Record the template's static element runs as form XObjects on this canvas"""
+    label_width, label_height = plan["label_size"]
+    # Pad the bounding box so outlines on the label's edge are not clipped
+    pad = mm(1)
+    for form_name, form_ops in plan["forms"].items():
+        pdf.beginForm(form_name, -pad, -pad, label_width + pad, label_height + pad)
+        if plan["line_width"] is not None:
+            pdf.setLineWidth(plan["line_width"])
+        for op in form_ops:
+            kind = op[0]
+            if kind == "box":
+                _, x, y, width, height, fill = op
+                if fill is not None:
+                    pdf.setFillColor(fill)
+                pdf.rect(x, y, width, height, fill=fill is not None)
+            elif kind == "line":
+                _, x1, y1, x2, y2 = op
+                pdf.line(x1, y1, x2, y2)
+            else:
+                _, x, y, size, color, text = op
+                pdf.setFont(FONT_NAME, size)
+                pdf.setFillColor(color)
+                pdf.drawString(x, y, text)
+        pdf.endForm()
+
+def draw_labels(pdf, plan, locations, qr_mode=QR_MODE_RASTER, progress=None):
+    """Draw every label of a compiled template onto the canvas, adding pages as needed.
+
+    `progress`, when given, is called with the number of labels drawn so far after
+    every finished page; an exception it raises stops the render.
+    """
+    slots = plan["slots"]
+    ops = plan["ops"]
+    define_forms(pdf, plan)
+    # Field text is fitted for all labels up front, so the loop below only draws
+    ops = [
+        layout_field(op, locations) if op[0] == "field"
+        else (*op, field_values(locations, op[4])) if op[0] == "qr"
+        else op
+        for op in ops
+    ]
+
+    for index in range(len(locations)):
+        slot = index % len(slots)
+        if slot == 0:
+            if index:
+                pdf.showPage()
+                if progress is not None:
+                    progress(index)
+            if plan["line_width"] is not None:
+                pdf.setLineWidth(plan["line_width"])
+            # A new page starts with fresh graphics state
+            current_fill = current_size = None
+        x_offset, y_offset = slots[slot]
+
+        for op in ops:
+            kind = op[0]
+            if kind == "form":
+                # saveState/restoreState keep the tracked fill colour and font valid
+                pdf.saveState()
+                pdf.translate(x_offset, y_offset)
+                pdf.doForm(op[1])
+                pdf.restoreState()
+            elif kind == "qr":
+                _, x, y, size, field, values = op
+                data = values[index]
+                if data:
+                    draw_qr_code(pdf, data, x_offset + x, y_offset + y, size, qr_mode)
+            else:
+                _, y, color, texts, sizes, xs = op
+                text = texts[index]
+                if not text:
+                    continue
+                size = sizes[index]
+                if size != current_size:
+                    pdf.setFont(FONT_NAME, size)
+                    current_size = size
+                if color is not current_fill:
+                    pdf.setFillColor(color)
+                    current_fill = color
+                pdf.drawString(x_offset + xs[index], y_offset + y, text)
+
+    if progress is not None:
+        progress(len(locations))
+
+def render_template(name, locations, qr_mode=QR_MODE_RASTER, output=None, progress=None):
+    """Render one sticker template for every location.
+
+    Returns the PDF bytes, or writes the PDF to `output` (a path or binary
+    file) and returns `output` when one is given.
+    """
+    plan = compile_template(name)
+
+    # Create a BytesIO buffer to save the PDF in memory, unless it goes straight to a file
+    pdf_buffer = BytesIO() if output is None else output
+    pdf = canvas.Canvas(pdf_buffer, pagesize=plan["page_size"])
+    draw_labels(pdf, plan, locations, qr_mode, progress)
+    pdf.save()
+    return pdf_buffer.getvalue() if output is None else output
+
+def page_chunks(name, locations, pages_per_chunk):
+    """Split a job into runs of whole pages, so every chunk starts where the full render breaks the page"""
+    chunk_labels = pages_per_chunk * labels_per_page(name)
+    return [locations.iloc[start:start + chunk_labels] for start in range(0, len(locations), chunk_labels)]
+
+def stitch_pdfs(sources, output):
+    """Append the pages of every source PDF (bytes or a path) to `output` (a path or binary file)"""
+    writer = PdfWriter()
+    with ExitStack() as files:
+        for source in sources:
+            # An open file lets pypdf read objects on demand instead of loading the whole part
+            stream = BytesIO(source) if isinstance(source, bytes) else files.enter_context(open(source, "rb"))
+            for page in PdfReader(stream).pages:
+                writer.add_page(page)
+        writer.write(output)
+
+# -------------------------
+# Streaming Output
+# -------------------------
+# A file job is rendered this many pages at a time, so reportlab never holds more than
+# one chunk's drawing operations; only the finished, compressed pages are kept until stitched
+STREAM_PAGES_PER_CHUNK = 25
+
+def part_paths(output, count):
+    return [f"{output}.part{number}" for number in range(count)]
+
+def offset_progress(progress, start):
+    """Progress callback for a chunk that begins `start` labels into the job"""
+    if progress is None:
+        return None
+    return lambda done: progress(start + done)
+
+def render_to_file(name, locations, output, progress=None, **options):
+    """Render a sticker job into the file at `output` chunk by chunk and return the path"""
+    chunks = page_chunks(name, locations, STREAM_PAGES_PER_CHUNK)
+    if len(chunks) <= 1:
+        return render_template(name, locations, output=output, progress=progress, **options)
+
+    parts = part_paths(output, len(chunks))
+    try:
+        start = 0
+        for chunk, part in zip(chunks, parts):
+            render_template(name, chunk, output=part, progress=offset_progress(progress, start), **options)
+            start += len(chunk)
+        stitch_pdfs(parts, output)
+    finally:
+        remove_files(parts)
+    return output
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+# -------------------------
+# Parallel Rendering
+# -------------------------
+# Below this many pages a job is rendered in-process; starting workers would cost more than it saves
+PARALLEL_MIN_PAGES = 4
+
+def labels_per_page(name):
+    return len(compile_template(name)["slots"])
+
+render_pool = None
+render_pool_workers = 0
+render_pool_lock = threading.Lock()
+
+def init_render_worker():
+    """Runs once in every worker process before it renders anything"""
+    register_sticker_font()
+
+def get_render_pool(workers):
+    """Return the shared worker pool, (re)creating it when the requested size changes"""
+    global render_pool, render_pool_workers
+    with render_pool_lock:
+        if render_pool is None or render_pool_workers != workers:
+            if render_pool is not None:
+                render_pool.shutdown(wait=False)
+            # By now the app runs Streamlit, job runner and spooler threads, and a plain fork
+            # would copy any lock one of them holds. Workers fork instead from a single-threaded
+            # server that has imported this module once. Like spawn, each worker imports the
+            # main script; the Streamlit launcher and the benchmarks keep theirs behind a
+            # __main__ guard.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if "forkserver" in methods:
+                context.set_forkserver_preload([__name__])
+            render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_render_worker)
+            render_pool_workers = workers
+        return render_pool
+
+def render_parallel(name, locations, workers=None, output=None, progress=None, **options):
+    """Render a sticker job in page-aligned chunks across a process pool and stitch the pages.
+
+    Every chunk starts on a fresh page, exactly where the sequential render would have
+    broken the page, so the stitched document matches the sequential one page for page.
+    With an `output` path the workers write their chunks next to it instead of sending
+    the bytes back, and the stitched PDF is written to that path. `progress` is called
+    in this process as chunks finish; if it raises, chunks not yet started are dropped.
+    """
+    workers = workers or os.cpu_count() or 1
+    total_pages = -(-len(locations) // labels_per_page(name))
+
+    # A few chunks per worker keeps every core busy even when chunks finish unevenly
+    pages_per_chunk = max(1, -(-total_pages // (workers * 3)))
+    if output is not None:
+        pages_per_chunk = min(pages_per_chunk, STREAM_PAGES_PER_CHUNK)
+    chunks = page_chunks(name, locations, pages_per_chunk)
+
+    pool = get_render_pool(workers)
+    parts = part_paths(output, len(chunks)) if output is not None else [None] * len(chunks)
+    futures = [pool.submit(render_template, name, chunk, output=part, **options) for chunk, part in zip(chunks, parts)]
+    try:
+        if progress is not None:
+            labels = dict(zip(futures, map(len, chunks)))
+            done = 0
+            for future in as_completed(futures):
+                done += labels[future]
+                progress(done)
+        results = [future.result() for future in futures]
+
+        if output is None:
+            pdf_buffer = BytesIO()
+            stitch_pdfs(results, pdf_buffer)
+            return pdf_buffer.getvalue()
+        stitch_pdfs(results, output)
+        return output
+    finally:
+        # Drop chunks nobody will use and let running ones finish before their parts are removed
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        if output is not None:
+            remove_files(parts)
+
+def render_stickers(name, locations, parallel=False, output=None, progress=None, **options):
+    """Render a sticker template, fanning big jobs out over all cores when parallel is set.
+
+    Returns the PDF bytes, or the `output` path once the PDF has been written there.
+    `progress` is called with the number of labels done as the render advances.
+    """
+    if parallel and (os.cpu_count() or 1) > 1:
+        if len(locations) >= PARALLEL_MIN_PAGES * labels_per_page(name):
+            return render_parallel(name, locations, output=output, progress=progress, **options)
+    if output is not None:
+        return render_to_file(name, locations, output, progress=progress, **options)
+    return render_template(name, locations, progress=progress, **options)
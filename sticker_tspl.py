@@ -0,0 +1,202 @@
+import re
+from functools import lru_cache
+import numpy as np
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.pdfbase import pdfmetrics
+from sticker_pdf import FONT_NAME, FONT_PATH, compile_template, field_values, layout_field, mm, qr_module_runs
+from tspl import SCALABLE_FONT_ASCENT, TSPL_ENCODING, tspl_string
+
+# The sticker designs of sticker_pdf.py as TSPL, one label per print on roll
+# stock instead of a grid on A3. Text uses the printer's scalable font, QR codes
+# its QRCODE command and outlines BOX/BAR. A thermal head has no colour: dark
+# fills print solid with what is drawn on them reversed out in white, light
+# fills print as a dithered 1-bit BITMAP tint. What every label shares is
+# downloaded once per job as two stored programs, drawn under and over each
+# label's own QR codes and fields, so a label only sends those.
+
+THERMAL_DPI = 300
+# Printable width of the TTP-345's head; wider designs are cut off at the right
+PRINT_WIDTH_MM = 108
+STICKER_MEDIA = """GAP 3 mm, 0
+DIRECTION 1
+"""
+# Built-in scalable font; its TEXT multipliers are point sizes
+SCALABLE_FONT = "0"
+# Fills with a luminance below this print solid, above it as a tint
+DARK_FILL_LUMINANCE = 0.4
+# Darkest a tint gets, so black text on it stays readable
+MAX_TINT = 0.25
+# 4 x 4 ordered dither thresholds
+BAYER_4 = (np.array([[0, 8, 2, 10], [12, 4, 14, 6], [3, 11, 1, 9], [15, 7, 13, 5]]) + 0.5) / 16
+QR_ERROR_CORRECTION = "L"
+# Stored programs drawing the static part of a sticker: the background with
+# its tints and fixed text, and the reversed fills and outlines, then PRINT
+BACKGROUND_PROGRAM = "STKBG"
+FOREGROUND_PROGRAM = "STKFG"
+# A stored program ends at the first EOP line, and raw BITMAP data can happen to hold one
+PROGRAM_END = re.compile(rb"EOP\r?\n")
+
+
+def dots(points, dpi=THERMAL_DPI):
+    return points * dpi / 72
+
+
+def luminance(color):
+    return 0.2126 * color.red + 0.7152 * color.green + 0.0722 * color.blue
+
+
+def bitmap_command(x, y, ink):
+    """BITMAP (OR mode) stamping a boolean ink array with its top-left corner at x, y"""
+    height, width = ink.shape
+    padded = np.zeros((height, -(-width // 8) * 8), dtype=bool)
+    padded[:, :width] = ink
+    # Bit 1 is a white dot in TSPL bitmap data
+    data = np.packbits(~padded, axis=1)
+    return f"BITMAP {x},{y},{data.shape[1]},{height},1,".encode(TSPL_ENCODING) + data.tobytes() + b"\n"
+
+
+def tint_ink(x, y, width, height, density):
+    """Ordered-dither ink for a density (0..1) tint, aligned to the label so neighbouring tints meet cleanly"""
+    rows = (np.arange(y, y + height) % 4)[:, None]
+    columns = (np.arange(x, x + width) % 4)[None, :]
+    return BAYER_4[rows, columns] < density
+
+
+def text_ink(text, size):
+    """Text in the sticker TTF at size dots (em) as ink, in a cell laid out like a scalable-font TEXT"""
+    font = ImageFont.truetype(FONT_PATH, max(int(size), 1))
+    image = Image.new("1", (max(int(font.getlength(text)) + 1, 1), max(int(size), 1)), 0)
+    ImageDraw.Draw(image).text((0, round(size * SCALABLE_FONT_ASCENT)), text, fill=1, font=font, anchor="ls")
+    return np.array(image, dtype=bool)
+
+
+def text_command(x, y, size, text):
+    """TEXT in the scalable font, centred on x, with the top of its cell at y"""
+    size = max(int(size), 1)
+    return f'TEXT {x},{y},"{SCALABLE_FONT}",0,{size},{size},2,"{tspl_string(text)}"\n'
+
+
+@lru_cache(maxsize=None)
+def compile_sticker_form(name, dpi=THERMAL_DPI):
+    """A template as TSPL: the media setup, the download of its stored programs,
+    and the per-label ops with their label-space geometry"""
+    plan = compile_template(name)
+    label_width, label_height = plan["label_size"]
+    label_height_dots = dots(label_height, dpi)
+    thickness = max(round(dots(plan["line_width"] or 1, dpi)), 1)
+
+    def top(y):
+        return round(label_height_dots - dots(y, dpi))
+
+    before, after, outlines, label_ops = [], [], [], []
+    # Background bitmaps that cannot go in a stored program, sent with every label instead;
+    # bitmaps and text only add ink, so drawing them after the rest of the background is the same
+    unstored = []
+
+    def background_bitmap(command):
+        (unstored if PROGRAM_END.search(command) else before).append(command)
+
+    for op in plan["ops"]:
+        if op[0] != "form":
+            label_ops.append(op)
+            continue
+        for static in plan["forms"][op[1]]:
+            kind = static[0]
+            if kind == "box":
+                _, x, y, width, height, fill = static
+                x0, y0 = round(dots(x, dpi)), top(y + height)
+                width_dots, height_dots = round(dots(width, dpi)), round(dots(height, dpi))
+                if fill is not None and luminance(fill) < DARK_FILL_LUMINANCE:
+                    # Reversed after the text so the text on it comes out white
+                    after.append(f"REVERSE {x0},{y0},{width_dots},{height_dots}\n".encode(TSPL_ENCODING))
+                elif fill is not None and luminance(fill) < 1:
+                    ink = tint_ink(x0, y0, width_dots, height_dots, min(1 - luminance(fill), MAX_TINT))
+                    background_bitmap(bitmap_command(x0, y0, ink))
+                outlines.append(
+                    f"BOX {x0},{y0},{x0 + width_dots - 1},{y0 + height_dots - 1},{thickness}\n".encode(TSPL_ENCODING)
+                )
+            elif kind == "line":
+                _, x1, y1, x2, y2 = static
+                if y1 == y2:
+                    outlines.append(
+                        f"BAR {round(dots(min(x1, x2), dpi))},{top(y1)},"
+                        f"{round(dots(abs(x2 - x1), dpi))},{thickness}\n".encode(TSPL_ENCODING)
+                    )
+                elif x1 == x2:
+                    outlines.append(
+                        f"BAR {round(dots(x1, dpi))},{top(max(y1, y2))},{thickness},"
+                        f"{round(dots(abs(y2 - y1), dpi))}\n".encode(TSPL_ENCODING)
+                    )
+                else:
+                    raise ValueError(f"{name}: TSPL has no diagonal lines")
+            else:
+                _, x, y, size, _, text = static
+                text_top = top(y + SCALABLE_FONT_ASCENT * size)
+                try:
+                    text.encode(TSPL_ENCODING)
+                except UnicodeEncodeError:
+                    # Not in the printer's code page (the rack_qr arrow): send the glyphs as a bitmap
+                    background_bitmap(bitmap_command(round(dots(x, dpi)), text_top, text_ink(text, dots(size, dpi))))
+                else:
+                    centre = round(dots(x + pdfmetrics.stringWidth(text, FONT_NAME, size) / 2, dpi))
+                    before.append(text_command(centre, text_top, size, text).encode(TSPL_ENCODING))
+
+    width_mm, height_mm = label_width / mm(1), label_height / mm(1)
+    return {
+        "setup": f"SIZE {width_mm:.2f} mm, {height_mm:.2f} mm\n{STICKER_MEDIA}".encode(TSPL_ENCODING),
+        "download": (
+            f'DOWNLOAD "{BACKGROUND_PROGRAM}.BAS"\nCLS\n'.encode(TSPL_ENCODING) + b"".join(before) + b"EOP\n"
+            + f'DOWNLOAD "{FOREGROUND_PROGRAM}.BAS"\n'.encode(TSPL_ENCODING) + b"".join(after + outlines)
+            + b"PRINT 1\nEOP\n"
+        ),
+        "unstored": b"".join(unstored),
+        "ops": label_ops,
+        "height": label_height_dots,
+        "dpi": dpi,
+    }
+
+
+def label_commands(form, locations):
+    """Per-label TSPL (QR codes and fields) for every location, as lists of str lines"""
+    dpi = form["dpi"]
+    commands = [[] for _ in range(len(locations))]
+    for op in form["ops"]:
+        if op[0] == "qr":
+            _, x, y, size, field = op
+            size_dots = dots(size, dpi)
+            for lines, data in zip(commands, field_values(locations, field)):
+                if not data:
+                    continue
+                module_count, _ = qr_module_runs(data, qrcode.constants.ERROR_CORRECT_L)
+                cell = max(int(size_dots / module_count), 1)
+                # Whole dots per module; centre what that leaves in the QR's square
+                margin = (size_dots - cell * module_count) / 2
+                qr_x, qr_y = round(dots(x, dpi) + margin), round(form["height"] - dots(y, dpi) - size_dots + margin)
+                lines.append(f'QRCODE {qr_x},{qr_y},{QR_ERROR_CORRECTION},{cell},A,0,"{tspl_string(data)}"\n')
+        else:
+            centre = round(dots(op[1] + op[3] / 2, dpi))
+            _, y, _, texts, sizes, _ = layout_field(op, locations)
+            for lines, text, size in zip(commands, texts, sizes):
+                if text:
+                    text_top = round(form["height"] - dots(y + SCALABLE_FONT_ASCENT * size, dpi))
+                    lines.append(text_command(centre, text_top, size, text))
+    return commands
+
+
+def compile_sticker_tspl(name, locations, dpi=THERMAL_DPI):
+    """One TSPL job (bytes) printing a sticker template for every location, one label each.
+
+    Field values outside the printer's code page print as "?".
+    """
+    form = compile_sticker_form(name, dpi)
+    background = f"{BACKGROUND_PROGRAM}\n".encode(TSPL_ENCODING) + form["unstored"]
+    foreground = f"{FOREGROUND_PROGRAM}\n".encode(TSPL_ENCODING)
+    parts = [form["setup"], form["download"]]
+    for lines in label_commands(form, locations):
+        parts.append(background + "".join(lines).encode(TSPL_ENCODING) + foreground)
+    return b"".join(parts)
+
+
+def fits_print_width(name):
+    return compile_template(name)["label_size"][0] / mm(1) <= PRINT_WIDTH_MM
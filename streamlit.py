@@ -1,70 +1,169 @@
-# streamlit_app.py
-
-import streamlit as st
-import win32print
-
-def send_tspl_to_printer_windows(printer_name, tspl_data):
-    printer_handle = win32print.OpenPrinter(printer_name)
-    job_info = ("TSPL Print Job", None, "RAW")
-    hJob = win32print.StartDocPrinter(printer_handle, 1, job_info)
-    win32print.StartPagePrinter(printer_handle)
-    win32print.WritePrinter(printer_handle, tspl_data.encode("latin-1"))
-    win32print.EndPagePrinter(printer_handle)
-    win32print.EndDocPrinter(printer_handle)
-    win32print.ClosePrinter(printer_handle)
-    st.success(f"✅ Sent TSPL print job to printer: {printer_name}")
-
-
-def generate_tspl(label1, label2):
-    def label_block(x_offset, data):
-        return f"""
-BARCODE {x_offset + 0},5,"128",40,1,0,2,2,"{data['barcode']}"
-TEXT {x_offset + 0},50,"3",0,1,1,"{data['line1']}"
-TEXT {x_offset + 0},70,"3",0,1,1,"{data['line2']}"
-TEXT {x_offset + 0},90,"3",0,1,1,"{data['line3']}"
-TEXT {x_offset + 0},110,"3",0,1,1,"{data['line4']}"
-TEXT {x_offset + 0},140,"3",0,1,1,"MRP:"
-TEXT {x_offset + 60},140,"3",0,1.5,1.5,"{data['price']}"
-TEXT {x_offset + 170},20,"3",90,1,1,"Kushal's"
-"""
-
-    tspl = """
-SIZE 55 mm, 21 mm
-GAP 3 mm, 0
-DIRECTION 1
-CLS
-"""
-    tspl += label_block(30, label1)
-    tspl += label_block(365, label2)
-    tspl += "\nPRINT 1\n"
-    return tspl
-
-
-# 🎛️ Streamlit UI
-st.title("🖨️ Dual-Label TSPL Printer - TSC TTP-345")
-
-st.subheader("Left Label")
-label1 = {
-    "barcode": st.text_input("Left Barcode", "0000160124228", key="l1"),
-    "line1": st.text_input("Left Line 1", "E-R Antique", key="l2"),
-    "line2": st.text_input("Left Line 2", "Ruby", key="l3"),
-    "line3": st.text_input("Left Line 3", "165099  40S021", key="l4"),
-    "line4": st.text_input("Left Line 4", "Gold   S:NA", key="l5"),
-    "price": st.text_input("Left MRP", "1020", key="l6")
-}
-
-st.subheader("Right Label")
-label2 = {
-    "barcode": st.text_input("Right Barcode", "0000160124228", key="r1"),
-    "line1": st.text_input("Right Line 1", "E-R Antique", key="r2"),
-    "line2": st.text_input("Right Line 2", "Ruby", key="r3"),
-    "line3": st.text_input("Right Line 3", "165099  40S021", key="r4"),
-    "line4": st.text_input("Right Line 4", "Gold   S:NA", key="r5"),
-    "price": st.text_input("Right MRP", "1020", key="r6")
-}
-
-if st.button("🖨️ Print Stickers"):
-    tspl_code = generate_tspl(label1, label2)
-    printer_name = "TSC TTP-345"  # Make sure this matches exactly
-    send_tspl_to_printer_windows(printer_name, tspl_code)
-    st.code(tspl_code, language="tspl")
+# streamlit_app.py
+
+import time
+import pandas as pd
+import streamlit as st
+from printer_pool import SPLIT_BY_THROUGHPUT, SPLIT_BY_WEIGHT, printer_pool
+from printers import DEFAULT_PRINTER, PrinterError
+from spooler import FAILED, QUEUED, RETRYING, SpoolerFull, print_spooler
+from tspl import LABEL_COLUMNS, LABEL_FIELDS, compile_tspl_batch, compile_tspl_form_batch, generate_tspl
+
+def queue_print_job(printer_uri, tspl_data, title):
+    """Hand a job to the spooler; the page never waits on the printer itself"""
+    try:
+        job_id = print_spooler.submit(printer_uri, tspl_data, title)
+    except SpoolerFull as e:
+        st.warning(f"⏳ Print queue is full: {e}")
+        return
+    st.success(f"✅ Queued print job #{job_id} for {printer_uri}")
+
+
+def print_queue_status():
+    jobs = print_spooler.jobs()
+    if not jobs:
+        st.caption("No print jobs yet.")
+        return
+    for job in jobs:
+        text = f"#{job['id']} · {job['title']} · {job['size']:,} bytes · {job['status']}"
+        if job["status"] == RETRYING:
+            wait = max(job["next_attempt_at"] - time.time(), 0) if job["next_attempt_at"] else 0
+            text += f" (attempt {job['attempts'] + 1} in {wait:.0f}s: {job['error']})"
+        elif job["status"] == FAILED:
+            text += f" after {job['attempts']} attempts: {job['error']}"
+        if job["status"] in (QUEUED, RETRYING):
+            info, cancel = st.columns([5, 1])
+            info.write(text)
+            if cancel.button("Cancel", key=f"cancel_print_{job['id']}"):
+                print_spooler.cancel(job["id"])
+        else:
+            st.write(text)
+
+
+def queue_pool_batch(labels, compile_batch, title, split_by):
+    """Split a batch across the printer pool, one spooled job per printer"""
+    try:
+        parts = printer_pool.submit_batch(labels, compile_batch, title, unit=len(LABEL_COLUMNS), by=split_by)
+    except (PrinterError, SpoolerFull) as e:
+        st.warning(f"⏳ Batch not queued: {e}")
+        return
+    st.success("✅ Queued " + ", ".join(f"#{job_id}: {count} labels on {uri}" for uri, job_id, count in parts))
+
+
+def printer_pool_status():
+    printers = printer_pool.printers()
+    if not printers:
+        st.caption("No printers in the pool yet.")
+        return
+    for printer in printers:
+        if printer["healthy"] is None:
+            health = "⏳ not checked yet"
+        elif printer["healthy"]:
+            health = "🟢 online"
+        else:
+            health = f"🔴 offline: {printer['error']}"
+        text = f"{printer['uri']} · weight {printer['weight']:g} · {health}"
+        if printer["throughput"]:
+            text += f" · {printer['throughput'] / 1024:,.0f} KB/s measured"
+        info, remove = st.columns([5, 1])
+        info.write(text)
+        if remove.button("Remove", key=f"remove_printer_{printer['uri']}"):
+            printer_pool.remove(printer["uri"])
+            st.rerun()
+
+
+# 🎛️ Streamlit UI
+st.title("🖨️ Dual-Label TSPL Printer - TSC TTP-345")
+printer_uri = st.text_input(
+    "Printer",
+    DEFAULT_PRINTER,
+    help="tcp://host:9100, cups://queue, file:///dev/usb/lp0 or win://printer name",
+)
+
+printer_pool.start()
+with st.expander("🖨️🖨️ Printer pool"):
+    st.caption("Batches can be split across these printers; jobs on one that goes offline move to the others.")
+    with st.form("add_printer", clear_on_submit=True):
+        new_printer, new_weight = st.columns([4, 1])
+        pool_uri = new_printer.text_input("Printer URI", placeholder="tcp://192.168.1.51:9100")
+        pool_weight = new_weight.number_input("Weight", min_value=0.0, value=1.0, step=0.5)
+        if st.form_submit_button("Add printer") and pool_uri:
+            try:
+                printer_pool.add(pool_uri.strip(), pool_weight)
+            except PrinterError as e:
+                st.error(f"❌ {e}")
+    if st.button("Check printers now"):
+        printer_pool.check_all()
+    # Shows the background health checks as they land
+    st.fragment(printer_pool_status, run_every=5)()
+
+st.subheader("Left Label")
+label1 = {
+    "barcode": st.text_input("Left Barcode", "0000160124228", key="l1"),
+    "line1": st.text_input("Left Line 1", "E-R Antique", key="l2"),
+    "line2": st.text_input("Left Line 2", "Ruby", key="l3"),
+    "line3": st.text_input("Left Line 3", "165099  40S021", key="l4"),
+    "line4": st.text_input("Left Line 4", "Gold   S:NA", key="l5"),
+    "price": st.text_input("Left MRP", "1020", key="l6")
+}
+
+st.subheader("Right Label")
+label2 = {
+    "barcode": st.text_input("Right Barcode", "0000160124228", key="r1"),
+    "line1": st.text_input("Right Line 1", "E-R Antique", key="r2"),
+    "line2": st.text_input("Right Line 2", "Ruby", key="r3"),
+    "line3": st.text_input("Right Line 3", "165099  40S021", key="r4"),
+    "line4": st.text_input("Right Line 4", "Gold   S:NA", key="r5"),
+    "price": st.text_input("Right MRP", "1020", key="r6")
+}
+
+if st.button("🖨️ Print Stickers"):
+    tspl_code = generate_tspl(label1, label2)
+    queue_print_job(printer_uri, tspl_code, "Dual label")
+    st.code(tspl_code, language="tspl")
+
+st.subheader("Batch Print")
+batch_file = st.file_uploader(
+    "Label list (CSV or Excel) with columns " + ", ".join(LABEL_FIELDS),
+    type=["csv", "xlsx"],
+)
+if batch_file is not None:
+    if batch_file.name.endswith(".csv"):
+        batch = pd.read_csv(batch_file, dtype=str, keep_default_na=False)
+    else:
+        batch = pd.read_excel(batch_file, dtype=str).fillna("")
+    missing = [field for field in LABEL_FIELDS if field not in batch.columns]
+    if missing:
+        st.error(f"❌ Missing columns: {', '.join(missing)}")
+    else:
+        labels = batch[list(LABEL_FIELDS)].to_dict("records")
+        use_forms = st.checkbox(
+            "Use printer-resident form",
+            value=True,
+            help="Sends the layout once as a stored form, then only each label's values (about a third of the bytes).",
+        )
+        compile_batch = compile_tspl_form_batch if use_forms else compile_tspl_batch
+        use_pool = st.checkbox(
+            "Split across the printer pool",
+            disabled=not printer_pool.printers(),
+            help="Each reachable printer in the pool prints its own run of the batch at the same time.",
+        )
+        if use_pool:
+            split_by = st.radio(
+                "Split by",
+                [SPLIT_BY_WEIGHT, SPLIT_BY_THROUGHPUT],
+                format_func={SPLIT_BY_WEIGHT: "Printer weight", SPLIT_BY_THROUGHPUT: "Measured throughput"}.get,
+                horizontal=True,
+            )
+            st.caption(f"{len(labels)} labels, split into one job per reachable printer")
+        else:
+            st.caption(f"{len(labels)} labels on {-(-len(labels) // len(LABEL_COLUMNS))} rows, sent as one job")
+        if st.button("🖨️ Print Batch"):
+            title = f"Batch of {len(labels)} ({batch_file.name})"
+            if use_pool:
+                queue_pool_batch(labels, compile_batch, title, split_by)
+            else:
+                queue_print_job(printer_uri, compile_batch(labels), title)
+
+st.subheader("🧾 Print Queue")
+# Polls while the page is open, so status changes show without a rerun
+st.fragment(print_queue_status, run_every=2)()
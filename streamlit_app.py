@@ -1,67 +1,98 @@
 import os
+import hashlib
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import datetime
+from html import escape
+import numpy as np
 import pandas as pd
-import qrcode
 import streamlit as st
-from reportlab.lib.pagesizes import landscape, A3
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
+from barcodes import code128_data_uri
+from caching import BytesLRUCache
 from io import BytesIO
-from reportlab.lib.utils import ImageReader
-from PIL import Image
-import io
+from jobs import CANCELLED, DONE, QUEUED, TIMED_OUT, job_runner
+from printers import DEFAULT_PRINTER
+from sample_pdf import is_blank_label, render_sample_pdf
+from spooler import CANCELLED as PRINT_CANCELLED, DONE as PRINT_DONE, QUEUED as PRINT_QUEUED
+from spooler import RETRYING, SENDING, PrintSpooler, SpoolerFull
+from sticker_pdf import (
+    QR_CACHE_DIR, QR_MODES, extract_locations, labels_per_page, qr_disk_stats, qr_tile_cache, render_stickers,
+)
+from sticker_tspl import PRINT_WIDTH_MM, compile_sticker_tspl, fits_print_width
+from tspl import LABEL_COLUMNS, compile_tspl_form_batch, sticker_entry_label
 
 ####################
 ######  NEW  #######
 ####################
+# Sticker field -> inventory sheet column
+STICKER_FIELDS = {
+    "barcode": "Barcode Value",
+    "text": "Barcode Value",
+    "desc": "Item Alias Name",
+    "spec": "COLOR",
+    "designNo": "DESIGNNO",
+    "remark": "POLISH",
+    "feature1": "SIZE",
+    "feature2": "Loc Qty",
+    "mpr": "NEW MRP",
+}
+
 def generate_sticker_data_from_df(df, design_ids_input):
     design_ids = [id.strip() for id in design_ids_input.split('\n') if id.strip()]
-    design_id_count = {id_: design_ids.count(id_) for id_ in design_ids}
-    found_count = {}
     results = []
-    grouped_by_store = {}
-
-    # First group rows by DESIGNNO to allow faster lookup
-    design_map = {}
-    for _, row in df.iterrows():
-        design_no = str(row['DESIGNNO']).strip()
-        design_map.setdefault(design_no, []).append(row)
-
-    # Loop through design IDs in the order entered
-    for design_id in design_ids:
-        if design_id not in design_map:
-            continue
-
-        for row in design_map[design_id]:
-            if found_count.get(design_id, 0) >= design_id_count[design_id]:
-                break  # Already matched enough times
-
-            store_name = str(row['Store Name']).strip()
-
-            # Add store group if not yet initialized
-            if store_name not in grouped_by_store:
-                grouped_by_store[store_name] = []
-
-            # Append label entry to that store
-            grouped_by_store[store_name].append({
-                "barcode": row.get("Barcode Value", ""),
-                "text": row.get("Barcode Value", ""),
-                "desc": row.get("Item Alias Name", ""),
-                "spec": row.get("COLOR", ""),
-                "designNo": row.get("DESIGNNO", ""),
-                "remark": row.get("POLISH", ""),
-                "feature1": row.get("SIZE", ""),
-                "feature2": row.get("Loc Qty", ""),
-                "mpr": row.get("NEW MRP", ""),
-                "storeName": store_name,
-                "isStoreNameRow": False
-            })
 
-            found_count[design_id] = found_count.get(design_id, 0) + 1
+    if not design_ids or df.empty:
+        return results
+
+    # Request table: one line per entered DESIGNNO, numbered per ID (0, 1, 2 ...)
+    requests = pd.DataFrame({"design_key": design_ids})
+    requests["request_no"] = requests.groupby("design_key", sort=False).cumcount()
+    requests["position"] = np.arange(len(requests))
+
+    # Normalized DESIGNNO column, reduced to the rows somebody asked for
+    design_keys = df['DESIGNNO'].map(str).str.strip()
+    wanted = design_keys.isin(requests["design_key"]).to_numpy()
+    hits = pd.DataFrame({
+        "design_key": design_keys.to_numpy()[wanted],
+        "row": np.flatnonzero(wanted),
+    })
+    hits["rank"] = hits.groupby("design_key", sort=False).cumcount()
+    stock = hits.groupby("design_key", sort=False).size().rename("stock").reset_index()
+
+    # Every entered line gets one label. An ID entered N times takes its first N
+    # rows in sheet order, starting over from the first row when it runs out;
+    # each pass over the rows is placed where that repeat of the ID was entered.
+    labels = requests.merge(stock, on="design_key", how="inner")
+    labels["rank"] = labels["request_no"] % labels["stock"]
+    labels["pass_no"] = labels["request_no"] // labels["stock"]
+    passes = requests.rename(columns={"request_no": "pass_no", "position": "pass_position"})
+    labels = labels.merge(passes, on=["design_key", "pass_no"], how="left")
+    labels = labels.merge(hits, on=["design_key", "rank"], how="left")
+    labels = labels.sort_values(["pass_position", "request_no"], kind="stable")
+
+    matched = df.iloc[labels["row"].to_numpy()]
+    store_names = matched['Store Name'].map(str).str.strip().to_numpy()
+
+    # Group by store, stores ordered by their first matched label
+    store_codes, store_index = pd.factorize(store_names)
+    by_store = np.argsort(store_codes, kind="stable")
+
+    labels = pd.DataFrame({
+        field: matched[column].to_numpy() if column in matched.columns else ""
+        for field, column in STICKER_FIELDS.items()
+    }).iloc[by_store]
+    labels["storeName"] = store_names[by_store]
+    labels["isStoreNameRow"] = False
+    label_entries_all = labels.to_dict("records")
+
+    store_sizes = np.bincount(store_codes, minlength=len(store_index))
+    group_ends = np.cumsum(store_sizes)
+    group_starts = group_ends - store_sizes
 
     # Now build final result with store headers and blank label if needed
-    for store_name, label_entries in grouped_by_store.items():
+    for store_name, start, end in zip(store_index, group_starts, group_ends):
+        label_entries = label_entries_all[start:end]
         results.append({"storeName": store_name, "isStoreNameRow": True})
         results.extend(label_entries)
 
@@ -83,71 +114,140 @@ def generate_sticker_data_from_df(df, design_ids_input):
     return results
 
 # -------------------------
-# HTML Rendering Function
+# Local Inventory Store (SQLite)
 # -------------------------
-def render_sticker_html(results):
-    html = '<div id="output">'
-    store_groups = []
-    current_group = []
+INVENTORY_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inventory_store.sqlite3")
 
-    # Group entries by store
-    for entry in results:
+def inventory_store_info(db_path=INVENTORY_DB_PATH):
+    """Return the metadata of the stored inventory, or None if nothing is stored yet"""
+    if not os.path.exists(db_path):
+        return None
+    with closing(sqlite3.connect(db_path)) as conn:
+        try:
+            info = dict(conn.execute("SELECT key, value FROM inventory_meta").fetchall())
+        except sqlite3.OperationalError:
+            return None
+    return info or None
+
+def save_inventory_to_store(df, source_name, source_hash, db_path=INVENTORY_DB_PATH):
+    """Replace the stored inventory with df, indexed by DESIGNNO and Store Name"""
+    stored = df.rename(columns=str).assign(
+        _row_order=np.arange(len(df)),
+        _design_key=df['DESIGNNO'].map(str).str.strip(),
+    )
+    # Plain Python values with NULL for blanks, so ints, floats and text keep their own type
+    stored = stored.astype(object).where(stored.notna(), None)
+    columns = ", ".join('"%s"' % column.replace('"', '""') for column in stored.columns)
+
+    with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+        # One write transaction for the whole swap: overlapping uploads queue up behind
+        # each other and readers keep seeing the old table until it commits
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS inventory")
+            # Untyped columns: SQLite stores each value as given instead of coercing
+            # a mixed int/str column to TEXT
+            conn.execute(f"CREATE TABLE inventory ({columns})")
+            conn.executemany(
+                f"INSERT INTO inventory VALUES ({', '.join('?' * len(stored.columns))})",
+                stored.itertuples(index=False, name=None),
+            )
+            conn.execute("CREATE INDEX inventory_design_key_idx ON inventory (_design_key, _row_order)")
+            conn.execute('CREATE INDEX inventory_store_name_idx ON inventory ("Store Name")')
+            conn.execute("CREATE TABLE IF NOT EXISTS inventory_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.executemany(
+                "INSERT OR REPLACE INTO inventory_meta (key, value) VALUES (?, ?)",
+                [
+                    ("source_name", source_name),
+                    ("source_hash", source_hash),
+                    ("rows", str(len(df))),
+                    ("loaded_at", datetime.now().strftime("%Y-%m-%d %H:%M")),
+                ],
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+def load_inventory_for_designs(design_ids_input, db_path=INVENTORY_DB_PATH):
+    """Fetch only the stored rows whose DESIGNNO was asked for, in original sheet order"""
+    design_keys = {id.strip() for id in design_ids_input.split('\n') if id.strip()}
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("CREATE TEMP TABLE wanted (design_key TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO wanted (design_key) VALUES (?)", [(key,) for key in design_keys])
+        df = pd.read_sql_query(
+            "SELECT inventory.* FROM wanted "
+            "JOIN inventory ON inventory._design_key = wanted.design_key "
+            "ORDER BY inventory._row_order",
+            conn,
+        )
+
+    # Blank cells come back as None; the uploaded sheet has NaN there
+    df = df.drop(columns=["_row_order", "_design_key"])
+    return df.mask(df.isna(), np.nan)
+
+# -------------------------
+# HTML Rendering Function
+# -------------------------
+# Cell values only ever land in element text, so escaping &, < and > is enough
+STICKER_HTML_STORE = "<table class='store-name-table'><tr><td class='store-name-cell'>Store: %s</td></tr></table>"
+
+def render_sticker_html(results, start=0, stop=None):
+    """Store-grouped sticker tables for the Sample Page, rendered in one pass; start/stop pick a slice"""
+    parts = ['<div id="output">']
+    append = parts.append
+    label_number = 0
+    # Odd/even counts from each store's header, so a page that starts mid-store counts the labels above it first
+    for entry in results[:start]:
+        label_number = 0 if entry.get("isStoreNameRow") else label_number + 1
+    for entry in results[start:stop]:
         if entry.get("isStoreNameRow"):
-            if current_group:
-                store_groups.append(current_group)
-            current_group = [entry]  # Start new group
+            label_number = 0
+            append(STICKER_HTML_STORE % escape(str(entry.get('storeName')), quote=False))
+            continue
+        label_number += 1
+        table_class = "even" if label_number % 2 == 0 else "odd"
+        # Encoded locally (and cached per value) so the page needs no barcode requests;
+        # blank pad labels get no barcode at all. The data URI goes in as a part of its
+        # own so its kilobyte is copied once, by the join.
+        barcode = str(entry.get('barcode', ''))
+        if barcode:
+            append(f'<table class="{table_class}"><tr class="row-1"><td colspan="2"><img id="barcodeImg" src="')
+            append(code128_data_uri(barcode))
+            row_1 = '" />'
         else:
-            current_group.append(entry)
-    if current_group:
-        store_groups.append(current_group)
-
-    # Render each store group
-    for group in store_groups:
-        store_header = group[0]
-        label_rows = group[1:]
-
-        html += f"""
-        <table class='store-name-table'>
-            <tr><td class='store-name-cell'>Store: {store_header['storeName']}</td></tr>
-        </table>
-        """
-
-        for i, entry in enumerate(label_rows):
-            barcode_url = f"https://bwipjs-api.metafloor.com/?bcid=code128&text={entry.get('barcode', '')}"
-            table_class = "even" if (i + 1) % 2 == 0 else "odd"
-
-            html += f"""
-            <table class="{table_class}">
-                <tr class="row-1">
-                    <td colspan="2"><img id="barcodeImg" src="{barcode_url}" /></td>
-                </tr>
-                <tr class="row-2">
-                    <td colspan="2">{entry.get('text')}</td>
-                    <td class="rotated" rowspan="6">Kushal's</td>
-                </tr>
-                <tr class="row-3">
-                    <td colspan="2">{entry.get('desc')}</td>
-                </tr>
-                <tr class="row-4">
-                    <td>{entry.get('spec')}</td>
-                    <td></td>
-                </tr>
-                <tr class="row-5">
-                    <td>{entry.get('designNo')}</td>
-                    <td>{entry.get('remark')}</td>
-                </tr>
-                <tr class="row-6">
-                    <td>{entry.get('feature1')}</td>
-                    <td>S: {entry.get('feature2')}</td>
-                </tr>
-                <tr class="row-7">
-                    <td colspan="2">MRP: {entry.get('mpr')}.00</td>
-                </tr>
-            </table>
-            """
-
-    html += '</div>'
-    return html
+            row_1 = f'<table class="{table_class}"><tr class="row-1"><td colspan="2">'
+        # The row's cells escaped together, as escape(quote=False) would, then split
+        # back apart on a NUL (which no xlsx cell can hold)
+        get = entry.get
+        text, desc, spec, design_no, remark, feature1, feature2, mpr = (
+            f"{get('text')}\0{get('desc')}\0{get('spec')}\0{get('designNo')}\0"
+            f"{get('remark')}\0{get('feature1')}\0{get('feature2')}\0{get('mpr')}"
+        ).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").split("\0")
+        append(
+            f'{row_1}</td></tr><tr class="row-2"><td colspan="2">{text}</td><td class="rotated" rowspan="6">Kushal\'s</td></tr>'
+            f'<tr class="row-3"><td colspan="2">{desc}</td></tr>'
+            f'<tr class="row-4"><td>{spec}</td><td></td></tr>'
+            f'<tr class="row-5"><td>{design_no}</td><td>{remark}</td></tr>'
+            f'<tr class="row-6"><td>{feature1}</td><td>S: {feature2}</td></tr>'
+            f'<tr class="row-7"><td colspan="2">MRP: {mpr}.00</td></tr></table>'
+        )
+    append('</div>')
+    return "".join(parts)
+
+def sticker_html_page(rendered_html, print_button=True):
+    """Wrap rendered sticker tables in a standalone page with the sticker CSS"""
+    button = '<button onclick="window.print()" style="margin:20px;padding:10px;">🖨️ Print</button>' if print_button else ""
+    return f"""
+    <html>
+    <head>{CSS_TEMPLATE}</head>
+    <body>
+        {button}
+        {rendered_html}
+    </body>
+    </html>
+    """
 
 
 # -------------------------
@@ -360,602 +460,287 @@ def login_page():
             else:
                 st.error("Invalid username or password")
 
-def mm(value):
-    return value * 2.83465
-
-# Function to read data from a DataFrame for Action 3
-def extract_data_from_dataframe(df):
-    data = {
-        'split_values': {},    # For split components
-        'original_values': {}  # For intact original values
-    }
-    data1 = {}
-    unique_id = 1  # Start unique ID from 1
-    counter = 1
-    for column in df.columns:
-        for value in df[column].dropna().unique():
-            # Create a unique ID for each row
-            id_str = f"ID-{unique_id}" # Unique ID format
-            id_str1 = str(counter)
-            data1[id_str1] = str(value)
-            counter += 1
-            unique_id += 1
-
-            # Store the original value
-            data['original_values'][id_str] = value
-                    
-            # Store the split components
-            components = value.split('-')
-            data['split_values'][id_str] = [component.strip() for component in components]
-
-    return data1, data
-
-def create_qr_code(data, size_mm):
-    """Generate QR code and return it as a reportlab-compatible image reader"""
-    # Create QR code instance
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=0
-    )
-    
-    # Add data
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    # Create image
-    qr_image = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to desired size in pixels (assuming 300 DPI)
-    size_pixels = int(mm(size_mm) * 300 / 72)  # Convert mm to pixels at 300 DPI
-    qr_image = qr_image.resize((size_pixels, size_pixels), Image.Resampling.LANCZOS)
-    
-    # Convert to bytes
-    img_byte_arr = io.BytesIO()
-    qr_image.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    
-    return ImageReader(img_byte_arr)
-
-# Function to save data to a PDF for Action 3
-def save_to_pdf(data):
-    
-    # Create a BytesIO buffer to save the PDF in memory
-    pdf_buffer = BytesIO()
-    
-    # Register the custom TTF font
-    font_path = "https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Mitr-SemiBold.ttf"  # Provide the correct path to your .ttf file
-    pdfmetrics.registerFont(TTFont('Mitr-SemiBold', font_path))  # Register the font
-
-    pdf = canvas.Canvas(pdf_buffer, pagesize=landscape(A3))  # Use the BytesIO buffer
-    width, height = landscape(A3)
-    x_offset = mm(19.40)
-    y_offset = height - mm(14.11)
-    compartment_width = mm(24.70)  # Width of each compartment
-    compartment_height = mm(24)  # Height of each compartment
-    margin_between_entities = mm(3)  # Margin between entities
-    static_strings = ["Rack", "Level", "Position"]  # Static labels
-
-    pdf.setLineWidth(mm(0.035))  # Set border thickness
-
-    for unique_id in data['split_values'].keys():
-        components = data['split_values'][unique_id]  # Get split components for this ID
-        original_value = data['original_values'][unique_id]
-        
-        total_width = len(static_strings) * compartment_width
-
-        # Draw background rectangles first
-        for i in range(len(static_strings)):
-            compartment_x = x_offset + i * compartment_width
-            pdf.setFillColor(colors.HexColor("#2633cf"))
-            pdf.rect(compartment_x, y_offset - compartment_height, compartment_width, compartment_height, fill=1)
-
-        # Draw static strings on top of the background
-        for i, static_string in enumerate(static_strings):
-            compartment_x = x_offset + i * compartment_width
-            pdf.setFont("Mitr-SemiBold", mm(3.2))
-            pdf.setFillColor(colors.HexColor("#b3b3b3"))
-            text_width = pdf.stringWidth(static_string, "Mitr-SemiBold", mm(3.2))
-            pdf.drawString(compartment_x + (compartment_width - text_width) / 2, 
-                           y_offset - compartment_height + mm(1.76), static_string)
-
-        # Draw dynamic components on top of the background
-        for i, component in enumerate(components):
-            if i < len(static_strings):
-                compartment_x = x_offset + i * compartment_width
-                font_size = 16.92
-                max_width = compartment_width - mm(2)
-
-                # Adjust font size to fit
-                while pdf.stringWidth(component, "Mitr-SemiBold", font_size) > max_width and font_size > 6:
-                    font_size -= 1
-
-        pdf.setFont("Mitr-SemiBold", font_size)
-        pdf.setFillColor(colors.HexColor("#b3b3b3"))
-        text_width = pdf.stringWidth(component, "Mitr-SemiBold", font_size)
-        pdf.drawString(compartment_x + (compartment_width - text_width) / 2, 
-                       y_offset - compartment_height + mm(7.76), component)
-
-
-        # Move the x_offset for the next entity
-        x_offset += total_width + margin_between_entities
-        if x_offset + total_width > width:
-            y_offset -= compartment_height + margin_between_entities
-            x_offset = mm(19.40)
-
-        if y_offset < mm(17.63):
-            pdf.showPage()
-            pdf.setPageSize(landscape(A3))
-            pdf.setLineWidth(mm(0.035))
-            x_offset = mm(19.40)
-            y_offset = height - mm(14.11)
-
-    pdf.save()
-    pdf_buffer.seek(0)  # Move to the beginning of the BytesIO buffer
-    return pdf_buffer.getvalue()  # Return the PDF data
-
-
-def save_to_pdf1(data):
-    
-    # Create a BytesIO buffer to save the PDF in memory
-    pdf_buffer = BytesIO()
-    
-    # Register the custom TTF font
-    font_path = "https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Mitr-SemiBold.ttf"  # Provide the correct path to your .ttf file
-    pdfmetrics.registerFont(TTFont('Mitr-SemiBold', font_path))  # Register the font
-
-    pdf = canvas.Canvas(pdf_buffer, pagesize=landscape(A3))  # Use the BytesIO buffer
-    width, height = landscape(A3)
-    x_offset = mm(19.40)
-    y_offset = height - mm(14.11)
-    compartment_width = mm(24.70)  # Width of each compartment
-    compartment_height = mm(24)  # Height of each compartment
-    margin_between_entities = mm(2.99)  # Margin between entities
-    static_strings = ["Rack", "Level", "Position"]  # Static labels
-
-    pdf.setLineWidth(mm(0.035))  # Set border thickness
-
-    for unique_id in data['split_values'].keys():
-        components = data['split_values'][unique_id]  # Get split components for this ID
-        original_value = data['original_values'][unique_id]
-        
-        # Calculate total width of the entity (compartments)
-        total_width = len(static_strings) * compartment_width
-
-        # Define a list of colors for compartments
-        compartment_colors = [
-            colors.HexColor("#D8E1F1"),  # Color for the first compartment
-            colors.HexColor("#E1E101"),  # Color for the second compartment
-            colors.HexColor("#E2EFD8"),  # Color for the third compartment
-        ]
-        
-        # Draw background rectangles with different colors
-        for i in range(len(static_strings)):
-            compartment_x = x_offset + i * compartment_width  # Calculate x position for each compartment
-            
-            # Set the fill color dynamically based on the compartment index
-            pdf.setFillColor(compartment_colors[i % len(compartment_colors)])  # Use modulo to loop through colors
-            pdf.rect(compartment_x, y_offset - compartment_height, compartment_width, compartment_height, fill=1)  # Fill the rectangle
-
-
-        # Draw static strings on top of the background
-        for i, static_string in enumerate(static_strings):
-            compartment_x = x_offset + i * compartment_width  # Calculate x position for each compartment
-            
-            # Set font and size for the static component inside the compartment
-            pdf.setFont("Mitr-SemiBold", mm(3.2))  # Font size for static strings
-            pdf.setFillColor(colors.HexColor("#000000"))  # Set to 30% gray
-            text_width = pdf.stringWidth(static_string, "Mitr-SemiBold", mm(3.2))
-            pdf.drawString(compartment_x + (compartment_width - text_width) / 2, 
-                           y_offset - compartment_height + mm(1.76), static_string)  # Adjusted vertical position
-
-        # Draw dynamic components on top of the background
-        for i, component in enumerate(components):
-            if i < len(static_strings):  # Ensure we only draw components where static strings exist
-                compartment_x = x_offset + i * compartment_width  # Calculate x position for each compartment
-
-                # Set font and size for dynamic components using the custom font
-                pdf.setFont("Mitr-SemiBold", mm(16.92))  # Use the custom font
-                pdf.setFillColor(colors.HexColor("#000000"))  # Set to white
-                text_width = pdf.stringWidth(component, "Mitr-SemiBold", mm(16.92))
-                pdf.drawString(compartment_x + (compartment_width - text_width) / 2, 
-                               y_offset - compartment_height + mm(7.76), component)
-
-        # Move the x_offset for the next entity 
-        x_offset += total_width + margin_between_entities  # Add margin after the current entity
-
-        # Reset x_offset if it exceeds the page width
-        if x_offset + total_width > width:
-            y_offset -= compartment_height + margin_between_entities  # Move down for the next row of entities
-            x_offset = mm(19.40)  # Reset x offset
-
-        if y_offset < mm(17.63):  # Create a new page if the height limit is reached
-            pdf.showPage()  # Finalize the current page
-            pdf.setPageSize(landscape(A3))  # Set page size to landscape A3
-            pdf.setLineWidth(mm(0.035))  # Set border thickness
-            x_offset = mm(19.40)  # Reset x offset
-            y_offset = height - mm(14.11)  # Reset y offset
-
-    pdf.save()
-    pdf_buffer.seek(0)  # Move to the beginning of the BytesIO buffer
-    return pdf_buffer.getvalue()  # Return the PDF data
-
-def save_to_pdf2(data):
-    
-    # Create a BytesIO buffer to save the PDF in memory
-    pdf_buffer = BytesIO()
-    
-    # Register the custom TTF font
-    font_path = "https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Mitr-SemiBold.ttf"
-    pdfmetrics.registerFont(TTFont('Mitr-SemiBold', font_path))
-
-    # Initialize PDF with A3 landscape
-    pdf = canvas.Canvas(pdf_buffer, pagesize=landscape(A3))
-    page_width, page_height = landscape(A3)
-    
-    # Initialize starting positions
-    x_start = mm(19.40)
-    x_offset = x_start
-    y_offset = page_height - mm(14.11)
-    
-    # Define fixed dimensions
-    compartment_height = mm(24)
-    margin_between_entities = mm(2.99)
-    static_strings = ["", "Rack", "Level", "Position", ""]
-    qr_size = mm(21)  # QR code size in points
-    
-    # Define fixed compartment widths
-    compartment_widths = [mm(26), mm(24.70), mm(24.70), mm(24.70), mm(10)]
-    total_entity_width = sum(compartment_widths)
-    
-    # Define colors
-    compartment_colors = [
-        colors.HexColor("#FFFFFF"),
-        colors.HexColor("#D8E1F1"),
-        colors.HexColor("#E1E101"),
-        colors.HexColor("#E2EFD8"),
-        colors.HexColor("#FFF2CD"),
+# Parsed uploads are kept per session, keyed on file content, up to this many bytes of DataFrames
+PARSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+def file_content_hash(uploaded_file):
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+def get_parse_cache():
+    if 'parse_cache' not in st.session_state:
+        st.session_state.parse_cache = BytesLRUCache(
+            PARSE_CACHE_MAX_BYTES,
+            sizeof=lambda df: int(df.memory_usage(deep=True).sum()),
+        )
+    return st.session_state.parse_cache
+
+def session_output_path(file_name):
+    """Path for a generated file in this session's temporary directory.
+
+    The directory belongs to the session state: it is deleted when the session
+    ends and its state is dropped, or when the server shuts down.
+    """
+    if 'output_dir' not in st.session_state:
+        st.session_state.output_dir = tempfile.TemporaryDirectory(prefix="stickers-")
+    return os.path.join(st.session_state.output_dir.name, file_name)
+
+def read_uploaded_file(uploaded_file):
+    """Parse an uploaded CSV/Excel file once per session, however many reruns ask for it"""
+    def parse():
+        content = BytesIO(uploaded_file.getvalue())
+        if uploaded_file.type == "text/csv":
+            return pd.read_csv(content)
+        return pd.read_excel(content)
+
+    return get_parse_cache().get_or_create(file_content_hash(uploaded_file), parse)
+
+def show_cache_stats(placeholder):
+    parse_stats = get_parse_cache().stats()
+    qr_stats = qr_tile_cache.stats()
+    lines = [
+        f"📦 Parse cache: {parse_stats['hits']} hits · {parse_stats['misses']} misses",
+        f"🔳 QR cache: {qr_stats['hits']} hits · {qr_stats['misses']} misses · "
+        f"{qr_stats['bytes'] / 1024 / 1024:.1f} MB",
     ]
+    if QR_CACHE_DIR:
+        lines.append(f"💽 QR disk cache: {qr_disk_stats['hits']} hits · {qr_disk_stats['misses']} misses")
+    placeholder.caption("  \n".join(lines))
+
+# Longest a sticker job may render before it is stopped
+STICKER_JOB_BUDGET_SECONDS = 10 * 60
+
+def submit_sticker_job(action, template, locations, parallel, **options):
+    """Render a sticker PDF in the background; clicking again while it runs keeps the running job"""
+    output = session_output_path(f"sticker{action}.pdf")
+    # The output file is unique to this session and action, so it doubles as the job key
+    job = job_runner.submit(
+        output,
+        len(locations),
+        render_stickers,
+        args=(template, locations, parallel),
+        kwargs=dict(output=output, **options),
+        budget=STICKER_JOB_BUDGET_SECONDS,
+    )
+    st.session_state[f"sticker_job_{action}"] = job.id
 
-    # Set initial line width
-    pdf.setLineWidth(mm(0.035))
-
-    for unique_id in data['split_values'].keys():
-        components = data['split_values'][unique_id]  # Get split components for this ID
-        original_value = data['original_values'][unique_id]
-        
-        # Check if we need to start a new row
-        if x_offset + total_entity_width > page_width - mm(19.40):
-            x_offset = x_start
-            y_offset -= compartment_height + margin_between_entities
-
-        # Check if we need a new page
-        if y_offset < mm(17.63):
-            pdf.showPage()
-            pdf.setPageSize(landscape(A3))
-            pdf.setLineWidth(mm(0.035))
-            x_offset = x_start
-            y_offset = page_height - mm(14.11)
-
-        # Draw compartments
-        current_x = x_offset
-        for i, width in enumerate(compartment_widths):
-            # Draw background
-            pdf.setFillColor(compartment_colors[i])
-            pdf.rect(current_x, y_offset - compartment_height, width, compartment_height, fill=1)
-
-            # Draw static string
-            pdf.setFillColor(colors.HexColor("#000000"))
-            pdf.setFont("Mitr-SemiBold", mm(3.2))
-            static_text = static_strings[i]
-            text_width = pdf.stringWidth(static_text, "Mitr-SemiBold", mm(3.2))
-            text_x = current_x + (width - text_width) / 2
-            pdf.drawString(text_x, y_offset - compartment_height + mm(1.76), static_text)
-
-            # Add QR code in the first compartment
-            if i == 0:
-                # Generate QR code and get ImageReader object
-                qr_image = create_qr_code(original_value, size_mm=qr_size / mm(1))
-                # Calculate center position for QR code
-                qr_x = current_x + (width - qr_size) / 2
-                qr_y = y_offset - compartment_height + (compartment_height - qr_size) / 2
-                # Draw QR code
-                pdf.drawImage(qr_image, qr_x, qr_y, width=qr_size, height=qr_size)
-                
-            if i == 4:
-                arrow = "↑"
-                pdf.setFont("Mitr-SemiBold", mm(14))  # Adjust font size to fit 10mm compartment
-                arrow_width = pdf.stringWidth(arrow, "Mitr-SemiBold", mm(14))
-                arrow_x = current_x + (width - arrow_width) / 2
-                arrow_y = y_offset - compartment_height + mm(6)  # Adjusted position for centered arrow
-                pdf.setFillColor(colors.HexColor("#000000"))
-                pdf.drawString(arrow_x, arrow_y, arrow)
-
-            # Draw component - starting from the second compartment (index 1)
-            if 1 <= i < len(components) + 1:
-                pdf.setFont("Mitr-SemiBold", mm(16.93))
-                component_text = components[i - 1]
-                text_width = pdf.stringWidth(component_text, "Mitr-SemiBold", mm(16.93))
-                text_x = current_x + (width - text_width) / 2
-                pdf.drawString(text_x, y_offset - compartment_height + mm(7.76), component_text)
-
-            current_x += width
-
-        # Move x_offset for next entity
-        x_offset += total_entity_width + margin_between_entities
-
-    pdf.save()
-    pdf_buffer.seek(0)  # Move to the beginning of the BytesIO buffer
-    return pdf_buffer.getvalue()  # Return the PDF data
-
-def save_to_pdf3(data1):
-    
-    # Create a BytesIO buffer to save the PDF in memory
-    pdf_buffer = BytesIO()
-    
-    # Register the font
-    font_path = "https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Mitr-SemiBold.ttf"
-    pdfmetrics.registerFont(TTFont('Mitr-SemiBold', font_path))
+def show_sticker_job(action, template, file_name):
+    job = job_runner.get(st.session_state.get(f"sticker_job_{action}"))
+    if job is None:
+        return
+    # Only a running job needs polling; a finished one is drawn once by the full run
+    status = st.fragment(sticker_job_status, run_every=1 if job.active else None)
+    status(job, action, labels_per_page(template), file_name, polling=job.active)
+
+def sticker_job_status(job, action, per_page, file_name, polling):
+    if job.active:
+        if job.status == QUEUED:
+            st.info(f"Sticker {action} is queued behind other jobs...")
+        else:
+            text = (
+                f"Sticker {action}: {job.done:,} of {job.total:,} labels · "
+                f"page {job.done // per_page} of {-(-job.total // per_page)}"
+            )
+            eta = job.eta()
+            if eta is not None:
+                text += f" · about {eta:.0f}s left"
+            st.progress(job.fraction, text=text)
+        if st.button("Cancel", key=f"cancel_job_{action}"):
+            job.cancel()
+        return
 
-    # Initialize PDF with A3 landscape
-    pdf = canvas.Canvas(pdf_buffer, pagesize=landscape(A3))
-    page_width, page_height = landscape(A3)
-    
-    # Initialize positions
-    x_start = mm(9.5)
-    y_start = page_height - mm(14.11)
-    
-    # Define dimensions
-    qr_box_width = mm(40)
-    qr_box_height = mm(46)
-    margin = mm(5)
-    qr_size = mm(35)
-    
-    x_offset = x_start
-    y_offset = y_start
-    
-    for unique_id, value in data1.items():
-        # Check if we need to start a new row
-        if x_offset + qr_box_width > page_width - x_start:
-            x_offset = x_start
-            y_offset -= qr_box_height + margin
-            
-        # Check if we need a new page
-        if y_offset - qr_box_height < mm(14.11):
-            pdf.showPage()
-            pdf.setPageSize(landscape(A3))
-            x_offset = x_start
-            y_offset = y_start
-            
-        # Draw box
-        pdf.rect(x_offset, y_offset - qr_box_height, qr_box_width, qr_box_height)
-        
-        # Add QR code
-        qr_image = create_qr_code(value, size_mm=qr_size / mm(1))  # QR code contains the ID number
-        qr_x = x_offset + (qr_box_width - qr_size) / 2
-        qr_y = y_offset - qr_box_height + mm(9.5)
-        pdf.drawImage(qr_image, qr_x, qr_y, width=qr_size, height=qr_size)
-        
-        # Draw separator line
-        line_y = y_offset - qr_box_height + mm(8)  # Position between QR and text
-        pdf.line(x_offset, line_y, x_offset + qr_box_width, line_y)
-        
-        # Set the fill color and draw the rectangle for background
-        pdf.setFillColor(colors.HexColor("#FF6700"))  # Set background color
-        pdf.rect(x_offset, line_y - mm(8), qr_box_width, mm(8), fill=1)  # Fill the rectangle
-        
-        # Determine if text needs wrapping
-        max_chars_per_line = 12
-        lines = [value[i:i+max_chars_per_line] for i in range(0, len(value), max_chars_per_line)]
-        font_size = 14
-        pdf.setFont("Mitr-SemiBold", font_size)
-        pdf.setFillColor(colors.HexColor("#000000"))
-
-        for idx, line in enumerate(lines[:2]):  # Limit to max 2 lines
-            text_width = pdf.stringWidth(line, "Mitr-SemiBold", font_size)
-            text_x = x_offset + (qr_box_width - text_width) / 2
-            text_y = y_offset - qr_box_height + mm(2.5) - (idx * mm(5))
-            pdf.drawString(text_x, text_y, line)
-
-        x_offset += qr_box_width + margin
-    
-    pdf.save()
-    pdf_buffer.seek(0)  # Move to the beginning of the BytesIO buffer
-    return pdf_buffer.getvalue()  # Return the PDF data
+    if polling:
+        # The job just ended: rerun the whole page so this fragment stops polling
+        st.rerun()
 
-def save_to_pdf4(data1):
-    
-    # Create a BytesIO buffer to save the PDF in memory
-    pdf_buffer = BytesIO()
-    
-    # Register the font
-    font_path = "https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Mitr-SemiBold.ttf"
-    pdfmetrics.registerFont(TTFont('Mitr-SemiBold', font_path))
+    if job.status == DONE:
+        st.success(f"PDF successfully generated for Sticker {action}! ({job.elapsed():.1f}s)")
+        with open(job.result, "rb") as pdf_file:
+            st.download_button(
+                label=f"Download PDF for Sticker {action}",
+                data=pdf_file,
+                file_name=file_name,
+                mime="application/pdf",
+            )
+    elif job.status == CANCELLED:
+        st.warning(f"Sticker {action} was cancelled.")
+    elif job.status == TIMED_OUT:
+        st.error(f"Sticker {action} was stopped after running past its {STICKER_JOB_BUDGET_SECONDS // 60} minute budget.")
+    else:
+        st.error(f"Sticker {action} failed: {job.error}")
 
-    # Initialize PDF with A3 landscape
-    pdf = canvas.Canvas(pdf_buffer, pagesize=landscape(A3))
-    page_width, page_height = landscape(A3)
-    
-    # Initialize positions
-    x_start = mm(9.5)
-    y_start = page_height - mm(14.11)
-    
-    # Define dimensions
-    qr_box_width = mm(34)
-    qr_box_height = mm(66)
-    margin = mm(5)
-    qr_size = mm(25)
-     
-    x_offset = x_start
-    y_offset = y_start
-    
-    for unique_id, value in data1.items():
-        # Check if we need to start a new row
-        if x_offset + qr_box_width > page_width - x_start:
-            x_offset = x_start
-            y_offset -= qr_box_height + margin
-            
-        # Check if we need a new page
-        if y_offset - qr_box_height < mm(14.11):
-            pdf.showPage()
-            pdf.setPageSize(landscape(A3))
-            x_offset = x_start
-            y_offset = y_start
-            
-        # Draw box
-        pdf.rect(x_offset, y_offset - qr_box_height, qr_box_width, qr_box_height)
-        pdf.rect(x_offset + mm(2), y_offset - qr_box_height + mm(29.5), qr_box_width - mm(4), qr_box_height - mm(31.5))
-        pdf.rect(x_offset + mm(2), y_offset - qr_box_height + mm(1.5), qr_box_width - mm(4), qr_box_height - mm(39.5))
-        
-        # Draw the background rectangle
-        pdf.setFillColor(colors.HexColor("#E2EFDB"))  # Set background color
-        pdf.rect(x_offset + mm(2), y_offset - qr_box_height + mm(1.5), qr_box_width - mm(4), qr_box_height - mm(39.5), fill=1)  # Fill the rectangle
-        
-        # Add the last letter of the value string inside the background rectangle
-        if value:  # Ensure the string is not empty
-            last_letter = value[-1]
-            pdf.setFont("Mitr-SemiBold", 100)  # Adjust font size for better visibility
-            pdf.setFillColor(colors.HexColor("#000000"))  # Set text color
-            last_letter_x = x_offset + qr_box_width / 2  # Center horizontally
-            last_letter_y = y_offset - qr_box_height + mm(2.5)  # Adjust vertical position within the rectangle
-            pdf.drawCentredString(last_letter_x, last_letter_y, last_letter)
-        
-        # Add QR code
-        qr_image = create_qr_code(value, size_mm=qr_size / mm(1))  # QR code contains the ID number
-        qr_x = x_offset + (qr_box_width - qr_size) / 2
-        qr_y = y_offset - qr_box_height + mm(37)
-        pdf.drawImage(qr_image, qr_x, qr_y, width=qr_size, height=qr_size)
-                
-        # Auto-scaling the label text below QR code
-        font_size = 12
-        max_width = qr_box_width - mm(4)
-
-        # Reduce font size until it fits
-        while pdf.stringWidth(value, "Mitr-SemiBold", font_size) > max_width and font_size > 8:
-            font_size -= 1
-
-        pdf.setFont("Mitr-SemiBold", font_size)
-        pdf.setFillColor(colors.HexColor("#000000"))
-        text_width = pdf.stringWidth(value, "Mitr-SemiBold", font_size)
-        text_x = x_offset + (qr_box_width - text_width) / 2
-        text_y = y_offset - qr_box_height + mm(31.5)
-        pdf.drawString(text_x, text_y, value)
-
-        x_offset += qr_box_width + margin
-    
-    pdf.save()
-    pdf_buffer.seek(0)  # Move to the beginning of the BytesIO buffer
-    return pdf_buffer.getvalue()  # Return the PDF data
+#######################
+####### # NEW  ########
+#######################
+# Preview page sizes, in sheet entries (store headers and labels); even, so the
+# two-across grid stays aligned with the printed sheet
+SAMPLE_PREVIEW_PAGE_SIZES = (12, 24, 48)
+# Rough height of one two-across row of 9 cm stickers in the preview frame
+SAMPLE_PREVIEW_ROW_HEIGHT = 400
+
+# This app's own spool journal, so it never resumes jobs queued by streamlit.py
+APP_SPOOL_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_print_spool.sqlite3")
+PRINTER_HELP = "tcp://host:9100, cups://queue, file:///dev/usb/lp0 or win://printer name"
+
+@st.cache_resource(show_spinner=False)
+def app_print_spooler():
+    return PrintSpooler(APP_SPOOL_DB_PATH)
+
+def show_thermal_print(results):
+    """Send the batch's labels (no store headers or blank pads) to a TSPL printer as one job"""
+    labels = [sticker_entry_label(entry) for entry in results if not entry.get("isStoreNameRow") and not is_blank_label(entry)]
+    spooler = app_print_spooler()
+    with st.expander("🖨️ Print on the thermal printer"):
+        printer_uri = st.text_input("Printer", DEFAULT_PRINTER, key="sample_printer", help=PRINTER_HELP)
+        st.caption(f"{len(labels)} labels, two across on {-(-len(labels) // len(LABEL_COLUMNS))} rows, sent as one job")
+        if st.button(f"Send {len(labels)} labels to printer", disabled=not labels):
+            try:
+                st.session_state.sample_print_job = spooler.submit(
+                    printer_uri, compile_tspl_form_batch(labels), f"Sample Page, {len(labels)} labels"
+                )
+            except SpoolerFull as e:
+                st.warning(f"⏳ Print queue is full: {e}")
+        show_print_job(spooler, st.session_state.get("sample_print_job"))
+
+def show_sticker_thermal_print(action, template, uploaded_files):
+    """Print a sticker design straight to a TSPL printer, one label per location on roll stock"""
+    spooler = app_print_spooler()
+    with st.expander("🖨️ Print on the thermal printer"):
+        if not fits_print_width(template):
+            st.warning(f"Sticker {action} is wider than the printer's {PRINT_WIDTH_MM} mm head; its right edge will be cut off.")
+        printer_uri = st.text_input("Printer", DEFAULT_PRINTER, key=f"sticker_printer_{action}", help=PRINTER_HELP)
+        if st.button(f"Print Sticker {action} labels", key=f"print_sticker_button_{action}"):
+            if uploaded_files:
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    try:
+                        st.session_state[f"sticker_print_job_{action}"] = spooler.submit(
+                            printer_uri, compile_sticker_tspl(template, locations), f"Sticker {action}, {len(locations)} labels"
+                        )
+                    except SpoolerFull as e:
+                        st.warning(f"⏳ Print queue is full: {e}")
+                else:
+                    st.error("No valid data found in the uploaded files.")
+            else:
+                st.error("Please upload at least one CSV or Excel file.")
+        show_print_job(spooler, st.session_state.get(f"sticker_print_job_{action}"))
+
+def show_print_job(spooler, job_id):
+    job = spooler.job(job_id)
+    if job is not None:
+        pending = job["status"] in (PRINT_QUEUED, SENDING, RETRYING)
+        status = st.fragment(print_job_status, run_every=2 if pending else None)
+        status(spooler, job["id"], polling=pending)
+
+def print_job_status(spooler, job_id, polling):
+    job = spooler.job(job_id)
+    if job is None:
+        return
+    if job["status"] in (PRINT_QUEUED, SENDING):
+        st.info(f"Print job #{job_id} is {job['status']}...")
+    elif job["status"] == RETRYING:
+        st.warning(f"Print job #{job_id} is waiting to retry (attempt {job['attempts'] + 1}): {job['error']}")
+        if st.button("Cancel", key=f"cancel_print_{job_id}"):
+            spooler.cancel(job_id)
+    elif polling:
+        # The job just finished: rerun the whole page so this fragment stops polling
+        st.rerun()
+    elif job["status"] == PRINT_DONE:
+        st.success(f"✅ Print job #{job_id} sent to {job['printer']}.")
+    elif job["status"] == PRINT_CANCELLED:
+        st.warning(f"Print job #{job_id} was cancelled.")
+    else:
+        st.error(f"❌ Print job #{job_id} failed after {job['attempts']} attempts: {job['error']}")
+
+def sample_export(column, key, build, icon, what, file_name, mime):
+    """A download for the whole batch that is only built once asked for, then kept until the next Generate"""
+    # The download button takes the prepare button's place once the file is built
+    slot = column.empty()
+    if key not in st.session_state and slot.button(f"{icon} Prepare {what}", key=f"prepare_{key}"):
+        with st.spinner(f"Building {file_name}..."):
+            st.session_state[key] = build()
+    if key in st.session_state:
+        slot.download_button(label=f"{icon} Download {what}", data=st.session_state[key], file_name=file_name, mime=mime)
+
+def show_sample_preview(results):
+    """Exports for the whole batch, built on request, and a preview that renders only the page being looked at"""
+    export_pdf, export_html = st.columns(2)
+    sample_export(
+        export_pdf, "sample_export_pdf", lambda: render_sample_pdf(results),
+        "📄", "print-ready PDF", "Sample stickers.pdf", "application/pdf",
+    )
+    sample_export(
+        export_html, "sample_export_html", lambda: sticker_html_page(render_sticker_html(results)),
+        "🖨️", "printable HTML", "Sample stickers.html", "text/html",
+    )
 
-def save_to_pdf5(data1):
-    
-    # Create a BytesIO buffer to save the PDF in memory
-    pdf_buffer = BytesIO()
-    
-    # Register the font
-    font_path = "https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Mitr-SemiBold.ttf"
-    pdfmetrics.registerFont(TTFont('Mitr-SemiBold', font_path))
+    show_thermal_print(results)
 
-    # Initialize PDF with A3 landscape
-    pdf = canvas.Canvas(pdf_buffer, pagesize=landscape(A3))
-    page_width, page_height = landscape(A3)
-    
-    # Initialize positions
-    x_start = mm(9.5)
-    y_start = page_height - mm(14.11)
-    
-    # Define dimensions
-    qr_box_width = mm(40)
-    qr_box_height = mm(46)
-    margin = mm(5)
-    qr_size = mm(35)
-    
-    x_offset = x_start
-    y_offset = y_start
-    
-    for unique_id, value in data1.items():
-        # Check if we need to start a new row
-        if x_offset + qr_box_width > page_width - x_start:
-            x_offset = x_start
-            y_offset -= qr_box_height + margin
-            
-        # Check if we need a new page
-        if y_offset - qr_box_height < mm(14.11):
-            pdf.showPage()
-            pdf.setPageSize(landscape(A3))
-            x_offset = x_start
-            y_offset = y_start
-            
-        # Draw box
-        pdf.rect(x_offset, y_offset - qr_box_height, qr_box_width, qr_box_height)
-        
-        # Add QR code
-        qr_image = create_qr_code(value, size_mm=qr_size / mm(1))  # QR code contains the ID number
-        qr_x = x_offset + (qr_box_width - qr_size) / 2
-        qr_y = y_offset - qr_box_height + mm(9.5)
-        pdf.drawImage(qr_image, qr_x, qr_y, width=qr_size, height=qr_size)
-        
-        # Draw separator line
-        line_y = y_offset - qr_box_height + mm(8)  # Position between QR and text
-        pdf.line(x_offset, line_y, x_offset + qr_box_width, line_y)
-        
-        # Set the fill color and draw the rectangle for background
-        pdf.setFillColor(colors.HexColor("#FFD700"))  # Set background color
-        pdf.rect(x_offset, line_y - mm(8), qr_box_width, mm(8), fill=1)  # Fill the rectangle
-        
-        # Determine if text needs wrapping
-        max_chars_per_line = 12
-        lines = [value[i:i+max_chars_per_line] for i in range(0, len(value), max_chars_per_line)]
-        font_size = 14
-        pdf.setFont("Mitr-SemiBold", font_size)
-        pdf.setFillColor(colors.HexColor("#000000"))
-
-        for idx, line in enumerate(lines[:2]):  # Limit to max 2 lines
-            text_width = pdf.stringWidth(line, "Mitr-SemiBold", font_size)
-            text_x = x_offset + (qr_box_width - text_width) / 2
-            text_y = y_offset - qr_box_height + mm(2.5) - (idx * mm(5))
-            pdf.drawString(text_x, text_y, line)
+    st.subheader("🔖 Sticker Preview")
+    if not results:
+        st.info("No stickers for the entered DESIGNNOs.")
+        return
 
-        
-        x_offset += qr_box_width + margin
-    
-    pdf.save()
-    pdf_buffer.seek(0)  # Move to the beginning of the BytesIO buffer
-    return pdf_buffer.getvalue()  # Return the PDF data
+    size_column, page_column = st.columns(2)
+    page_size = size_column.selectbox("Stickers per page", SAMPLE_PREVIEW_PAGE_SIZES, key="sample_preview_page_size")
+    pages = -(-len(results) // page_size)
+    # Changing the page size can leave the remembered page past the end
+    if st.session_state.get("sample_preview_page", 1) > pages:
+        st.session_state.sample_preview_page = pages
+    page = page_column.number_input("Page", min_value=1, max_value=pages, step=1, key="sample_preview_page")
+
+    start = (page - 1) * page_size
+    stop = min(start + page_size, len(results))
+    st.caption(f"Showing entries {start + 1}–{stop} of {len(results)} · page {page} of {pages}")
+    rendered_html = render_sticker_html(results, start, stop)
+    height = -(-(stop - start) // 2) * SAMPLE_PREVIEW_ROW_HEIGHT + 40
+    st.components.v1.html(sticker_html_page(rendered_html, print_button=False), height=min(height, 2000), scrolling=True)
 
-#######################
-####### # NEW  ########
-#######################
 def sample_page():
     st.title("📄 Sample Page: Excel-Based Label Generator")
 
+    use_store = st.checkbox("💾 Keep inventory in local store (no re-upload needed)", value=True)
+    store_info = inventory_store_info() if use_store else None
+
     uploaded_file = st.file_uploader("📤 Upload Excel File", type=["xlsx"])
 
-    if uploaded_file:
+    if uploaded_file or store_info:
         try:
-            df = pd.read_excel(uploaded_file)
-            st.success("✅ File uploaded successfully!")
-            st.subheader("Excel Data Preview")
-            st.dataframe(df)
+            df = None
+            if uploaded_file:
+                file_hash = file_content_hash(uploaded_file)
+                if not use_store or store_info is None or store_info.get("source_hash") != file_hash:
+                    df = read_uploaded_file(uploaded_file)
+                    st.success("✅ File uploaded successfully!")
+                    if use_store:
+                        save_inventory_to_store(df, uploaded_file.name, file_hash)
+                        store_info = inventory_store_info()
+                        st.success("💾 Inventory store refreshed.")
+
+            if df is not None:
+                st.subheader("Excel Data Preview")
+                st.dataframe(df)
+            if use_store:
+                st.caption(
+                    f"💾 Using stored inventory **{store_info['source_name']}** "
+                    f"({store_info['rows']} rows, loaded {store_info['loaded_at']})"
+                )
 
             design_ids = st.text_area("🎯 Enter DESIGNNOs (one per line)", height=68)
 
             if st.button("🚀 Generate Stickers"):
+                if use_store:
+                    # Index lookup of just the requested designs instead of a full-sheet scan
+                    df = load_inventory_for_designs(design_ids)
                 results = generate_sticker_data_from_df(df, design_ids)
-                rendered_html = render_sticker_html(results)
-
-                full_page = f"""
-                <html>
-                <head>{CSS_TEMPLATE}</head>
-                <body>
-                    <button onclick="window.print()" style="margin:20px;padding:10px;">🖨️ Print</button>
-                    {rendered_html}
-                </body>
-                </html>
-                """
-                st.subheader("🔖 Sticker Preview")
-                st.components.v1.html(full_page, height=2000, scrolling=True)
+                # Exports of the previous batch no longer match; they are rebuilt when asked for
+                st.session_state.sample_stickers = results
+                st.session_state.pop("sample_export_pdf", None)
+                st.session_state.pop("sample_export_html", None)
+                st.session_state.sample_preview_page = 1
+
+            if 'sample_stickers' in st.session_state:
+                show_sample_preview(st.session_state.sample_stickers)
 
         except Exception as e:
             st.error(f"❌ Failed to read Excel file: {e}")
@@ -976,9 +761,12 @@ def main():
         "Sticker Generator",
         "Sample Page"
     ])
+    # Filled in at the end of the run, once this run's cache lookups have been counted
+    cache_status = st.sidebar.empty()
 
     if page == "Sample Page":
         sample_page()
+        show_cache_stats(cache_status)
         return
 
     # --- Sticker Generator Page ---
@@ -986,6 +774,10 @@ def main():
     st.subheader("The file expected to load should have a single column of data in first column with a header")
     uploaded_files = st.file_uploader("Upload CSV or Excel files", type=["csv", "xlsx"], accept_multiple_files=True)
     st.sidebar.header("Choose Actions")
+    parallel = st.sidebar.checkbox(
+        f"⚡ Parallel rendering ({os.cpu_count()} cores)",
+        help="Large jobs are split page by page across worker processes.",
+    )
 
     # Initialize session state variables
     if 'show_generate_pdf_action1' not in st.session_state:
@@ -1015,30 +807,16 @@ def main():
     if st.session_state.show_generate_pdf_action1:
         if st.button("Generate PDF for Sticker 1", key="generate_pdf_button_1"):
             if uploaded_files:    
-                data = {}
-                for uploaded_file in uploaded_files:
-                    if uploaded_file.type == "text/csv":
-                        df = pd.read_csv(uploaded_file)
-                    else:  # Excel file
-                        df = pd.read_excel(uploaded_file)
-    
-                    # Correctly unpack the tuple returned by extract_data_from_dataframe
-                    _, file_data = extract_data_from_dataframe(df)
-                    data.update(file_data)
-    
-                if data:
-                    pdf_bytes = save_to_pdf(data)
-                    st.success("PDF successfully generated for Sticker 1!")
-                    st.download_button(
-                        label="Download PDF for Sticker 1",
-                        data=pdf_bytes,
-                        file_name="Sticker.pdf",
-                        mime="application/pdf",
-                    )
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    submit_sticker_job(1, "rack_blue", locations, parallel)
                 else:
                     st.warning("No data extracted from the uploaded files.")
             else:
                 st.error("Please upload at least one CSV or Excel file.")
+        show_sticker_job(1, "rack_blue", "Sticker.pdf")
+        show_sticker_thermal_print(1, "rack_blue", uploaded_files)
     
     # Action 2
     if st.sidebar.button("Sticker 2", key="action2_button"):
@@ -1054,29 +832,16 @@ def main():
     if st.session_state.show_generate_pdf_action2:
         if st.button("Generate PDF for Sticker 2", key="generate_pdf_button_2"):
             if uploaded_files:    
-                data = {}
-                for uploaded_file in uploaded_files:
-                    if uploaded_file.type == "text/csv":
-                        df = pd.read_csv(uploaded_file)
-                    else:
-                        df = pd.read_excel(uploaded_file)
-
-                    _, file_data = extract_data_from_dataframe(df)
-                    data.update(file_data)
-                    
-                if data:
-                    pdf_bytes = save_to_pdf1(data)
-                    st.success("PDF successfully generated for Sticker 2!")
-                    st.download_button(
-                        label="Download PDF for Sticker 2",
-                        data=pdf_bytes,
-                        file_name="Colored sticker.pdf",
-                        mime="application/pdf"
-                    )
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    submit_sticker_job(2, "rack_colored", locations, parallel)
                 else:
                     st.error("No valid data found in the uploaded files.")
             else:
                 st.error("Please upload at least one CSV or Excel file.")
+        show_sticker_job(2, "rack_colored", "Colored sticker.pdf")
+        show_sticker_thermal_print(2, "rack_colored", uploaded_files)
                 
     # Action 3
     if st.sidebar.button("Sticker 3", key="action3_button"):
@@ -1090,31 +855,19 @@ def main():
     st.sidebar.image("https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Qr%20%2B%20Sticker.png", use_container_width=True)
 
     if st.session_state.show_generate_pdf_action3:
+        qr_mode = QR_MODES[st.radio("QR rendering", list(QR_MODES), horizontal=True, key="qr_mode_3")]
         if st.button("Generate PDF for Sticker 3", key="generate_pdf_button_3"):
             if uploaded_files:    
-                data = {}
-                for uploaded_file in uploaded_files:
-                    if uploaded_file.type == "text/csv":
-                        df = pd.read_csv(uploaded_file)
-                    else:
-                        df = pd.read_excel(uploaded_file)
-
-                    _, file_data = extract_data_from_dataframe(df)
-                    data.update(file_data)
-                    
-                if data:
-                    pdf_bytes = save_to_pdf2(data)
-                    st.success("PDF successfully generated for Sticker 3!")
-                    st.download_button(
-                        label="Download PDF for Sticker 3",
-                        data=pdf_bytes,
-                        file_name="Qr + Sticker.pdf",
-                        mime="application/pdf"
-                    )
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    submit_sticker_job(3, "rack_qr", locations, parallel, qr_mode=qr_mode)
                 else:
                     st.error("No valid data found in the uploaded files.")
             else:
                 st.error("Please upload at least one CSV or Excel file.")
+        show_sticker_job(3, "rack_qr", "Qr + Sticker.pdf")
+        show_sticker_thermal_print(3, "rack_qr", uploaded_files)
                 
     # Action 4
     if st.sidebar.button("Sticker 4", key="action4_button"):
@@ -1128,31 +881,19 @@ def main():
     st.sidebar.image("https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Qr.png", use_container_width=True)
 
     if st.session_state.show_generate_pdf_action4:
+        qr_mode = QR_MODES[st.radio("QR rendering", list(QR_MODES), horizontal=True, key="qr_mode_4")]
         if st.button("Generate PDF for Sticker 4", key="generate_pdf_button_4"):
             if uploaded_files:
-                data1 = {}
-                for uploaded_file in uploaded_files:
-                    if uploaded_file.type == "text/csv":
-                        df = pd.read_csv(uploaded_file)
-                    else:
-                        df = pd.read_excel(uploaded_file)
-    
-                    data1_part, _ = extract_data_from_dataframe(df)
-                    data1.update(data1_part)
-    
-                if data1:
-                    pdf_bytes = save_to_pdf3(data1)
-                    st.success("PDF successfully generated for Sticker 4!")
-                    st.download_button(
-                        label="Download PDF for Sticker 4",
-                        data=pdf_bytes,
-                        file_name="Qr_orange_label.pdf",
-                        mime="application/pdf"
-                    )
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    submit_sticker_job(4, "qr_orange", locations, parallel, qr_mode=qr_mode)
                 else:
                     st.error("No valid data found in the uploaded files.")
             else:
                 st.error("Please upload at least one CSV or Excel file.")
+        show_sticker_job(4, "qr_orange", "Qr_orange_label.pdf")
+        show_sticker_thermal_print(4, "qr_orange", uploaded_files)
                 
     # Action 5
     if st.sidebar.button("Sticker 5", key="action5_button"):
@@ -1166,31 +907,19 @@ def main():
     st.sidebar.image("https://raw.githubusercontent.com/Shivarajkushals/Trial/main/Qr%20Alpha.png", use_container_width=True)
 
     if st.session_state.show_generate_pdf_action5:
+        qr_mode = QR_MODES[st.radio("QR rendering", list(QR_MODES), horizontal=True, key="qr_mode_5")]
         if st.button("Generate PDF for Sticker 5", key="generate_pdf_button_5"):
             if uploaded_files:
-                data1 = {}
-                for uploaded_file in uploaded_files:
-                    if uploaded_file.type == "text/csv":
-                        df = pd.read_csv(uploaded_file)
-                    else:
-                        df = pd.read_excel(uploaded_file)
-    
-                    data1_part, _ = extract_data_from_dataframe(df)
-                    data1.update(data1_part)
-    
-                if data1:
-                    pdf_bytes = save_to_pdf4(data1)
-                    st.success("PDF successfully generated for Sticker 5!")
-                    st.download_button(
-                        label="Download PDF for Sticker 5",
-                        data=pdf_bytes,
-                        file_name="Qr_Alpha.pdf",
-                        mime="application/pdf"
-                    )
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    submit_sticker_job(5, "qr_alpha", locations, parallel, qr_mode=qr_mode)
                 else:
                     st.error("No valid data found in the uploaded files.")
             else:
                 st.error("Please upload at least one CSV or Excel file.")
+        show_sticker_job(5, "qr_alpha", "Qr_Alpha.pdf")
+        show_sticker_thermal_print(5, "qr_alpha", uploaded_files)
                 
     # Action 6
     if st.sidebar.button("Sticker 6", key="action6_button"):
@@ -1204,31 +933,21 @@ def main():
     st.sidebar.image("https://raw.githubusercontent.com/Shivarajkushals/Trial/main/new.png", use_container_width=True)
 
     if st.session_state.show_generate_pdf_action6:
+        qr_mode = QR_MODES[st.radio("QR rendering", list(QR_MODES), horizontal=True, key="qr_mode_6")]
         if st.button("Generate PDF for Sticker 6", key="generate_pdf_button_6"):
             if uploaded_files:
-                data1 = {}
-                for uploaded_file in uploaded_files:
-                    if uploaded_file.type == "text/csv":
-                        df = pd.read_csv(uploaded_file)
-                    else:
-                        df = pd.read_excel(uploaded_file)
-    
-                    data1_part, _ = extract_data_from_dataframe(df)
-                    data1.update(data1_part)
-    
-                if data1:
-                    pdf_bytes = save_to_pdf5(data1)
-                    st.success("PDF successfully generated for Sticker 6!")
-                    st.download_button(
-                        label="Download PDF for Sticker 6",
-                        data=pdf_bytes,
-                        file_name="Qr_New_label.pdf",
-                        mime="application/pdf"
-                    )
+                locations = extract_locations([read_uploaded_file(uploaded_file) for uploaded_file in uploaded_files])
+
+                if not locations.empty:
+                    submit_sticker_job(6, "qr_gold", locations, parallel, qr_mode=qr_mode)
                 else:
                     st.error("No valid data found in the uploaded files.")
             else:
                 st.error("Please upload at least one CSV or Excel file.")
+        show_sticker_job(6, "qr_gold", "Qr_New_label.pdf")
+        show_sticker_thermal_print(6, "qr_gold", uploaded_files)
+
+    show_cache_stats(cache_status)
 
 if __name__ == "__main__":
     main()
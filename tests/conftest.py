@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The modules live at the repo root, next to a streamlit.py that would shadow
+# the streamlit package if the root came first on sys.path (as `python -m
+# pytest` puts it), so the package is imported before the root is searched
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:] = [path for path in sys.path if os.path.abspath(path or os.curdir) != ROOT]
+import streamlit  # noqa: E402,F401
+
+sys.path.append(ROOT)
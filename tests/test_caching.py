@@ -0,0 +1,61 @@
+import pandas as pd
+import streamlit_app
+from caching import BytesLRUCache
+
+
+class Upload:
+    """What st.file_uploader hands over, as far as read_uploaded_file looks"""
+
+    def __init__(self, content, name="stock.csv", type="text/csv"):
+        self.content = content
+        self.name = name
+        self.type = type
+
+    def getvalue(self):
+        return self.content
+
+
+def test_eviction_keeps_the_cache_within_its_byte_budget():
+    cache = BytesLRUCache(10)
+    for key, size in [("a", 4), ("b", 4), ("c", 1)]:
+        cache.put(key, b"x" * size)
+    assert cache.get("a") is not None  # Now the most recently used
+
+    # 14 bytes: the least recently used entry goes, the rest fit
+    cache.put("d", b"x" * 5)
+    assert cache.total_bytes == 10
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache and "d" in cache
+
+    # Replacing a key counts only its new size: 11 bytes, so "c" goes too
+    cache.put("d", b"x" * 6)
+    assert cache.total_bytes == 10
+    assert "c" not in cache
+    assert cache.stats() == {"hits": 1, "misses": 0, "evictions": 2, "entries": 2, "bytes": 10}
+
+
+def test_value_larger_than_the_budget_is_returned_but_not_kept():
+    cache = BytesLRUCache(10)
+    cache.put("a", b"x" * 4)
+    assert cache.get_or_create("big", lambda: b"x" * 11) == b"x" * 11
+    assert "big" not in cache and "a" in cache
+    assert cache.total_bytes == 4
+
+
+def test_reupload_with_the_same_content_skips_parsing(monkeypatch):
+    cache = BytesLRUCache(1024 * 1024, sizeof=lambda df: int(df.memory_usage(deep=True).sum()))
+    monkeypatch.setattr(streamlit_app, "get_parse_cache", lambda: cache)
+    parses = []
+    read_csv = pd.read_csv
+    monkeypatch.setattr(pd, "read_csv", lambda content: parses.append(1) or read_csv(content))
+
+    first = streamlit_app.read_uploaded_file(Upload(b"DESIGNNO,Loc Qty\nD1,2\n"))
+    # Same bytes under another name, as a new upload object: served from the cache
+    again = streamlit_app.read_uploaded_file(Upload(b"DESIGNNO,Loc Qty\nD1,2\n", name="copy.csv"))
+    assert again is first
+    assert len(parses) == 1
+
+    changed = streamlit_app.read_uploaded_file(Upload(b"DESIGNNO,Loc Qty\nD1,3\n"))
+    assert len(parses) == 2
+    assert changed["Loc Qty"].tolist() == [3]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
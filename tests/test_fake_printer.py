@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+from fake_printer import count_labels
+from sticker_pdf import extract_locations
+from sticker_tspl import compile_sticker_tspl
+from tspl import LABEL_FIELDS, TSPL_ENCODING, compile_tspl_batch, compile_tspl_form_batch
+from tspl_emulator import emulate_tspl
+
+LABELS = [dict(zip(LABEL_FIELDS, (f"890123456{n:04d}", "Necklace", "RED", f"D{n}", "MATTE", "1299"))) for n in range(5)]
+LOCATIONS = extract_locations([pd.DataFrame({"loc": ["A-01-03", "B-12-07", "C-05-01"]})])
+
+
+@pytest.mark.parametrize("job", [
+    compile_tspl_batch(LABELS).encode(TSPL_ENCODING),
+    compile_tspl_form_batch(LABELS).encode(TSPL_ENCODING),
+    # Programs downloaded to flash carry an F, before their name
+    compile_tspl_form_batch(LABELS, flash=True).encode(TSPL_ENCODING),
+    # Background bitmaps inside a stored program
+    compile_sticker_tspl("rack_qr", LOCATIONS),
+], ids=["direct", "form", "flash form", "sticker form"])
+def test_counts_the_labels_the_printer_prints(job):
+    assert count_labels(job) == len(emulate_tspl(job).labels) > 0
+
+
+def test_forms_from_an_earlier_job_are_counted_when_their_programs_are_kept():
+    programs = {}
+    count_labels(compile_tspl_form_batch(LABELS[:1]).encode(TSPL_ENCODING), programs)
+    job = compile_tspl_form_batch(LABELS, download=False).encode(TSPL_ENCODING)
+    assert count_labels(job) == 0
+    assert count_labels(job, programs) == 3
+
+
+def test_run_and_copies():
+    job = b'DOWNLOAD "ONE.BAS"\r\nCLS\r\nPRINT 1,2\r\nEOP\r\nRUN "ONE.BAS"\r\none\r\nPRINT 3\r\n'
+    assert count_labels(job) == 2 + 2 + 3
@@ -0,0 +1,57 @@
+import threading
+import numpy as np
+import pandas as pd
+from streamlit_app import (
+    generate_sticker_data_from_df, inventory_store_info, load_inventory_for_designs, save_inventory_to_store,
+)
+
+# Mixed int/str/float object columns and blank cells, the way read_excel hands them over
+SHEET = pd.DataFrame({
+    "DESIGNNO": [16509, "A12", 16509, 7.0, " A12 "],
+    "Store Name": ["S1", "S2", "S1", 3, "S2"],
+    "Barcode Value": ["0001", 2, "0003", "0004", 5],
+    "Item Alias Name": ["E-R", np.nan, "X & Y", "Z", "W"],
+    "COLOR": [np.nan, np.nan, np.nan, np.nan, np.nan],
+    "POLISH": ["Gold", "Gold", np.nan, "Gold", "Rose"],
+    "SIZE": [1, 2, 3, 4, 5],
+    "Loc Qty": [1, "2", 3.5, np.nan, 0],
+    "NEW MRP": [1020.0, "N/A", 99.5, np.nan, 1299],
+})
+DESIGN_IDS = "16509\nA12\n16509\n16509\n7.0\n7\nmissing"
+
+
+def typed(results):
+    # NaN != NaN, so compare each value by its type and text
+    return [{key: (type(value).__name__, str(value)) for key, value in entry.items()} for entry in results]
+
+
+def test_stored_sheet_gives_the_same_stickers_as_the_uploaded_one(tmp_path):
+    db_path = str(tmp_path / "inventory.sqlite3")
+    save_inventory_to_store(SHEET, "sheet.xlsx", "abc", db_path)
+
+    stored = generate_sticker_data_from_df(load_inventory_for_designs(DESIGN_IDS, db_path), DESIGN_IDS)
+    assert typed(stored) == typed(generate_sticker_data_from_df(SHEET, DESIGN_IDS))
+    assert inventory_store_info(db_path)["rows"] == "5"
+
+
+def test_overlapping_saves_each_replace_the_whole_table(tmp_path):
+    db_path = str(tmp_path / "inventory.sqlite3")
+    sheets = {n: SHEET.assign(SIZE=SHEET["SIZE"] * n) for n in range(1, 7)}
+    errors = []
+
+    def save(n):
+        try:
+            save_inventory_to_store(sheets[n], f"sheet{n}.xlsx", str(n), db_path)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in sheets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    n = int(inventory_store_info(db_path)["source_hash"])
+    loaded = load_inventory_for_designs("16509\nA12\n7.0\nA12", db_path)
+    assert loaded["SIZE"].tolist() == (SHEET["SIZE"] * n).tolist()
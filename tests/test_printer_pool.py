@@ -0,0 +1,58 @@
+import time
+import printers
+from printer_pool import PrinterPool
+from spooler import DONE, FAILED, PrintSpooler
+
+
+class FlakyPrinter(printers.PrinterTransport):
+    """Answers its health check but fails every send"""
+
+    def _send(self, data):
+        raise printers.PrinterError("connection reset")
+
+
+def test_failed_job_moves_to_another_printer_once(tmp_path, monkeypatch):
+    spooler = PrintSpooler(str(tmp_path / "spool.sqlite3"), backoff=0)
+    pool = PrinterPool(spooler, check_seconds=3600)
+    dead, capture = f"file://{tmp_path / 'lp0'}", tmp_path / "jobs.tspl"
+    moves = []
+    reassign = spooler.reassign
+    monkeypatch.setattr(spooler, "reassign", lambda job_id, printer: moves.append(job_id) or reassign(job_id, printer))
+    try:
+        pool.add(dead)
+        pool.add(f"capture://{capture}")
+        job_id = spooler.submit(dead, b"PRINT 1\n")
+        deadline = time.monotonic() + 5
+        while spooler.job(job_id)["status"] != DONE:
+            assert time.monotonic() < deadline, spooler.job(job_id)
+            time.sleep(0.02)
+        assert moves == [job_id]
+        assert capture.read_bytes() == b"PRINT 1\n"
+        assert not {printer["uri"]: printer["healthy"] for printer in pool.printers()}[dead]
+    finally:
+        pool.stop()
+        spooler.stop()
+
+
+def test_job_failing_on_flaky_printers_stops_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setitem(printers.TRANSPORTS, "flaky", lambda parts, timeout: FlakyPrinter())
+    spooler = PrintSpooler(str(tmp_path / "spool.sqlite3"), max_attempts=3, backoff=0)
+    pool = PrinterPool(spooler, check_seconds=3600)
+    moves = []
+    reassign = spooler.reassign
+    monkeypatch.setattr(spooler, "reassign", lambda job_id, printer: moves.append(printer) or reassign(job_id, printer))
+    try:
+        pool.add("flaky://a")
+        pool.add("flaky://b")
+        job_id = spooler.submit("flaky://a", b"PRINT 1\n")
+        deadline = time.monotonic() + 5
+        while spooler.job(job_id)["status"] != FAILED:
+            assert time.monotonic() < deadline, spooler.job(job_id)
+            time.sleep(0.02)
+        assert spooler.job(job_id)["attempts"] == 3
+        assert moves == ["flaky://b", "flaky://a"]
+        # Both still answer their checks, so neither is taken out of the pool
+        assert len(pool.reachable()) == 2
+    finally:
+        pool.stop()
+        spooler.stop()
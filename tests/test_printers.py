@@ -0,0 +1,25 @@
+import pytest
+from printers import CaptureFile, PrinterError, open_printer
+
+
+@pytest.mark.parametrize("uri", ["tcp://host:abc", "tcp://:9100", "tcp://[::1", "file://", None])
+def test_malformed_uri_is_a_printer_error(uri):
+    with pytest.raises(PrinterError):
+        open_printer(uri)
+
+
+def test_missing_device_is_not_created(tmp_path):
+    device = tmp_path / "lp0"
+    with open_printer(f"file://{device}") as printer:
+        with pytest.raises(PrinterError):
+            printer.send("PRINT 1\n")
+    assert not device.exists()
+
+
+def test_capture_appends_jobs(tmp_path):
+    capture = tmp_path / "jobs.tspl"
+    with open_printer(f"capture://{capture}") as printer:
+        assert isinstance(printer, CaptureFile)
+        printer.send("CLS\n")
+        printer.send(b"PRINT 1\n")
+    assert capture.read_bytes() == b"CLS\nPRINT 1\n"
@@ -0,0 +1,96 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import pytest
+import printers
+from spooler import DONE, FAILED, SENDING, PrintSpooler
+
+
+class BrokenPrinter(printers.PrinterTransport):
+    def _send(self, data):
+        raise ValueError("not a printer error")
+
+
+class HeldPrinter(printers.PrinterTransport):
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    def _send(self, data):
+        self.release.wait(5)
+
+
+def wait_for(spooler, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while spooler.job(job_id)["status"] not in (DONE, FAILED):
+        assert time.monotonic() < deadline, spooler.job(job_id)
+        time.sleep(0.02)
+    return spooler.job(job_id)
+
+
+@pytest.fixture
+def spooler(tmp_path):
+    spooler = PrintSpooler(str(tmp_path / "spool.sqlite3"), max_attempts=2, backoff=0)
+    yield spooler
+    spooler.stop()
+
+
+def test_unexpected_send_error_fails_the_job_and_releases_it(spooler, monkeypatch):
+    monkeypatch.setitem(printers.TRANSPORTS, "broken", lambda parts, timeout: BrokenPrinter())
+    job = wait_for(spooler, spooler.submit("broken://printer", b"PRINT 1\n"))
+    assert job["status"] == FAILED
+    assert job["attempts"] == 2
+    assert "ValueError" in job["error"]
+    assert spooler.pending_bytes == 0
+
+
+def test_job_that_breaks_the_worker_does_not_block_the_next(spooler, tmp_path, monkeypatch):
+    capture = tmp_path / "jobs.tspl"
+    claim = spooler._claim
+    calls = []
+
+    def claim_once_broken(job_id, printer):
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise RuntimeError("journal went away")
+        return claim(job_id, printer)
+
+    monkeypatch.setattr(spooler, "_claim", claim_once_broken)
+    first = spooler.submit(f"capture://{capture}", b"FIRST\n")
+    second = spooler.submit(f"capture://{capture}", b"SECOND\n")
+    assert wait_for(spooler, first)["status"] == FAILED
+    assert wait_for(spooler, second)["status"] == DONE
+    assert capture.read_bytes() == b"SECOND\n"
+    assert spooler.pending_bytes == 0
+
+
+def test_dead_worker_is_replaced(spooler, tmp_path, monkeypatch):
+    capture = tmp_path / "jobs.tspl"
+    monkeypatch.setattr(spooler, "_claim", lambda job_id, printer: 1 / 0)
+    monkeypatch.setattr(spooler, "_abandon", lambda job_id, error: 1 / 0)
+    spooler.submit(f"capture://{capture}", b"LOST\n")
+    time.sleep(0.2)
+    monkeypatch.undo()
+    job = wait_for(spooler, spooler.submit(f"capture://{capture}", b"NEXT\n"))
+    assert job["status"] == DONE
+
+
+def test_locked_journal_does_not_stall_the_event_loop(spooler, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setitem(printers.TRANSPORTS, "held", lambda parts, timeout: HeldPrinter(release))
+    job_id = spooler.submit("held://printer", b"PRINT 1\n")
+    while spooler.job(job_id)["status"] != SENDING:
+        time.sleep(0.02)
+
+    # Another writer holds the journal while the send ends and the worker goes to record it
+    with closing(sqlite3.connect(spooler.db_path, isolation_level=None)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        release.set()
+        time.sleep(0.2)
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), spooler._loop).result(timeout=1)
+        assert spooler.job(job_id)["status"] == SENDING
+        conn.execute("ROLLBACK")
+
+    assert wait_for(spooler, job_id)["status"] == DONE
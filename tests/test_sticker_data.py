@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+from streamlit_app import generate_sticker_data_from_df
+
+
+def row_loop_sticker_data(df, design_ids_input):
+    # The iterrows implementation generate_sticker_data_from_df replaced
+    design_ids = [id.strip() for id in design_ids_input.split('\n') if id.strip()]
+    design_id_count = {id_: design_ids.count(id_) for id_ in design_ids}
+    found_count = {}
+    results = []
+    grouped_by_store = {}
+
+    design_map = {}
+    for _, row in df.iterrows():
+        design_no = str(row['DESIGNNO']).strip()
+        design_map.setdefault(design_no, []).append(row)
+
+    for design_id in design_ids:
+        if design_id not in design_map:
+            continue
+
+        for row in design_map[design_id]:
+            if found_count.get(design_id, 0) >= design_id_count[design_id]:
+                break
+
+            store_name = str(row['Store Name']).strip()
+            if store_name not in grouped_by_store:
+                grouped_by_store[store_name] = []
+
+            grouped_by_store[store_name].append({
+                "barcode": row.get("Barcode Value", ""),
+                "text": row.get("Barcode Value", ""),
+                "desc": row.get("Item Alias Name", ""),
+                "spec": row.get("COLOR", ""),
+                "designNo": row.get("DESIGNNO", ""),
+                "remark": row.get("POLISH", ""),
+                "feature1": row.get("SIZE", ""),
+                "feature2": row.get("Loc Qty", ""),
+                "mpr": row.get("NEW MRP", ""),
+                "storeName": store_name,
+                "isStoreNameRow": False
+            })
+
+            found_count[design_id] = found_count.get(design_id, 0) + 1
+
+    for store_name, label_entries in grouped_by_store.items():
+        results.append({"storeName": store_name, "isStoreNameRow": True})
+        results.extend(label_entries)
+
+        if len(label_entries) % 2 == 0:
+            results.append({
+                "storeName": store_name, "isStoreNameRow": False, "barcode": "", "text": "", "desc": "", "spec": "",
+                "designNo": "", "remark": "", "feature1": "", "feature2": "", "mpr": "",
+            })
+
+    return results
+
+
+def as_text(results):
+    # NaN != NaN and iterrows hands back numpy scalars, so compare what a label would show
+    return [{key: str(value) for key, value in entry.items()} for entry in results]
+
+
+SHEET = pd.DataFrame({
+    "DESIGNNO": ["D1", "D1", " D2 ", "D3", "D1", 104, "D5", "D5", "D6"],
+    "Store Name": ["Mall", "Airport", "Mall", " Airport ", "Station", "Mall", "Station", "Mall", "Airport"],
+    "Barcode Value": [f"89010000000{n}" for n in range(9)],
+    "Item Alias Name": ["Ring", "Ring", "Chain", np.nan, "Ring", "Bangle", "Stud", "Stud", "Hoop"],
+    "COLOR": ["RED", "RED", "GOLD", "BLUE", "RED", np.nan, "PINK", "PINK", "GREEN"],
+    "POLISH": ["MATTE"] * 9,
+    "SIZE": ["FREE", "FREE", 18, 20, "FREE", 2.4, "FREE", "FREE", 7],
+    "Loc Qty": [2, 0, np.nan, 1, 0, 3, np.nan, 0, 5],
+    "NEW MRP": [1299, 1299, 899, 450, 1299, 2100, 350, 350, 999],
+})
+
+
+@pytest.mark.parametrize("design_ids", [
+    "D1\nD2\nD3",
+    # Duplicates: more requests than rows wrap around to the first row again
+    "D1\nD1\nD5\nD1\nD1\nD1\nD5\nD5",
+    "D3\n\n  D2  \nD1\nD3\nD6\nD6",
+    # Zero and NaN quantities still print, and unknown IDs are skipped
+    "104\nD5\nnope\nD2\n104\nD5",
+    "nope",
+    "",
+])
+def test_matches_the_row_loop(design_ids):
+    assert as_text(generate_sticker_data_from_df(SHEET, design_ids)) == as_text(row_loop_sticker_data(SHEET, design_ids))
+
+
+def test_matches_the_row_loop_without_optional_columns():
+    sheet = SHEET.drop(columns=["COLOR", "Loc Qty"])
+    design_ids = "D1\nD5\nD1\nD6\nD2"
+    assert as_text(generate_sticker_data_from_df(sheet, design_ids)) == as_text(row_loop_sticker_data(sheet, design_ids))
+
+
+def test_matches_the_row_loop_on_a_random_sheet():
+    rng = np.random.default_rng(7)
+    sheet = pd.DataFrame({
+        "DESIGNNO": rng.choice([f"D{n}" for n in range(40)], 400),
+        "Store Name": rng.choice(["Mall", "Airport", "Station", "Plaza"], 400),
+        "Barcode Value": [f"{n:013d}" for n in range(400)],
+        "Loc Qty": rng.choice([0, 1, 2, np.nan], 400),
+        "NEW MRP": rng.integers(100, 5000, 400),
+    })
+    design_ids = "\n".join(rng.choice([f"D{n}" for n in range(45)], 300))
+    assert as_text(generate_sticker_data_from_df(sheet, design_ids)) == as_text(row_loop_sticker_data(sheet, design_ids))
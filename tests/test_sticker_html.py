@@ -0,0 +1,39 @@
+import re
+from streamlit_app import render_sticker_html
+
+
+def label(number, **values):
+    entry = {"isStoreNameRow": False, "barcode": f"8901{number:09d}", "text": f"8901{number:09d}", "desc": "Necklace",
+             "spec": "RED", "designNo": f"D{number}", "remark": "MATTE", "feature1": "FREE SIZE", "feature2": 2, "mpr": 1299}
+    entry.update(values)
+    return entry
+
+
+RESULTS = [
+    {"isStoreNameRow": True, "storeName": "A & B"},
+    label(1, desc='18" <b>chain</b>'),
+    label(2, spec="RED & GREEN"),
+    label(3),
+    {"isStoreNameRow": True, "storeName": "C"},
+    label(4, barcode=""),
+]
+
+
+def test_cell_values_are_escaped():
+    html = render_sticker_html(RESULTS)
+    assert "Store: A &amp; B" in html
+    assert '<td colspan="2">18" &lt;b&gt;chain&lt;/b&gt;</td>' in html
+    assert "<td>RED &amp; GREEN</td>" in html
+    assert "<b>" not in html
+
+
+def table_classes(html):
+    return re.findall(r'<table class="(\w+)">', html)
+
+
+def test_slices_count_odd_and_even_from_their_store_header():
+    assert table_classes(render_sticker_html(RESULTS)) == ["odd", "even", "odd", "odd"]
+    assert table_classes(render_sticker_html(RESULTS, 2, 4)) == ["even", "odd"]
+    assert table_classes(render_sticker_html(RESULTS, 4)) == ["odd"]
+    # The blank pad label has no barcode image
+    assert "<img" not in render_sticker_html(RESULTS, 5)
@@ -0,0 +1,17 @@
+import pandas as pd
+from sticker_pdf import extract_locations
+
+
+def test_extract_locations_splits_values_into_parts():
+    locations = extract_locations([pd.DataFrame({"loc": ["A-01-03", "B-02-01", "A-01-03"]})])
+    assert list(locations["value"]) == ["A-01-03", "B-02-01"]
+    assert list(locations["Rack"]) == ["A", "B"]
+    assert list(locations.index) == [1, 2]
+
+
+def test_extract_locations_without_values_is_empty():
+    # Headers only, or only blank cells: float64 columns with nothing left after dropna
+    for df in (pd.DataFrame({"a": []}), pd.DataFrame({"a": [None, float("nan")]})):
+        locations = extract_locations([df])
+        assert locations.empty
+        assert list(locations.columns) == ["value", "Rack", "Level", "Position"]
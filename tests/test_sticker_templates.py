@@ -0,0 +1,194 @@
+import json
+import os
+import pandas as pd
+import pytest
+from reportlab.pdfbase import pdfmetrics
+import sticker_pdf
+from sticker_pdf import FONT_NAME, STICKER_TEMPLATES, compile_template, draw_labels, extract_locations, layout_field, mm
+
+# Drawing recorded from the save_to_pdf..save_to_pdf5 functions the template engine
+# replaced, rendering the batches below. The reference has the old code's two slips
+# corrected, as the engine does: Sticker 1 draws all three components (the old loop
+# only drew the last one) and Sticker 5 outlines its green box once, not twice. Field
+# text follows the engine's fit rule: every field shrinks to its width less 2 mm
+# (Sticker 5's caption to 30 mm, down to 8pt), solved exactly instead of in 1pt steps.
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), "data", "sticker_templates.json")
+
+RACK_VALUES = ["A-01-03", "B-12-07-4", "C-5", "D-02-11"]
+BATCHES = {
+    "rack_blue": RACK_VALUES,
+    "rack_colored": RACK_VALUES,
+    "rack_qr": RACK_VALUES,
+    "qr_orange": ["A-01-03", "WH2-RACK-0042-BIN17", "C-5"],
+    "qr_alpha": ["A-01-03", "B-12-07-4", "C-5"],
+    "qr_gold": ["A-01-03", "WH2-RACK-0042-BIN17", "C-5"],
+}
+
+
+def pt(value):
+    return f"{round(value, 2) + 0.0:.2f}"
+
+
+class RecordingCanvas:
+    """Stand-in for reportlab's canvas that notes every primitive in page coordinates.
+
+    Forms are replayed where they are stamped, so a label drawn from a form XObject
+    and one drawn call by call record the same lines. Each page is returned sorted:
+    only what lands on the page is compared, not the order it was drawn in.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.pages = [[]]
+        self.forms = {}
+        self.form = None
+        self.stack = []
+        self.reset()
+
+    def reset(self):
+        self.fill, self.font, self.line_width, self.origin = "0x000000", None, 1, (0, 0)
+
+    def capture(self, *call):
+        # Inside beginForm/endForm calls are kept for doForm instead of drawn
+        if self.form is None:
+            return False
+        self.form.append(call)
+        return True
+
+    def add(self, line):
+        self.pages[-1].append(line)
+
+    def at(self, x, y):
+        return f"{pt(self.origin[0] + x)} {pt(self.origin[1] + y)}"
+
+    def setFillColor(self, color):
+        if not self.capture("setFillColor", color):
+            self.fill = color.hexval()
+
+    def setFont(self, name, size):
+        if not self.capture("setFont", name, size):
+            self.font = (name, size)
+
+    def setLineWidth(self, width):
+        if not self.capture("setLineWidth", width):
+            self.line_width = width
+
+    def stringWidth(self, text, font_name, size):
+        return pdfmetrics.stringWidth(text, font_name, size)
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        if not self.capture("rect", x, y, width, height, stroke, fill):
+            self.add(f"rect {self.at(x, y)} {pt(width)} {pt(height)} stroke={pt(self.line_width) if stroke else '-'} "
+                     f"fill={self.fill if fill else '-'}")
+
+    def line(self, x1, y1, x2, y2):
+        if not self.capture("line", x1, y1, x2, y2):
+            self.add(f"line {self.at(x1, y1)} {self.at(x2, y2)} stroke={pt(self.line_width)}")
+
+    def drawString(self, x, y, text):
+        if not self.capture("drawString", x, y, text) and text:
+            self.add(f"text {self.at(x, y)} {self.font[0]} {pt(self.font[1])} {self.fill} {text}")
+
+    def drawCentredString(self, x, y, text):
+        self.drawString(x - self.stringWidth(text, *self.font) / 2, y, text)
+
+    def qr(self, data, x, y, size):
+        self.add(f"qr {self.at(x, y)} {pt(size)} {data}")
+
+    def saveState(self):
+        self.stack.append((self.fill, self.font, self.line_width, self.origin))
+
+    def restoreState(self):
+        self.fill, self.font, self.line_width, self.origin = self.stack.pop()
+
+    def translate(self, dx, dy):
+        self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+
+    def beginForm(self, name, *bbox):
+        self.form = self.forms[name] = []
+
+    def endForm(self):
+        self.form = None
+
+    def doForm(self, name):
+        self.saveState()
+        for method, *args in self.forms[name]:
+            getattr(self, method)(*args)
+        self.restoreState()
+
+    def showPage(self):
+        self.pages.append([])
+        self.reset()
+
+    def setPageSize(self, size):
+        pass
+
+    def save(self):
+        pass
+
+    def recorded(self):
+        return [sorted(page) for page in self.pages]
+
+
+def record_qr(pdf, data, x, y, size, qr_mode=sticker_pdf.QR_MODE_RASTER):
+    pdf.qr(data, x, y, size)
+
+
+def locations_of(values):
+    return extract_locations([pd.DataFrame({"loc": values})])
+
+
+@pytest.fixture(scope="module")
+def reference():
+    with open(REFERENCE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_every_template_has_a_reference_batch(reference):
+    assert set(BATCHES) == set(STICKER_TEMPLATES) == set(reference)
+
+
+@pytest.mark.parametrize("name", sorted(STICKER_TEMPLATES))
+def test_template_draws_what_the_old_code_drew(name, reference, monkeypatch):
+    monkeypatch.setattr(sticker_pdf, "draw_qr_code", record_qr)
+    pdf = RecordingCanvas()
+    draw_labels(pdf, compile_template(name), locations_of(BATCHES[name]))
+    assert pdf.recorded() == reference[name]
+
+
+def test_a_full_page_breaks_only_when_more_labels_follow():
+    plan = compile_template("rack_blue")
+    values = [f"R{n}-01-02" for n in range(len(plan["slots"]))]
+
+    full = RecordingCanvas()
+    draw_labels(full, plan, locations_of(values))
+    assert len(full.recorded()) == 1
+
+    # The label after a full page lands in the first slot of the next one
+    overflow, single = RecordingCanvas(), RecordingCanvas()
+    draw_labels(overflow, plan, locations_of(values + ["Z-09-09"]))
+    draw_labels(single, plan, locations_of(["Z-09-09"]))
+    assert overflow.recorded() == full.recorded() + single.recorded()
+
+
+def test_static_elements_are_stamped_from_forms():
+    plan = compile_template("rack_qr")
+    assert [op[0] for op in plan["ops"]] == ["form", "qr", "field", "field", "field", "field"]
+    # Boxes first, then the captions, all in the one form drawn under the per-label text
+    assert [op[0] for op in plan["forms"]["rack_qr_0"]] == ["box"] * 5 + ["text"] * 4
+
+
+def test_long_text_is_fitted_to_its_box():
+    plan = compile_template("qr_alpha")
+    op = next(op for op in plan["ops"] if op[0] == "field" and op[6] == "value")
+    _, _, _, width, size, _, _, _, (max_width, min_size) = op
+    values = ["C-5", "WAREHOUSE-02-17", "WAREHOUSE-EAST-WING-0042-BIN-17-SHELF-3-OVERFLOW"]
+    _, _, _, texts, sizes, xs = layout_field(op, locations_of(values))
+
+    assert sizes[0] == size
+    assert min_size < sizes[1] < size
+    assert pdfmetrics.stringWidth(texts[1], FONT_NAME, sizes[1]) == pytest.approx(max_width)
+    # Too long even at the smallest size: drawn at that size and left to overflow, still centred
+    assert sizes[2] == min_size
+    text_width = pdfmetrics.stringWidth(texts[2], FONT_NAME, min_size)
+    assert xs[2] == pytest.approx(op[1] + (width - text_width) / 2)
+    assert max_width == mm(30)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sticker_tspl
+from spooler import SPOOL_MAX_BYTES
+from sticker_pdf import extract_locations
+from sticker_tspl import BACKGROUND_PROGRAM, PROGRAM_END, compile_sticker_form, compile_sticker_tspl
+from tspl_emulator import emulate_tspl
+
+
+def locations(count):
+    return extract_locations([pd.DataFrame({"loc": [f"A-{n // 10:02d}-{n % 10:02d}" for n in range(count)]})])
+
+
+def test_static_background_is_sent_once_per_job():
+    job = compile_sticker_tspl("rack_colored", locations(2000))
+    assert job.count(b"BITMAP ") == compile_sticker_tspl("rack_colored", locations(1)).count(b"BITMAP ")
+    assert len(job) < SPOOL_MAX_BYTES
+
+
+def test_each_location_prints_one_label():
+    emulated = emulate_tspl(compile_sticker_tspl("rack_qr", locations(2)))
+    assert len(emulated.labels) == 2 and not emulated.skipped
+
+
+@pytest.fixture
+def fresh_forms():
+    compile_sticker_form.cache_clear()
+    yield
+    compile_sticker_form.cache_clear()
+
+
+def test_bitmap_holding_a_program_end_is_sent_with_each_label(fresh_forms, monkeypatch):
+    # Tint data that packs to the bytes of an EOP line (bit 1 is white, so the ink is inverted)
+    eop = ~np.unpackbits(np.frombuffer(b"EOP\r\nEOP\n", dtype=np.uint8)).astype(bool)
+    monkeypatch.setattr(sticker_tspl, "tint_ink", lambda x, y, width, height, density: eop[None, :])
+    form = compile_sticker_form("rack_colored")
+    job = compile_sticker_tspl("rack_colored", locations(3))
+
+    # Only the two programs' own EOP lines are left in the download
+    assert len(PROGRAM_END.findall(form["download"])) == 2
+    assert form["unstored"].count(b"BITMAP ") == 3
+    assert job.count(form["unstored"]) == 3
+
+    # Prints what the same bitmaps stored in the background program would
+    stored = job.replace(b"CLS\n", b"CLS\n" + form["unstored"], 1)
+    stored = stored.replace(f"{BACKGROUND_PROGRAM}\n".encode() + form["unstored"], f"{BACKGROUND_PROGRAM}\n".encode())
+    assert stored.count(form["unstored"]) == 1
+    labels, stored_labels = emulate_tspl(job).labels, emulate_tspl(stored).labels
+    assert len(labels) == len(stored_labels) == 3
+    for label, stored_label in zip(labels, stored_labels):
+        assert np.array_equal(np.array(label.image), np.array(stored_label.image))
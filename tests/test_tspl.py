@@ -0,0 +1,54 @@
+import numpy as np
+from tspl import (
+    LABEL_FIELDS, TSPL_ENCODING, compile_tspl_batch, compile_tspl_form_batch, generate_tspl, tspl_form_download,
+)
+from tspl_emulator import emulate_tspl
+
+LABELS = [dict(zip(LABEL_FIELDS, (f"890123456{n:04d}", "Necklace", f"Colour {n}", f"D{n}", "MATTE", f"{1299 + n}")))
+          for n in range(5)]
+
+
+def images(job):
+    emulated = emulate_tspl(job)
+    assert not emulated.skipped
+    return [np.array(label.image) for label in emulated.labels]
+
+
+def assert_same_images(job, expected):
+    printed = images(job)
+    assert len(printed) == len(expected)
+    for image, expected_image in zip(printed, expected):
+        assert np.array_equal(image, expected_image)
+
+
+def test_batch_prints_two_across_with_the_odd_one_out_on_the_left():
+    job = compile_tspl_batch(LABELS)
+    assert job.count("SIZE ") == 1
+    # Every row prints what a job for just that row would
+    rows = [compile_tspl_batch(LABELS[0:2]), compile_tspl_batch(LABELS[2:4]), compile_tspl_batch(LABELS[4:])]
+    assert_same_images(job, [images(row)[0] for row in rows])
+    assert compile_tspl_batch([]).count("PRINT") == 0
+
+
+def test_generate_tspl_is_a_batch_of_one_pair():
+    assert generate_tspl(LABELS[0], LABELS[1]) == compile_tspl_batch(LABELS[:2])
+
+
+def test_forms_print_what_the_full_layout_prints():
+    assert_same_images(compile_tspl_form_batch(LABELS), images(compile_tspl_batch(LABELS)))
+
+
+def test_forms_send_fewer_bytes_per_label():
+    labels = LABELS * 40
+    full = len(compile_tspl_batch(labels).encode(TSPL_ENCODING))
+    form = len(compile_tspl_form_batch(labels).encode(TSPL_ENCODING))
+    assert form < full / 2
+
+
+def test_forms_already_on_the_printer_are_not_downloaded_again():
+    job = compile_tspl_form_batch(LABELS, download=False)
+    assert "DOWNLOAD" not in job
+    # Run after a job that left the forms on the printer, it prints the same labels
+    earlier = compile_tspl_form_batch(LABELS[:1])
+    assert_same_images(earlier + job, images(earlier) + images(compile_tspl_batch(LABELS)))
+    assert 'DOWNLOAD F,"' in tspl_form_download(flash=True)
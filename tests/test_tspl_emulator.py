@@ -0,0 +1,34 @@
+import numpy as np
+from tspl import LABEL_FIELDS, TSPL_ENCODING, compile_tspl_batch, compile_tspl_form_batch, tspl_string
+from tspl_emulator import TsplEmulator, emulate_tspl, split_args
+
+LABEL = dict(zip(LABEL_FIELDS, ("8901234567890", '18" chain, gold', "RED + GREEN", "D42", 'MATTE   S:2"', "1299")))
+
+
+def test_split_args_keeps_escaped_quotes_inside_literals():
+    assert split_args('10,20,"18\\["] chain, gold",1') == ["10", "20", '"18\\["] chain, gold"', "1"]
+    assert split_args('"a\\["]+b"+X$', "+") == ['"a\\["]+b"', "X$"]
+
+
+def test_value_unescapes_quotes():
+    emulator = TsplEmulator()
+    emulator.variables["X$"] = "!"
+    assert emulator.value('"18\\["] chain, gold"+X$') == '18" chain, gold!'
+
+
+def test_quoted_values_print_the_same_direct_and_from_a_form():
+    direct = emulate_tspl(compile_tspl_batch([LABEL, LABEL]))
+    form = emulate_tspl(compile_tspl_form_batch([LABEL, LABEL]))
+    assert len(direct.labels) == len(form.labels) == 1
+    assert not direct.skipped and not form.skipped
+    assert np.array_equal(np.array(direct.labels[0].image), np.array(form.labels[0].image))
+
+
+def test_values_outside_the_code_page_or_across_lines_still_print():
+    label = dict(LABEL, line1="Necklace\r\nset", price="₹1299")
+    assert tspl_string(label["line1"]) == "Necklace set"
+    assert tspl_string(label["price"]) == "?1299"
+    job = compile_tspl_form_batch([label])
+    job.encode(TSPL_ENCODING)
+    emulated = emulate_tspl(job)
+    assert len(emulated.labels) == 1 and not emulated.skipped
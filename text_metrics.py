@@ -0,0 +1,42 @@
+from functools import lru_cache
+import numpy as np
+from reportlab.pdfbase import pdfmetrics
+
+
+@lru_cache(maxsize=None)
+def advance_table(font_name):
+    """Glyph advances of a registered TrueType font, indexed by code point.
+
+    Values are in 1/1000 em, the units reportlab's stringWidth() sums; code
+    points the font has no glyph for get the face's default width.
+    """
+    face = pdfmetrics.getFont(font_name).face
+    table = np.full(max(face.charWidths) + 1, face.defaultWidth, dtype=np.float64)
+    table[list(face.charWidths)] = list(face.charWidths.values())
+    return table, float(face.defaultWidth)
+
+
+def text_units(texts, font_name):
+    """Width of every text at 1000pt (None counts as empty), measured in one pass"""
+    texts = ["" if text is None else text for text in texts]
+    table, default_width = advance_table(font_name)
+
+    # All texts joined into one array of code points; a running total of their
+    # advances turns each text's width into a difference of two lookups
+    codes = np.frombuffer("".join(texts).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    advances = np.where(codes < len(table), table[np.minimum(codes, len(table) - 1)], default_width)
+    totals = np.concatenate(([0.0], np.cumsum(advances)))
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    ends = np.cumsum(lengths)
+    return totals[ends] - totals[ends - lengths]
+
+
+def fit_sizes(units, size, max_width, min_size):
+    """Largest font size up to `size` at which each text spans at most `max_width` points.
+
+    `units` comes from text_units(). Texts that would need a size below
+    `min_size` are drawn at `min_size` and allowed to overflow.
+    """
+    with np.errstate(divide="ignore"):
+        exact = max_width * 1000 / units
+    return np.clip(exact, min_size, size)
@@ -0,0 +1,140 @@
+import math
+
+# TSPL for the TSC TTP-345: two 55 x 21 mm labels side by side on one row.
+# Printers take TSPL as single-byte text.
+TSPL_ENCODING = "latin-1"
+
+# The scalable font "0" puts its baseline this far below the top of a TEXT
+# cell, per point of size
+SCALABLE_FONT_ASCENT = 0.8
+
+# How a double quote is written inside a TSPL "..." literal
+QUOTE_ESCAPE = '\\["]'
+
+# Label fields a record needs, as in the Dual-Label printer form
+LABEL_FIELDS = ("barcode", "line1", "line2", "line3", "line4", "price")
+# x offset of each label across a row, in dots
+LABEL_COLUMNS = (30, 365)
+
+TSPL_SETUP = """
+SIZE 55 mm, 21 mm
+GAP 3 mm, 0
+DIRECTION 1
+"""
+
+
+def tspl_string(value):
+    """A value for inside a TSPL "..." argument, on one line and in the printer's code page.
+
+    Line breaks become spaces, since a command ends at the end of its line, and
+    characters the code page lacks (such as ₹) become "?".
+    """
+    text = " ".join(str(value).splitlines())
+    return text.encode(TSPL_ENCODING, "replace").decode(TSPL_ENCODING).replace('"', QUOTE_ESCAPE)
+
+
+def label_commands(x_offset, values):
+    """Drawing commands for one label; values maps each field to a TSPL string expression"""
+    return f"""
+BARCODE {x_offset + 0},5,"128",40,1,0,2,2,{values['barcode']}
+TEXT {x_offset + 0},50,"3",0,1,1,{values['line1']}
+TEXT {x_offset + 0},70,"3",0,1,1,{values['line2']}
+TEXT {x_offset + 0},90,"3",0,1,1,{values['line3']}
+TEXT {x_offset + 0},110,"3",0,1,1,{values['line4']}
+TEXT {x_offset + 0},140,"3",0,1,1,"MRP:"
+TEXT {x_offset + 60},140,"3",0,1.5,1.5,{values['price']}
+TEXT {x_offset + 170},20,"3",90,1,1,"Kushal's"
+"""
+
+
+def label_block(x_offset, data):
+    return label_commands(x_offset, {field: f'"{tspl_string(data[field])}"' for field in LABEL_FIELDS})
+
+
+def label_text(value):
+    """A sheet value as label text: blank when missing, whole numbers without a trailing .0"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def sticker_entry_label(entry):
+    """Label record for one generate_sticker_data_from_df() entry, laid out like the Dual-Label form"""
+    text = {key: label_text(entry.get(key)) for key in ("barcode", "desc", "spec", "designNo", "remark", "feature1", "mpr")}
+    return {
+        "barcode": text["barcode"],
+        "line1": text["desc"],        # Item Alias Name
+        "line2": text["spec"],        # COLOR
+        "line3": text["designNo"],    # DESIGNNO
+        "line4": f"{text['remark']}   S:{text['feature1']}",  # POLISH, SIZE
+        "price": text["mpr"],         # NEW MRP
+    }
+
+
+def label_rows(labels):
+    """Labels grouped into printed rows, left to right; an odd one out gets a row to itself"""
+    labels = list(labels)
+    per_row = len(LABEL_COLUMNS)
+    return [labels[start:start + per_row] for start in range(0, len(labels), per_row)]
+
+
+def compile_tspl_batch(labels):
+    """One TSPL job printing every label record in order, two across.
+
+    The media setup is sent once; each row is then cleared, drawn and printed.
+    With an odd count the last row has only its left label.
+    """
+    parts = [TSPL_SETUP]
+    for row in label_rows(labels):
+        parts.append("CLS\n")
+        parts.extend(label_block(x_offset, label) for x_offset, label in zip(LABEL_COLUMNS, row))
+        parts.append("\nPRINT 1\n")
+    return "".join(parts)
+
+
+def generate_tspl(label1, label2):
+    return compile_tspl_batch([label1, label2])
+
+
+# Printer-resident forms: the label layout is downloaded once as a stored
+# program that reads its values from string variables, so each row only sends
+# the variables and the program name. The programs live in printer DRAM, lost
+# at power-off, unless downloaded to flash.
+
+# Program printing a row of one label (an odd one out), and a row of two
+FORM_NAMES = ("LEFT", "PAIR")
+# Variable name stem per field; the column adds L or R, e.g. BL$ is the left barcode
+FORM_VARIABLES = {"barcode": "B", "line1": "T1", "line2": "T2", "line3": "T3", "line4": "T4", "price": "P"}
+
+
+def form_variable(field, column):
+    return f"{FORM_VARIABLES[field]}{'LR'[column]}$"
+
+
+def tspl_form_download(flash=False):
+    """DOWNLOAD ... EOP definitions of the FORM_NAMES programs"""
+    parts = []
+    for labels_in_row, name in enumerate(FORM_NAMES, 1):
+        parts.append(f'\nDOWNLOAD {"F," if flash else ""}"{name}.BAS"\nCLS\n')
+        for column, x_offset in enumerate(LABEL_COLUMNS[:labels_in_row]):
+            parts.append(label_commands(x_offset, {field: form_variable(field, column) for field in LABEL_FIELDS}))
+        parts.append("\nPRINT 1\nEOP\n")
+    return "".join(parts)
+
+
+def compile_tspl_form_batch(labels, download=True, flash=False):
+    """Like compile_tspl_batch(), but each row sends only its values and runs a stored form.
+
+    download=False leaves out the form definitions, for a printer that already
+    holds them (in flash, or from an earlier job since it was switched on).
+    """
+    parts = [TSPL_SETUP]
+    if download:
+        parts.append(tspl_form_download(flash))
+    for row in label_rows(labels):
+        for column, label in enumerate(row):
+            parts.extend(f'{form_variable(field, column)}="{tspl_string(label[field])}"\n' for field in LABEL_FIELDS)
+        parts.append(FORM_NAMES[len(row) - 1] + "\n")
+    return "".join(parts)
@@ -0,0 +1,501 @@
+"""Render TSPL jobs to label images, standing in for the TSC TTP-345 in tests and benchmarks.
+
+Usage: python tspl_emulator.py JOB.tspl [--dpi 300] [--out DIR]
+
+Takes the same bytes the printer transports send (printers.py) and rasterizes
+every PRINT to a 1-bit image at printer resolution, then reports how long the
+job took to parse and to render. With --out, each printed label is written as
+a PNG. JOB may be - to read standard input.
+
+Emulated: SIZE, GAP, DIRECTION, CLS, TEXT, BARCODE (Code 128), QRCODE, BITMAP,
+BAR, BOX, REVERSE, PRINT, string variables (NAME$="...") and stored programs
+(DOWNLOAD "NAME.BAS" ... EOP, then NAME or RUN "NAME.BAS"). Any other command
+is counted in the job's skipped commands and otherwise ignored. Built-in
+bitmap fonts are drawn with the sticker TTF at the font's cell height, and the
+scalable font at its point size, so text lands in the right place and size but
+not the printer's exact glyphs.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+from functools import lru_cache
+import qrcode
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from barcodes import code128_bars
+from sticker_pdf import FONT_PATH, qr_module_runs
+from tspl import QUOTE_ESCAPE, SCALABLE_FONT_ASCENT, TSPL_ENCODING
+
+# The TTP-345 prints at 300 dpi
+EMULATOR_DPI = 300
+# Cell height in dots of the built-in fonts "1".."8" at 203 dpi; scaled to other resolutions
+BUILTIN_FONT_HEIGHTS = {"1": 12, "2": 20, "3": 24, "4": 32, "5": 48, "6": 19, "7": 27, "8": 25}
+BUILTIN_FONT_DPI = 203
+# Font for the human-readable line under a barcode
+BARCODE_TEXT_FONT = "2"
+QR_ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+# Dots are 0 (black) or 1 (white), as in TSPL bitmap data
+BLACK = 0
+WHITE = 1
+
+ASSIGNMENT = re.compile(r"^([A-Za-z][A-Za-z0-9_]*\$?)\s*=(.*)$")
+
+
+class TsplError(Exception):
+    """The job is not TSPL this emulator can run"""
+
+
+class EmulatedLabel:
+    def __init__(self, image, copies):
+        self.image = image
+        self.copies = copies
+
+
+class EmulatedJob:
+    """What a job printed, plus how long parsing and rendering it took"""
+
+    def __init__(self, labels, dpi, parse_seconds, render_seconds, skipped):
+        self.labels = labels
+        self.dpi = dpi
+        self.parse_seconds = parse_seconds
+        self.render_seconds = render_seconds
+        self.skipped = skipped
+
+    @property
+    def copies(self):
+        return sum(label.copies for label in self.labels)
+
+
+# -------------------------
+# Parsing
+# -------------------------
+def split_args(text, separator=","):
+    """Split a TSPL argument list on the separators that are not inside quotes"""
+    args = []
+    current = []
+    quoted = False
+    position = 0
+    while position < len(text):
+        char = text[position]
+        if quoted and text.startswith(QUOTE_ESCAPE, position):
+            # An escaped double quote inside a literal neither ends it nor splits it
+            current.append(QUOTE_ESCAPE)
+            position += len(QUOTE_ESCAPE)
+            continue
+        if char == '"':
+            quoted = not quoted
+        if char == separator and not quoted:
+            args.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        position += 1
+    args.append("".join(current).strip())
+    return args
+
+
+def read_line(data, position):
+    """The line starting at position, without its line ending, and where the next one starts"""
+    end = data.find(b"\n", position)
+    if end < 0:
+        end = len(data)
+    return data[position:end].rstrip(b"\r").decode(TSPL_ENCODING), end + 1
+
+
+def read_bitmap(data, position):
+    """BITMAP x,y,width,height,mode,<width*height raw bytes>; returns the command and where the next line starts"""
+    header_end = position
+    for _ in range(5):
+        header_end = data.find(b",", header_end) + 1
+        if not header_end:
+            raise TsplError("BITMAP header is missing arguments")
+    args = split_args(data[position + len("BITMAP"):header_end - 1].decode(TSPL_ENCODING))
+    width_bytes, height = int(args[2]), int(args[3])
+    bitmap = data[header_end:header_end + width_bytes * height]
+    if len(bitmap) < width_bytes * height:
+        raise TsplError("BITMAP data is shorter than width x height")
+    next_line = header_end + len(bitmap)
+    # The data ends the command; skip the line ending after it
+    if data[next_line:next_line + 2] == b"\r\n":
+        next_line += 2
+    elif data[next_line:next_line + 1] == b"\n":
+        next_line += 1
+    return ("BITMAP", args, bitmap), next_line
+
+
+def parse_tspl(data):
+    """TSPL bytes as a list of (command, args, payload) tuples.
+
+    payload is the raw data of a BITMAP, or the parsed body of a DOWNLOADed
+    program; None otherwise. Assignments come through as ("LET", [name, expression], None).
+    """
+    if isinstance(data, str):
+        data = data.encode(TSPL_ENCODING)
+    program = []
+    # Commands being collected: the job itself, or the body of a DOWNLOAD until its EOP
+    stack = [program]
+    position = 0
+    while position < len(data):
+        if data[position:position + 7].upper() == b"BITMAP ":
+            command, position = read_bitmap(data, position)
+            stack[-1].append(command)
+            continue
+
+        line, position = read_line(data, position)
+        line = line.strip()
+        if not line or line.startswith("!"):
+            continue
+
+        assignment = ASSIGNMENT.match(line)
+        if assignment:
+            stack[-1].append(("LET", [assignment.group(1).upper(), assignment.group(2).strip()], None))
+            continue
+
+        name, _, rest = line.partition(" ")
+        name = name.upper()
+        args = split_args(rest) if rest.strip() else []
+        if name == "DOWNLOAD":
+            target = unquote(args[-1]).upper() if args else ""
+            if not target.endswith(".BAS"):
+                raise TsplError(f"only program downloads (.BAS) are emulated, not {target or 'DOWNLOAD without a name'}")
+            body = []
+            stack[-1].append(("DOWNLOAD", [target[:-len(".BAS")]], body))
+            stack.append(body)
+        elif name == "EOP":
+            if len(stack) == 1:
+                raise TsplError("EOP without DOWNLOAD")
+            stack.pop()
+        else:
+            stack[-1].append((name, args, None))
+    if len(stack) > 1:
+        raise TsplError("DOWNLOAD without EOP")
+    return program
+
+
+def unquote(text):
+    """A "..." literal's value; TSPL writes a double quote inside one as \\["]"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    return text.replace(QUOTE_ESCAPE, '"')
+
+
+# -------------------------
+# Rendering
+# -------------------------
+@lru_cache(maxsize=64)
+def label_font(height, em=False):
+    """The sticker TTF sized so its ascent plus descent fills a cell height dots tall; with em, height dots to the em"""
+    font = ImageFont.truetype(FONT_PATH, max(int(height), 1), layout_engine=ImageFont.Layout.BASIC)
+    if em:
+        return font
+    ascent, descent = font.getmetrics()
+    return font.font_variant(size=max(int(height * height / (ascent + descent)), 1))
+
+
+@lru_cache(maxsize=8192)
+def glyph(char, height, em=False):
+    """One character's ink mask and advance; FreeType is slow per call, so each is drawn once"""
+    font = label_font(height, em)
+    advance = font.getlength(char)
+    right = font.getbbox(char)[2]
+    mask = Image.new("1", (max(int(max(advance, right)) + 1, 1), int(height)), 0)
+    if em:
+        # Scalable text sits on the printer font's baseline, not the TTF's own ascent
+        ImageDraw.Draw(mask).text((0, round(height * SCALABLE_FONT_ASCENT)), char, fill=1, font=font, anchor="ls")
+    else:
+        ImageDraw.Draw(mask).text((0, 0), char, fill=1, font=font)
+    return mask, advance
+
+
+# Static text ("MRP:", the brand) and repeated values are composed once
+@lru_cache(maxsize=4096)
+def text_mask(text, height, x_scale=1.0, em=False):
+    """Text as an ink mask (1 = ink) in a cell height dots tall (see label_font); shared, so never drawn on.
+
+    Glyphs are placed at their advances without kerning, which the printer's
+    bitmap fonts do not have either.
+    """
+    placed = []
+    x = 0.0
+    for char in text:
+        glyph_mask, advance = glyph(char, height, em)
+        placed.append((glyph_mask, round(x)))
+        x += advance
+    width = max((glyph_x + glyph_mask.width for glyph_mask, glyph_x in placed), default=1)
+    mask = Image.new("1", (width, int(height)), 0)
+    for glyph_mask, glyph_x in placed:
+        mask.paste(1, (glyph_x, 0), glyph_mask)
+    if x_scale != 1.0:
+        mask = mask.resize((max(int(mask.width * x_scale), 1), mask.height), Image.Resampling.NEAREST)
+    return mask
+
+
+def invert_dots(image):
+    """Black and white swapped; ImageChops.invert does not give a clean mode "1" result"""
+    return ImageChops.logical_xor(image, Image.new("1", image.size, WHITE))
+
+
+def runs_mask(width, height, rects):
+    """Ink mask with the given (x, y, width, height) rectangles filled"""
+    mask = Image.new("1", (max(int(width), 1), max(int(height), 1)), 0)
+    draw = ImageDraw.Draw(mask)
+    for x, y, rect_width, rect_height in rects:
+        draw.rectangle([x, y, x + rect_width - 1, y + rect_height - 1], fill=1)
+    return mask
+
+
+class TsplEmulator:
+    """Printer state across one job: media size, image buffer, variables and stored programs"""
+
+    def __init__(self, dpi=EMULATOR_DPI):
+        self.dpi = dpi
+        self.size = None
+        self.gap = None
+        self.direction = 0
+        self.canvas = None
+        self.variables = {}
+        self.programs = {}
+        self.labels = []
+        self.skipped = Counter()
+        self.handlers = {
+            "SIZE": self.set_size,
+            "GAP": self.set_gap,
+            "DIRECTION": self.set_direction,
+            "CLS": self.clear,
+            "TEXT": self.draw_text,
+            "BARCODE": self.draw_barcode,
+            "QRCODE": self.draw_qrcode,
+            "BITMAP": self.draw_bitmap,
+            "BAR": self.draw_bar,
+            "BOX": self.draw_box,
+            "REVERSE": self.reverse,
+            "PRINT": self.print_label,
+            "LET": self.assign,
+            "DOWNLOAD": self.store_program,
+            "RUN": self.run_program,
+        }
+
+    def run(self, commands):
+        for name, args, payload in commands:
+            handler = self.handlers.get(name)
+            if handler is not None:
+                handler(args, payload)
+            elif name in self.programs:
+                self.run(self.programs[name])
+            else:
+                self.skipped[name] += 1
+
+    # Values
+    def value(self, expression):
+        """A string expression: "literals", NAME$ variables and numbers joined with +"""
+        return "".join(
+            unquote(term) if term.startswith('"') else self.variables.get(term.upper(), term)
+            for term in split_args(expression, "+")
+        )
+
+    def number(self, expression):
+        return float(self.value(expression))
+
+    def dots(self, measure):
+        """A SIZE/GAP measure in dots: "55 mm", "100 dot", or inches when it has no unit"""
+        amount, _, unit = measure.strip().partition(" ")
+        unit = unit.strip().lower()
+        if unit == "mm":
+            return float(amount) * self.dpi / 25.4
+        if unit == "dot":
+            return float(amount)
+        return float(amount) * self.dpi
+
+    def ink_canvas(self):
+        if self.canvas is None:
+            if self.size is None:
+                raise TsplError("drawing before SIZE")
+            self.clear([], None)
+        return self.canvas
+
+    def place(self, mask, x, y, rotation):
+        """Stamp an ink mask with its top-left corner at x, y, turned clockwise by rotation degrees"""
+        width, height = mask.size
+        rotation = int(rotation) % 360
+        if rotation:
+            mask = mask.rotate(-rotation, expand=True)
+        offset = {0: (x, y), 90: (x - height, y), 180: (x - width, y - height), 270: (x, y - width)}[rotation]
+        self.ink_canvas().paste(BLACK, (int(offset[0]), int(offset[1])), mask)
+
+    # Setup
+    def set_size(self, args, payload):
+        self.size = (round(self.dots(args[0])), round(self.dots(args[1])) if len(args) > 1 else None)
+
+    def set_gap(self, args, payload):
+        self.gap = tuple(self.dots(arg) for arg in args)
+
+    def set_direction(self, args, payload):
+        # Turns the label relative to the feed, not the design; the image is left as drawn
+        self.direction = int(self.number(args[0]))
+
+    def clear(self, args, payload):
+        if self.size is None:
+            raise TsplError("CLS before SIZE")
+        width, height = self.size
+        self.canvas = Image.new("1", (width, height or width), WHITE)
+
+    # Drawing
+    def draw_text(self, args, payload):
+        x, y = self.number(args[0]), self.number(args[1])
+        font, rotation = unquote(args[2]), self.number(args[3])
+        x_mul, y_mul = self.number(args[4]), self.number(args[5])
+        # The optional alignment before the content: 1 left, 2 centre, 3 right of x
+        alignment = int(self.number(args[6])) if len(args) > 7 else 1
+        text = self.value(args[-1])
+        if not text:
+            return
+        if font in BUILTIN_FONT_HEIGHTS:
+            height = BUILTIN_FONT_HEIGHTS[font] * self.dpi / BUILTIN_FONT_DPI * y_mul
+            mask = text_mask(text, height, x_mul / y_mul)
+        else:
+            # Scalable fonts take their multipliers as point sizes
+            mask = text_mask(text, y_mul * self.dpi / 72, x_mul / y_mul, em=True)
+        shift = {2: mask.width / 2, 3: mask.width}.get(alignment, 0)
+        # Alignment shifts along the direction the text runs
+        rotation = int(rotation) % 360
+        x, y = {0: (x - shift, y), 90: (x, y - shift), 180: (x + shift, y), 270: (x, y + shift)}[rotation]
+        self.place(mask, x, y, rotation)
+
+    def draw_barcode(self, args, payload):
+        x, y = self.number(args[0]), self.number(args[1])
+        symbology = unquote(args[2]).upper()
+        height, readable = self.number(args[3]), int(self.number(args[4]))
+        rotation, narrow = self.number(args[5]), self.number(args[6])
+        content = self.value(args[-1])
+        if symbology != "128":
+            self.skipped[f"BARCODE {symbology}"] += 1
+            return
+        bars, modules = code128_bars(content)
+        rects = [(bar_x * narrow, 0, bar_width * narrow, height) for bar_x, bar_width in bars]
+        mask = runs_mask(modules * narrow, height, rects)
+        if readable:
+            text = text_mask(content, BUILTIN_FONT_HEIGHTS[BARCODE_TEXT_FONT] * self.dpi / BUILTIN_FONT_DPI)
+            combined = Image.new("1", (max(mask.width, text.width), mask.height + text.height), 0)
+            combined.paste(mask, (0, 0))
+            # 1 left, 2 centre, 3 right
+            text_x = {1: 0, 2: (mask.width - text.width) // 2, 3: mask.width - text.width}.get(readable, 0)
+            combined.paste(text, (max(text_x, 0), mask.height))
+            mask = combined
+        self.place(mask, x, y, rotation)
+
+    def draw_qrcode(self, args, payload):
+        x, y = self.number(args[0]), self.number(args[1])
+        error_correction = QR_ERROR_CORRECTION[unquote(args[2]).upper()]
+        cell, rotation = self.number(args[3]), self.number(args[5])
+        module_count, runs = qr_module_runs(self.value(args[-1]), error_correction)
+        rects = [(column * cell, row * cell, length * cell, cell) for row, column, length in runs]
+        self.place(runs_mask(module_count * cell, module_count * cell, rects), x, y, rotation)
+
+    def draw_bitmap(self, args, bitmap):
+        x, y = int(self.number(args[0])), int(self.number(args[1]))
+        width_bytes, height, mode = int(args[2]), int(args[3]), int(args[4])
+        # Bit 0 is a black dot, the same convention as a mode "1" image
+        image = Image.frombytes("1", (width_bytes * 8, height), bitmap)
+        canvas = self.ink_canvas()
+        if mode == 0:  # OVERWRITE
+            canvas.paste(image, (x, y))
+            return
+        ink = invert_dots(image)
+        if mode == 1:  # OR
+            canvas.paste(BLACK, (x, y), ink)
+        else:  # XOR
+            box = (x, y, x + image.width, y + image.height)
+            region = invert_dots(canvas.crop(box))
+            canvas.paste(invert_dots(ImageChops.logical_xor(region, ink)), (x, y))
+
+    def draw_bar(self, args, payload):
+        x, y, width, height = (self.number(arg) for arg in args[:4])
+        ImageDraw.Draw(self.ink_canvas()).rectangle([x, y, x + width - 1, y + height - 1], fill=BLACK)
+
+    def draw_box(self, args, payload):
+        x, y, x_end, y_end, thickness = (self.number(arg) for arg in args[:5])
+        ImageDraw.Draw(self.ink_canvas()).rectangle([x, y, x_end, y_end], outline=BLACK, width=int(thickness))
+
+    def reverse(self, args, payload):
+        x, y, width, height = (int(self.number(arg)) for arg in args[:4])
+        canvas = self.ink_canvas()
+        box = (x, y, x + width, y + height)
+        canvas.paste(invert_dots(canvas.crop(box)), box[:2])
+
+    # Output and programs
+    def print_label(self, args, payload):
+        sets = int(self.number(args[0])) if args else 1
+        copies = int(self.number(args[1])) if len(args) > 1 else 1
+        self.labels.append(EmulatedLabel(self.ink_canvas().copy(), sets * copies))
+
+    def assign(self, args, payload):
+        self.variables[args[0]] = self.value(args[1])
+
+    def store_program(self, args, body):
+        self.programs[args[0]] = body
+
+    def run_program(self, args, payload):
+        name = unquote(args[0]).upper().removesuffix(".BAS")
+        if name not in self.programs:
+            raise TsplError(f"RUN of unknown program {name}")
+        self.run(self.programs[name])
+
+
+def emulate_tspl(data, dpi=EMULATOR_DPI):
+    """Run a TSPL job (str or bytes) and return its EmulatedJob"""
+    start = time.perf_counter()
+    commands = parse_tspl(data)
+    parsed = time.perf_counter()
+    emulator = TsplEmulator(dpi)
+    emulator.run(commands)
+    rendered = time.perf_counter()
+    return EmulatedJob(emulator.labels, dpi, parsed - start, rendered - parsed, emulator.skipped)
+
+
+def save_labels(job, directory, prefix="label"):
+    """Write each printed label as a PNG (with the printer's dpi) and return the paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number, label in enumerate(job.labels, 1):
+        path = os.path.join(directory, f"{prefix}-{number:05d}.png")
+        label.image.save(path, dpi=(job.dpi, job.dpi))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("job", help="TSPL file, or - for standard input")
+    parser.add_argument("--dpi", type=int, default=EMULATOR_DPI, help="printer resolution")
+    parser.add_argument("--out", help="directory to write one PNG per printed label to")
+    args = parser.parse_args()
+
+    if args.job == "-":
+        data = sys.stdin.buffer.read()
+    else:
+        with open(args.job, "rb") as job_file:
+            data = job_file.read()
+
+    job = emulate_tspl(data, args.dpi)
+    seconds = job.parse_seconds + job.render_seconds
+    print(f"{len(data)} bytes, {len(job.labels)} labels printed ({job.copies} with copies)")
+    print(f"parse {job.parse_seconds * 1000:.1f} ms, render {job.render_seconds * 1000:.1f} ms, "
+          f"{len(job.labels) / seconds if seconds else 0:.0f} labels/s")
+    if job.skipped:
+        print("skipped: " + ", ".join(f"{name} x{count}" for name, count in job.skipped.most_common()))
+    if args.out:
+        start = time.perf_counter()
+        paths = save_labels(job, args.out)
+        print(f"wrote {len(paths)} PNGs to {args.out} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()